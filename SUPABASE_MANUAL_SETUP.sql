@@ -2,6 +2,10 @@
 -- このSQLをSupabase SQL Editorで実行してください
 
 -- 既存テーブルがあれば削除（注意：データも削除されます）
+DROP TABLE IF EXISTS market_pace_aggregates CASCADE;
+DROP TABLE IF EXISTS market_pace_contributions CASCADE;
+DROP TABLE IF EXISTS market_pace_checkpoints CASCADE;
+DROP TABLE IF EXISTS item_consumption_stats CASCADE;
 DROP TABLE IF EXISTS consumption_recommendations CASCADE;
 DROP TABLE IF EXISTS notifications CASCADE;
 DROP TABLE IF EXISTS replenishment_records CASCADE;
@@ -95,12 +99,59 @@ CREATE TABLE consumption_recommendations (
     recommendation_message TEXT NOT NULL,
     confidence_score FLOAT NOT NULL,
     additional_info JSONB,
+    input_fingerprint VARCHAR(64),
     is_active BOOLEAN DEFAULT TRUE,
     acknowledged_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- 商品別消費統計テーブル（消費記録の作成・更新・削除時に逐次更新）
+CREATE TABLE item_consumption_stats (
+    item_id INTEGER PRIMARY KEY REFERENCES daily_items(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    record_count INTEGER NOT NULL DEFAULT 0,
+    total_quantity FLOAT NOT NULL DEFAULT 0,
+    mean_quantity FLOAT NOT NULL DEFAULT 0,
+    m2 FLOAT NOT NULL DEFAULT 0,
+    first_date DATE,
+    last_date DATE,
+    anchor_date DATE,
+    sum_x FLOAT NOT NULL DEFAULT 0,
+    sum_xx FLOAT NOT NULL DEFAULT 0,
+    sum_xy FLOAT NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- 市場消費ペース集計テーブル（全ユーザーの消費記録から商品名ごとに集計）
+CREATE TABLE market_pace_checkpoints (
+    job_name VARCHAR(50) PRIMARY KEY,
+    last_record_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE market_pace_contributions (
+    item_id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    name_key VARCHAR(100) NOT NULL,
+    pace FLOAT NOT NULL,
+    item_name VARCHAR(100),
+    stats_version INTEGER,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE market_pace_aggregates (
+    name_key VARCHAR(100) PRIMARY KEY,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    user_count INTEGER NOT NULL DEFAULT 0,
+    pace_sum FLOAT NOT NULL DEFAULT 0,
+    sketch JSON NOT NULL DEFAULT '{}',
+    version INTEGER NOT NULL DEFAULT 0,
+    published_version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- デフォルトカテゴリを挿入
 INSERT INTO categories (name, description) VALUES
 ('食品', '食料品・調味料・飲料など'),
@@ -117,6 +168,8 @@ CREATE INDEX idx_consumption_records_item_id ON consumption_records(item_id);
 CREATE INDEX idx_replenishment_records_user_id ON replenishment_records(user_id);
 CREATE INDEX idx_notifications_user_id ON notifications(user_id);
 CREATE INDEX idx_consumption_recommendations_user_id ON consumption_recommendations(user_id);
+CREATE INDEX idx_item_consumption_stats_user_id ON item_consumption_stats(user_id);
+CREATE INDEX idx_market_pace_contributions_name_key ON market_pace_contributions(name_key);
 
 -- トリガー関数：updated_atを自動更新
 CREATE OR REPLACE FUNCTION update_updated_at_column()
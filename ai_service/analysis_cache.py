@@ -0,0 +1,229 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import time
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis未導入の環境ではプロセス内キャッシュのみ使用する
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+def _normalize_quantity(record: Dict) -> str:
+    """
+    消費量をキー用の文字列に変換
+
+    分析では None を NaN として扱い、項目の欠落はエラー（既定値）となるため、
+    それぞれ 0 とは区別する
+    """
+    if "consumed_quantity" not in record:
+        return "missing"
+    quantity = record["consumed_quantity"]
+    if quantity is None:
+        return "nan"
+    try:
+        value = float(quantity)
+    except (TypeError, ValueError):
+        return f"invalid:{quantity!r}"
+    return "nan" if value != value else repr(value)
+
+def normalize_records(consumption_records: List[Dict]) -> List[Tuple[str, str]]:
+    """
+    消費記録を分析に影響する項目だけの正規形に変換
+
+    日付（先頭10文字）と消費量のみを残し、並び順に依存しないよう整列する
+    """
+    return sorted(
+        (str(record.get("consumption_date", ""))[:10], _normalize_quantity(record))
+        for record in consumption_records
+    )
+
+def make_cache_key(kind: str, consumption_records: List[Dict], **inputs: Any) -> str:
+    """
+    消費記録と在庫などの入力値から内容ベースのキャッシュキーを作成
+
+    Args:
+        kind: 結果の種類（'pattern', 'recommendation' など）
+        consumption_records: 消費記録のリスト
+        **inputs: 結果に影響するその他の入力値（在庫数・閾値など）
+
+    Returns:
+        str: キャッシュキー
+    """
+    payload = json.dumps(
+        [normalize_records(consumption_records), sorted(inputs.items())],
+        separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    return f"analysis:{kind}:{digest}"
+
+class AnalysisCache:
+    """
+    分析結果の内容アドレス型キャッシュ
+
+    プロセス内の LRU（件数上限・TTL付き）を1段目とし、REDIS_URL が
+    設定されている場合は Redis を共有の2段目として複数レプリカで
+    結果を共有する。Redis に接続できない間はプロセス内キャッシュのみで動作する。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 5000,
+        ttl_seconds: float = 300.0,
+        redis_url: Optional[str] = None,
+        redis_retry_seconds: float = 30.0
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.redis_retry_seconds = redis_retry_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._redis = None
+        self._redis_disabled_until = 0.0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "local_hits": 0,
+            "redis_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "redis_errors": 0
+        }
+
+        if redis_url and redis_asyncio is not None:
+            self._redis = redis_asyncio.from_url(
+                redis_url, socket_timeout=0.2, socket_connect_timeout=0.2
+            )
+        elif redis_url:
+            logger.warning("redis がインストールされていないため、共有キャッシュを使用しません")
+
+    def _redis_available(self) -> bool:
+        """Redis を使用できる状態かどうか"""
+        return self._redis is not None and time.monotonic() >= self._redis_disabled_until
+
+    def _redis_failed(self, e: Exception) -> None:
+        """Redis のエラーを記録し、一定時間は接続を試みない"""
+        self._stats["redis_errors"] += 1
+        self._redis_disabled_until = time.monotonic() + self.redis_retry_seconds
+        logger.warning(f"共有キャッシュ（Redis）にアクセスできません: {str(e)}")
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        """プロセス内キャッシュから取得（期限切れは削除）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any) -> None:
+        """プロセス内キャッシュに保存（上限を超えたら最も古いものから削除）"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """キャッシュから結果を取得（見つからない場合は None）"""
+        value = self._get_local(key)
+        if value is not None:
+            self._stats["hits"] += 1
+            self._stats["local_hits"] += 1
+            return value
+
+        if self._redis_available():
+            try:
+                raw = await self._redis.get(key)
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._set_local(key, value)
+                    self._stats["hits"] += 1
+                    self._stats["redis_hits"] += 1
+                    return value
+            except Exception as e:
+                self._redis_failed(e)
+
+        self._stats["misses"] += 1
+        return None
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        複数のキーをまとめて取得（見つからないものは None）
+
+        プロセス内キャッシュを先に確認し、残りは Redis の MGET 1回で取得する
+        """
+        values: List[Optional[Any]] = [self._get_local(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        local_hits = len(keys) - len(missing)
+        self._stats["hits"] += local_hits
+        self._stats["local_hits"] += local_hits
+
+        if missing and self._redis_available():
+            try:
+                raws = await self._redis.mget([keys[index] for index in missing])
+                for index, raw in zip(missing, raws):
+                    if raw is None:
+                        continue
+                    value = json.loads(raw)
+                    self._set_local(keys[index], value)
+                    values[index] = value
+                    self._stats["hits"] += 1
+                    self._stats["redis_hits"] += 1
+            except Exception as e:
+                self._redis_failed(e)
+
+        self._stats["misses"] += sum(1 for value in values if value is None)
+        return values
+
+    async def set(self, key: str, value: Any) -> None:
+        """結果をキャッシュに保存（JSONに変換できる値のみ）"""
+        self._set_local(key, value)
+        if self._redis_available():
+            try:
+                await self._redis.set(key, json.dumps(value, ensure_ascii=False), ex=max(int(self.ttl_seconds), 1))
+            except Exception as e:
+                self._redis_failed(e)
+
+    async def set_many(self, items: List[Tuple[str, Any]]) -> None:
+        """
+        複数の結果をまとめて保存
+
+        Redis にはパイプラインで有効期限付きの SET を1回の往復で送る
+        """
+        if not items:
+            return
+        for key, value in items:
+            self._set_local(key, value)
+        if self._redis_available():
+            try:
+                ttl = max(int(self.ttl_seconds), 1)
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for key, value in items:
+                        pipe.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+                    await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
+
+    def get_stats(self) -> Dict:
+        """ヒット率などの統計情報を取得"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "redis_enabled": self._redis is not None,
+            "redis_available": self._redis_available()
+        }
+
+    def clear(self) -> None:
+        """プロセス内キャッシュを空にする"""
+        self._entries.clear()
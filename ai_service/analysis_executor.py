@@ -0,0 +1,181 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+from consumption_analyzer import ConsumptionAnalyzer, ConsumptionSeries
+from recommendation_engine import RecommendationEngine
+
+logger = logging.getLogger(__name__)
+
+# 分析を実行するプロセスごとのサービスインスタンス
+# （ワーカーでは初期化時に作成し、リクエストごとの生成を避ける）
+_consumption_analyzer: Optional[ConsumptionAnalyzer] = None
+_recommendation_engine: Optional[RecommendationEngine] = None
+
+def _init_worker() -> None:
+    """ワーカープロセスの初期化（分析用インスタンスを事前に作成）"""
+    global _consumption_analyzer, _recommendation_engine
+    _consumption_analyzer = ConsumptionAnalyzer()
+    _recommendation_engine = RecommendationEngine()
+
+def stockout_daily_demands(records_list: List[List[Dict]]) -> List[np.ndarray]:
+    """
+    在庫切れリスク推定用の日別消費量を商品ごとに作成
+
+    記録を解析できない商品は空の系列とし（リスクは None になる）、
+    1商品の不正な記録でバッチ全体が失敗しないようにする
+    """
+    daily_demands = []
+    for records in records_list:
+        try:
+            daily_demands.append(ConsumptionSeries.from_records(records).dense_daily_totals())
+        except Exception as e:
+            logger.error(f"在庫切れリスク用の消費系列作成エラー: {str(e)}")
+            daily_demands.append(np.empty(0, dtype=np.float64))
+    return daily_demands
+
+def analyze_batch_inputs(
+    records_list: List[List[Dict]],
+    item_ids: List[Optional[int]],
+    stockout_inputs: List[Optional[Tuple[int, int]]]
+) -> Tuple[List[float], List[Optional[float]], List[Optional[Dict]]]:
+    """
+    バッチ推奨に必要な数値計算をまとめて実行（ワーカープロセスで実行可能）
+
+    Args:
+        records_list: 商品ごとの消費記録
+        item_ids: 商品ID（需要予測の状態キャッシュに使用）
+        stockout_inputs: 商品ごとの (現在庫, 最小在庫閾値)。在庫切れリスクを推定しない商品は None
+
+    Returns:
+        Tuple: 平均消費ペース、需要予測ペース、在庫切れリスク（いずれも商品順）
+    """
+    batch_analysis = _consumption_analyzer.analyze_batch(records_list)
+    forecast_paces = _consumption_analyzer.forecast_paces(records_list, item_ids)
+
+    stockout_risks: List[Optional[Dict]] = [None] * len(records_list)
+    targets = [index for index, inputs in enumerate(stockout_inputs) if inputs is not None]
+    if targets:
+        estimated = _recommendation_engine.estimate_stockout_risks(
+            stockout_daily_demands([records_list[index] for index in targets]),
+            [stockout_inputs[index][0] for index in targets],
+            [stockout_inputs[index][1] for index in targets]
+        )
+        for index, risk in zip(targets, estimated):
+            stockout_risks[index] = risk
+
+    return [float(pace) for pace in batch_analysis.paces], forecast_paces, stockout_risks
+
+class AnalysisExecutor:
+    """
+    CPU負荷の高い分析をプロセスプールで実行するエグゼキューター
+
+    イベントループ上で大きなバッチを計算すると、ヘルスチェックを含む
+    他のリクエストが待たされるため、一定件数以上の計算はワーカープロセスに
+    渡す。小さな計算はプロセス間通信のコストの方が大きいためその場で実行する。
+
+    需要予測の状態や季節指数のキャッシュはプロセスごとに持つため、
+    ワーカーはそれぞれ1プロセスのプールとし、商品キーのハッシュで
+    振り分ける。同じ商品は常に同じワーカーで計算されるためキャッシュが
+    温まったまま使われ、1つのバッチも複数のワーカーで並列に計算される。
+    ただし、その場で実行する小さなバッチや単体の推奨・予測は
+    アプリケーションプロセスのキャッシュを使うため、同じ商品でも
+    ワーカー側とは別に当てはめが行われる。
+    """
+
+    def __init__(
+        self,
+        consumption_analyzer: ConsumptionAnalyzer,
+        recommendation_engine: RecommendationEngine,
+        workers: int = 0,
+        inline_max_items: int = 20
+    ):
+        global _consumption_analyzer, _recommendation_engine
+        # その場で実行する場合はアプリケーションのインスタンスを共有する
+        _consumption_analyzer = consumption_analyzer
+        _recommendation_engine = recommendation_engine
+
+        self.workers = max(workers, 0)  # 0の場合はプロセスプールを使用しない
+        self.inline_max_items = inline_max_items  # この件数以下はその場で実行
+        self._pools: List[Optional[ProcessPoolExecutor]] = [None] * self.workers
+
+    def _get_pool(self, shard: int) -> ProcessPoolExecutor:
+        """担当ワーカーのプロセスプールを取得（初回使用時に起動）"""
+        if self._pools[shard] is None:
+            self._pools[shard] = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+            logger.info(f"分析用ワーカーを起動しました（{shard + 1}/{self.workers}）")
+        return self._pools[shard]
+
+    def _shard_of(self, key: Hashable, position: int) -> int:
+        """商品キーの担当ワーカー（キーがない商品は位置で分散）"""
+        if key is None:
+            return position % self.workers
+        return hash(key) % self.workers
+
+    async def run(self, func: Callable, keys: Sequence[Hashable], *columns: Sequence):
+        """
+        商品単位の分析関数を実行（件数が多い場合は商品キーごとのワーカーで実行）
+
+        Args:
+            func: モジュールレベルの分析関数。商品順の列を受け取り、
+                商品順の結果リストのタプルを返すこと（ワーカーに渡せること）
+            keys: 商品ごとのキー（同じキーは同じワーカーで計算する）
+            *columns: 商品順に並んだ引数の列
+
+        Returns:
+            Tuple: func の結果（各リストは入力の商品順）
+        """
+        if self.workers == 0 or len(keys) <= self.inline_max_items:
+            return func(*columns)
+
+        positions_by_shard: Dict[int, List[int]] = {}
+        for position, key in enumerate(keys):
+            positions_by_shard.setdefault(self._shard_of(key, position), []).append(position)
+
+        shard_results = await asyncio.gather(*[
+            self._run_shard(shard, func, [[column[i] for i in positions] for column in columns])
+            for shard, positions in positions_by_shard.items()
+        ])
+
+        # ワーカーごとの結果を入力の商品順に戻す
+        merged = None
+        for positions, result in zip(positions_by_shard.values(), shard_results):
+            if merged is None:
+                merged = tuple([None] * len(keys) for _ in result)
+            for output, values in zip(merged, result):
+                for position, value in zip(positions, values):
+                    output[position] = value
+        return merged
+
+    async def _run_shard(self, shard: int, func: Callable, columns: List[List]):
+        """担当ワーカーで実行（ワーカーが異常終了した場合は作り直し、今回はその場で実行）"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(shard), func, *columns)
+        except BrokenProcessPool as e:
+            logger.error(f"プロセスプールでの分析に失敗しました: {str(e)}")
+            self._shutdown_pool(shard)
+            return func(*columns)
+
+    def _shutdown_pool(self, shard: int) -> None:
+        """担当ワーカーのプロセスプールを停止"""
+        pool = self._pools[shard]
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pools[shard] = None
+
+    def shutdown(self) -> None:
+        """全てのプロセスプールを停止"""
+        for shard in range(self.workers):
+            self._shutdown_pool(shard)
+
+def default_worker_count() -> int:
+    """AI_ANALYSIS_WORKERS が未設定の場合のワーカー数（使用可能なコア数、最大4）"""
+    configured = os.getenv("AI_ANALYSIS_WORKERS")
+    if configured is not None:
+        return max(int(configured), 0)
+    return min(os.cpu_count() or 1, 4)
@@ -0,0 +1,68 @@
+"""
+バッチ分析（analyze_batch_inputs）をワーカー数 0〜N で実行した時間の比較
+
+商品キーごとにワーカーへ振り分けるため、同じバッチの2回目は各ワーカーの
+需要予測キャッシュが温まった状態で計算される（cold / warm）。複数バッチの
+同時実行でコア数に対するスループットを測る。
+
+実行方法（ai_service ディレクトリで）:
+    python benchmarks/bench_analysis_executor.py [最大ワーカー数]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_executor import AnalysisExecutor, analyze_batch_inputs  # noqa: E402
+from consumption_analyzer import ConsumptionAnalyzer  # noqa: E402
+from recommendation_engine import RecommendationEngine  # noqa: E402
+from tests.test_consumption_analyzer import random_records  # noqa: E402
+
+ITEM_COUNT = 1000
+CONCURRENT_BATCHES = 4
+
+def batch_columns(rng: random.Random, first_item_id: int):
+    """analyze_batch_inputs の引数（商品ID・消費記録・在庫切れリスクの入力）"""
+    item_ids = list(range(first_item_id, first_item_id + ITEM_COUNT))
+    records_list = [random_records(rng) for _ in item_ids]
+    stockout_inputs = [(rng.randint(0, 20), 1) if rng.random() < 0.5 else None for _ in item_ids]
+    return item_ids, records_list, item_ids, stockout_inputs
+
+async def timed(executor: AnalysisExecutor, columns) -> float:
+    started = time.perf_counter()
+    await executor.run(analyze_batch_inputs, columns[0], *columns[1:])
+    return (time.perf_counter() - started) * 1e3
+
+async def measure(workers: int, batches) -> None:
+    executor = AnalysisExecutor(ConsumptionAnalyzer(), RecommendationEngine(), workers=workers, inline_max_items=0)
+    try:
+        # ワーカーの起動時間を除くため、別の商品で1回実行しておく
+        await timed(executor, batch_columns(random.Random(99), 10 ** 6))
+
+        cold_ms = await timed(executor, batches[0])
+        warm_ms = await timed(executor, batches[0])
+
+        started = time.perf_counter()
+        await asyncio.gather(*[executor.run(analyze_batch_inputs, b[0], *b[1:]) for b in batches])
+        elapsed = time.perf_counter() - started
+        throughput = ITEM_COUNT * len(batches) / elapsed
+        print(
+            f"  workers={workers}  1 batch cold {cold_ms:7.1f} ms  warm {warm_ms:7.1f} ms"
+            f"  {len(batches)} concurrent batches {throughput:8.0f} items/s"
+        )
+    finally:
+        executor.shutdown()
+
+def main() -> None:
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else min(os.cpu_count() or 1, 4)
+    rng = random.Random(1)
+    batches = [batch_columns(rng, index * ITEM_COUNT) for index in range(CONCURRENT_BATCHES)]
+    print(f"{ITEM_COUNT} items per batch, cpu_count={os.cpu_count()}")
+    for workers in range(0, max_workers + 1):
+        asyncio.run(measure(workers, batches))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+市場データの部分一致検索（CatalogIndex と旧来の線形走査）の時間比較
+
+実行方法（ai_service ディレクトリで）:
+    python benchmarks/bench_catalog_index.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_index import CatalogIndex  # noqa: E402
+from tests import reference  # noqa: E402
+
+CHARACTERS = [chr(code) for code in range(0x30A1, 0x30F6)] + list("米肉茶油塩乳卵紙石鹸洗剤")
+QUERY_COUNT = 1000
+
+def random_word(rng: random.Random, shortest: int, longest: int) -> str:
+    return "".join(rng.choice(CHARACTERS) for _ in range(rng.randint(shortest, longest)))
+
+def main() -> None:
+    rng = random.Random(1)
+    print(f"{'catalog':>8} {'build ms':>10} {'index us/query':>16} {'linear us/query':>17}")
+    for size in (100, 10_000, 100_000):
+        keys = list(dict.fromkeys(random_word(rng, 2, 8) for _ in range(size)))
+        queries = [
+            rng.choice(keys)[1:-1] if rng.random() < 0.3
+            else random_word(rng, 1, 3) + rng.choice(keys) + random_word(rng, 0, 3) if rng.random() < 0.5
+            else random_word(rng, 3, 10)
+            for _ in range(QUERY_COUNT)
+        ]
+
+        started = time.perf_counter()
+        index = CatalogIndex(keys)
+        index.match(keys[0])  # オートマトンは最初の検索時に構築されるため構築時間に含める
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index.match_many(queries)
+        index_seconds = (time.perf_counter() - started) / len(queries)
+
+        # 線形走査は大きなカタログでは遅いため件数を絞って計測
+        linear_queries = queries[:200] if size >= 10_000 else queries
+        started = time.perf_counter()
+        for query in linear_queries:
+            reference.first_contained_key(keys, query)
+        linear_seconds = (time.perf_counter() - started) / len(linear_queries)
+
+        print(
+            f"{len(keys):>8} {build_seconds * 1e3:>10.1f} "
+            f"{index_seconds * 1e6:>16.1f} {linear_seconds * 1e6:>17.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
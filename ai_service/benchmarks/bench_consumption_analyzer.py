@@ -0,0 +1,46 @@
+"""
+ConsumptionAnalyzer（NumPy 版）と pandas 版の分析時間の比較
+
+実行方法（ai_service ディレクトリで）:
+    python benchmarks/bench_consumption_analyzer.py
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumption_analyzer import ConsumptionAnalyzer, ConsumptionSeries  # noqa: E402
+from tests import reference  # noqa: E402
+
+REPEAT = 300
+
+def per_call_us(func, argument) -> float:
+    """1回あたりの実行時間（マイクロ秒）"""
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        func(argument)
+    return (time.perf_counter() - started) / REPEAT * 1e6
+
+def main() -> None:
+    analyzer = ConsumptionAnalyzer()
+    print(f"{'records':>8} {'pandas':>12} {'numpy':>12} {'numpy+series':>14}  (us/call)")
+    for count in (30, 100, 500):
+        records = [
+            {
+                "consumption_date": (date(2024, 1, 1) + timedelta(days=index * 2)).isoformat(),
+                "consumed_quantity": index % 4 + 1
+            }
+            for index in range(count)
+        ]
+        series = ConsumptionSeries.from_records(records)
+        print(
+            f"{count:>8} "
+            f"{per_call_us(reference.consumption_pattern, records):>12.1f} "
+            f"{per_call_us(analyzer.analyze_consumption_pattern, records):>12.1f} "
+            f"{per_call_us(analyzer.analyze_consumption_pattern, series):>14.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
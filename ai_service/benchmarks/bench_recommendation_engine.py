@@ -0,0 +1,47 @@
+"""
+一括推奨生成（商品ごとのループと列単位の NumPy 計算）の時間比較
+
+実行方法（ai_service ディレクトリで）:
+    python benchmarks/bench_recommendation_engine.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommendation_engine import DETAIL_SUMMARY, RecommendationEngine  # noqa: E402
+from tests.test_recommendation_engine import random_items  # noqa: E402
+
+ITEM_COUNT = 10000
+REPEAT = 5
+
+def best_ms(func, *args) -> float:
+    """REPEAT 回のうち最短の実行時間（ミリ秒）"""
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1e3
+
+def main() -> None:
+    engine = RecommendationEngine()
+    items = random_items(random.Random(1), ITEM_COUNT)
+    columns = [
+        [item[key] for item in items]
+        for key in ("user_pace", "market_pace", "current_quantity", "minimum_threshold", "target_stock_level", "stockout_risk")
+    ]
+
+    print(f"{ITEM_COUNT} items")
+    print(f"  per-item loop     {best_ms(engine._batch_generate_recommendations_scalar, items):7.1f} ms")
+    print(f"  columnar total    {best_ms(engine.batch_generate_recommendations, items):7.1f} ms")
+    print(f"  numeric columns   {best_ms(engine.generate_recommendation_columns, *columns):7.1f} ms")
+
+    summary_items = [{**item, "detail": DETAIL_SUMMARY} for item in items]
+    print(f"  per-item loop (summary)   {best_ms(engine._batch_generate_recommendations_scalar, summary_items):7.1f} ms")
+    print(f"  columnar total (summary)  {best_ms(engine.batch_generate_recommendations, summary_items):7.1f} ms")
+
+if __name__ == "__main__":
+    main()
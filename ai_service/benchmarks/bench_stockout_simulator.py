@@ -0,0 +1,49 @@
+"""
+在庫切れリスクのモンテカルロ推定（1商品ずつと一括）の時間比較
+
+実行方法（ai_service ディレクトリで）:
+    python benchmarks/bench_stockout_simulator.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stockout_simulator import StockoutSimulator  # noqa: E402
+from tests.test_stockout_simulator import random_demand  # noqa: E402
+
+ITEM_COUNTS = (1, 10, 100, 1000)
+REPEAT = 3
+
+def best_ms(func, *args) -> float:
+    """REPEAT 回のうち最短の実行時間（ミリ秒）"""
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1e3
+
+def main() -> None:
+    simulator = StockoutSimulator()
+    rng = random.Random(1)
+    print(f"paths={simulator.paths} horizon_days={simulator.horizon_days}")
+    for item_count in ITEM_COUNTS:
+        demands = [random_demand(rng) for _ in range(item_count)]
+        usable = [rng.randint(0, 60) for _ in demands]
+
+        def per_item():
+            for demand, quantity in zip(demands, usable):
+                simulator.simulate(demand, quantity)
+
+        loop_ms = best_ms(per_item)
+        batch_ms = best_ms(simulator.simulate_many, demands, usable)
+        print(
+            f"{item_count:5d} items  per-item {loop_ms:8.1f} ms ({loop_ms / item_count:5.2f} ms/item)"
+            f"  batch {batch_ms:8.1f} ms ({batch_ms / item_count:5.2f} ms/item)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+トレンド推定（商品ごとの np.polyfit と閉形式のグループ計算）の時間比較
+
+実行方法（ai_service ディレクトリで）:
+    python benchmarks/bench_trend_estimator.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests import reference  # noqa: E402
+from trend_estimator import TrendEstimator  # noqa: E402
+
+ITEM_COUNT = 10000
+POINTS_PER_ITEM = 30
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    days = np.sort(rng.integers(0, 90, (ITEM_COUNT, POINTS_PER_ITEM)), axis=1) + 19000
+    values = rng.integers(0, 4, (ITEM_COUNT, POINTS_PER_ITEM)).astype(np.float64)
+    groups = np.repeat(np.arange(ITEM_COUNT), POINTS_PER_ITEM)
+    first_days = days[:, 0]
+
+    started = time.perf_counter()
+    for item in range(ITEM_COUNT):
+        reference.polyfit_slope(days[item] - first_days[item], values[item])
+    polyfit_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    TrendEstimator().slopes(days.ravel(), values.ravel(), groups, ITEM_COUNT, first_days=first_days)
+    grouped_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    TrendEstimator(robust=True).slopes(days.ravel(), values.ravel(), groups, ITEM_COUNT, first_days=first_days)
+    robust_seconds = time.perf_counter() - started
+
+    print(f"{ITEM_COUNT} items x {POINTS_PER_ITEM} points")
+    print(f"  polyfit loop         {polyfit_seconds:.3f} s")
+    print(f"  grouped closed form  {grouped_seconds:.4f} s")
+    print(f"  robust (Theil-Sen)   {robust_seconds:.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+backend → ai_service のバッチ推奨ペイロード（JSON と msgpack + gzip）のサイズと時間の比較
+
+実行方法（ai_service ディレクトリで）:
+    python benchmarks/bench_wire_format.py
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wire_format import decode_payload, encode_payload  # noqa: E402
+
+CASES = ((50, 30), (50, 365), (500, 90))  # (商品数, 商品あたりの消費記録数)
+REPEAT = 5
+
+def batch_payload(rng: random.Random, item_count: int, record_count: int):
+    """backend が送るバッチ推奨リクエストと同じ形のペイロード"""
+    start = date(2024, 1, 1)
+    return [
+        {
+            "user_id": 1,
+            "item_data": {
+                "item_id": index,
+                "item_name": f"商品{index}",
+                "consumption_records": [
+                    {
+                        "consumption_date": (start + timedelta(days=rng.randint(0, 365))).isoformat(),
+                        "consumed_quantity": rng.choice([1, 1, 2, 3]),
+                        "notes": rng.choice([None, "", "まとめ買い"])
+                    }
+                    for _ in range(record_count)
+                ],
+                "current_quantity": rng.randint(0, 20),
+                "minimum_threshold": 1
+            },
+            "stockout_risk": True,
+            "detail": "full"
+        }
+        for index in range(item_count)
+    ]
+
+def best_ms(func, *args) -> float:
+    """REPEAT 回のうち最短の実行時間（ミリ秒）"""
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1e3
+
+def main() -> None:
+    rng = random.Random(1)
+    for item_count, record_count in CASES:
+        payload = batch_payload(rng, item_count, record_count)
+        json_body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        compact_body = encode_payload(payload)
+
+        print(f"{item_count} items x {record_count} records")
+        print(
+            f"  json            {len(json_body) / 1024:9.1f} KiB"
+            f"  encode {best_ms(lambda: json.dumps(payload, ensure_ascii=False).encode('utf-8')):7.1f} ms"
+            f"  decode {best_ms(json.loads, json_body):7.1f} ms"
+        )
+        print(
+            f"  msgpack + gzip  {len(compact_body) / 1024:9.1f} KiB"
+            f"  encode {best_ms(encode_payload, payload):7.1f} ms"
+            f"  decode {best_ms(decode_payload, compact_body):7.1f} ms"
+            f"  ({len(compact_body) / len(json_body):.1%} of json)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CatalogIndex:
+    """
+    カタログのキーに対する部分文字列マッチングの索引
+
+    - 正方向（キーが商品名に含まれる）: キー全体の Aho-Corasick オートマトンで
+      商品名を1回走査して、含まれるキーをすべて検出する
+    - 逆方向（商品名がキーに含まれる）: キーの文字 n-gram の転置索引のうち
+      最も件数の少ない posting を優先順位の順に検証し、最初に一致したキーを返す
+
+    照合は小文字化して行い、一致した部分が最も長いものを優先する。
+    同じ長さの場合は余分な文字の少ない（短い）キー、さらに同じ場合は
+    カタログへの登録順が早いキーを返すため、結果は常に一意に定まる。
+    """
+
+    def __init__(self, keys: Iterable[str] = (), ngram_size: int = 2):
+        self.ngram_size = ngram_size
+        self._keys: List[str] = []  # 登録順のキー（元の表記）
+        self._normalized: List[str] = []  # 小文字化したキー
+        self._positions: Dict[str, int] = {}  # キー → 登録順
+
+        # Aho-Corasick オートマトン（ノード番号で管理）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._terminal: List[int] = [-1]  # ノードで終わるキーの番号（なければ -1）
+        self._best: List[int] = [-1]  # ノードで終わる最長のキーの番号（失敗リンク経由を含む）
+        self._automaton_ready = True
+
+        # 逆方向用の n-gram 転置索引（posting は検索前にキーの長さ・登録順の昇順に並べ替える）
+        self._postings: Dict[str, List[int]] = {}
+        self._unsorted_grams: Set[str] = set()
+
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    def _ngrams(self, text: str, size: int) -> Set[str]:
+        """文字 n-gram の集合"""
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def add(self, key: str) -> None:
+        """キーを索引に追加（登録済みのキーは無視）"""
+        if key in self._positions or not key:
+            return
+
+        index = len(self._keys)
+        normalized = key.lower()
+        self._keys.append(key)
+        self._normalized.append(normalized)
+        self._positions[key] = index
+
+        # トライに追加（失敗リンクは次回の検索時にまとめて再計算）
+        node = 0
+        for char in normalized:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append(-1)
+                self._best.append(-1)
+            node = next_node
+        if self._terminal[node] == -1:
+            self._terminal[node] = index
+        self._automaton_ready = False
+
+        # 1文字の商品名にも対応するため、1-gram と n-gram の両方を登録
+        for size in {1, self.ngram_size}:
+            for gram in self._ngrams(normalized, size):
+                self._postings.setdefault(gram, []).append(index)
+                self._unsorted_grams.add(gram)
+
+    def _build_automaton(self) -> None:
+        """失敗リンクと各ノードの最長一致キーを幅優先で計算（追加のあった posting も並べ替える）"""
+        for gram in self._unsorted_grams:
+            self._postings[gram].sort(key=lambda index: len(self._normalized[index]))
+        self._unsorted_grams.clear()
+
+        self._best[0] = -1
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._best[child] = self._terminal[child]
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # ノードで終わるキーはそのノードで終わるキーの中で最長
+                self._best[child] = self._terminal[child] if self._terminal[child] != -1 else self._best[self._fail[child]]
+                queue.append(child)
+
+        self._automaton_ready = True
+
+    def _rank(self, index: int, match_length: int) -> Tuple[int, int, int]:
+        """候補の優先順位（小さいほど優先）"""
+        return (-match_length, len(self._normalized[index]), index)
+
+    def _contained_keys(self, text: str) -> Optional[int]:
+        """商品名に含まれるキーのうち最長のもの（正方向）"""
+        if not self._automaton_ready:
+            self._build_automaton()
+
+        best: Optional[Tuple[int, int, int]] = None
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            candidate = self._best[node]
+            if candidate != -1:
+                rank = self._rank(candidate, len(self._normalized[candidate]))
+                if best is None or rank < best:
+                    best = rank
+        return best[2] if best is not None else None
+
+    def _containing_keys(self, text: str) -> Optional[int]:
+        """商品名を含むキーのうち最も短いもの（逆方向）"""
+        if not self._automaton_ready:
+            self._build_automaton()
+
+        size = self.ngram_size if len(text) >= self.ngram_size else 1
+        postings = [self._postings.get(gram) for gram in self._ngrams(text, size)]
+        if not postings or not all(postings):
+            return None
+
+        # 商品名を含むキーは全ての n-gram の posting に含まれるため、最も短い posting だけを
+        # 優先順位（短いキー → 登録順）の順に検証し、最初に一致したものを返す
+        for index in min(postings, key=len):
+            if text in self._normalized[index]:
+                return index
+        return None
+
+    def match(self, item_name: str) -> Optional[str]:
+        """
+        商品名に最もよく一致するキーを検索
+
+        Args:
+            item_name: 商品名
+
+        Returns:
+            Optional[str]: 一致したキー（元の表記）。一致しない場合は None
+        """
+        text = item_name.lower()
+        if not text or not self._keys:
+            return None
+
+        candidates = []
+        forward = self._contained_keys(text)
+        if forward is not None:
+            candidates.append(self._rank(forward, len(self._normalized[forward])))
+        reverse = self._containing_keys(text)
+        if reverse is not None:
+            candidates.append(self._rank(reverse, len(text)))
+
+        if not candidates:
+            return None
+        return self._keys[min(candidates)[2]]
+
+    def match_many(self, item_names: Iterable[str]) -> List[Optional[str]]:
+        """複数の商品名をまとめて検索（同じ商品名は1回だけ照合）"""
+        item_names = list(item_names)
+        if not self._automaton_ready:
+            self._build_automaton()
+        resolved = {name: self.match(name) for name in dict.fromkeys(item_names)}
+        return [resolved[name] for name in item_names]
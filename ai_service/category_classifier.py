@@ -0,0 +1,62 @@
+from typing import Dict, Iterable, List, Optional
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "category_rules.json")
+
+class CategoryClassifier:
+    """
+    キーワード規則による商品カテゴリの分類器
+
+    各カテゴリのキーワードを1つの正規表現（選択パターン）にコンパイルし、
+    priority の小さい規則から順に照合して最初に一致したカテゴリを返す。
+    同じ優先度の規則は規則ファイルでの記載順に照合する。
+    """
+
+    def __init__(self, rules: List[Dict], default_category: str = "staple_food"):
+        self.default_category = default_category
+        self._patterns = []  # (コンパイル済みパターン, カテゴリ)
+
+        for rule in sorted(rules, key=lambda rule: rule.get("priority", 100)):
+            keywords = [keyword for keyword in rule.get("keywords", []) if keyword]
+            if not keywords:
+                continue
+            # 長いキーワードを先に並べ、選択パターンで短いキーワードに先取りされないようにする
+            pattern = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+            self._patterns.append((re.compile(pattern), rule["category"]))
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "CategoryClassifier":
+        """
+        規則ファイル（JSON）から分類器を作成
+
+        読み込みに失敗した場合は規則なし（常にデフォルトカテゴリ）で動作する
+        """
+        path = path or os.getenv("CATEGORY_RULES_PATH", DEFAULT_RULES_PATH)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            classifier = cls(data.get("rules", []), data.get("default_category", "staple_food"))
+            logger.info(f"カテゴリ分類規則を読み込みました: {path}（version {data.get('version')}）")
+            return classifier
+        except Exception as e:
+            logger.error(f"カテゴリ分類規則の読み込みエラー: {str(e)}")
+            return cls([])
+
+    def classify_one(self, item_name: str) -> str:
+        """商品名からカテゴリを推定"""
+        item_name_lower = item_name.lower()
+        for pattern, category in self._patterns:
+            if pattern.search(item_name_lower):
+                return category
+        return self.default_category
+
+    def classify(self, item_names: Iterable[str]) -> List[str]:
+        """複数の商品名のカテゴリをまとめて推定（同じ商品名は1回だけ照合）"""
+        item_names = list(item_names)
+        resolved = {name: self.classify_one(name) for name in dict.fromkeys(item_names)}
+        return [resolved[name] for name in item_names]
@@ -0,0 +1,291 @@
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from consumption_analyzer import ConsumptionSeries
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ForecastState:
+    """商品ごとの需要予測の状態（新しい消費記録で逐次更新できる）"""
+    method: str  # 'croston_sba'（間欠需要）または 'ses'（単純指数平滑）
+    level: float  # SES: 1日あたりの平滑化水準 / Croston: 平滑化された1回あたりの消費量
+    interval: float  # Croston: 平滑化された消費間隔（日）。SESでは1.0
+    last_day: int  # 最後に反映した日（エポック日数）
+    last_demand_day: int  # 最後に消費があった日（エポック日数）
+    first_demand_day: int  # 最初に消費があった日（エポック日数）
+    demand_count: int  # 消費があった日数
+    adi: float  # 平均需要間隔（Average Demand Interval）
+
+class DemandForecaster:
+    """
+    間欠需要に対応した消費量予測
+
+    消費間隔が空く商品（平均需要間隔がしきい値以上）は Croston 法の
+    SBA 補正版、毎日のように消費する商品は単純指数平滑で1日あたりの
+    需要を推定する。どちらも閉形式の重み付き和で計算するため、
+    複数商品をまとめてベクトル化して当てはめられる。
+    初期値は先頭の消費記録だけで決まるため、逐次更新した状態と
+    同じ系列から当てはめ直した状態は一致する。
+    """
+
+    def __init__(self, alpha: float = 0.1, intermittency_threshold: float = 1.32, cache_size: int = 10000):
+        self.alpha = alpha  # 平滑化係数
+        self.intermittency_threshold = intermittency_threshold  # 間欠需要と判定するADI
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Hashable, Tuple[ForecastState, np.ndarray, np.ndarray]]" = OrderedDict()
+
+    def daily_rate(self, state: ForecastState) -> float:
+        """状態から1日あたりの予測需要を取得"""
+        if state.method == 'croston_sba':
+            if state.interval <= 0:
+                return 0.0
+            return state.level / state.interval * (1 - self.alpha / 2)
+        return state.level
+
+    def fit_many(self, series_list: Sequence["ConsumptionSeries"]) -> List[Optional[ForecastState]]:
+        """
+        複数商品の予測状態をまとめて当てはめ
+
+        Returns:
+            List[Optional[ForecastState]]: 商品順の状態（消費のない商品は None）
+        """
+        item_count = len(series_list)
+        if item_count == 0:
+            return []
+
+        alpha = self.alpha
+        decay = 1 - alpha
+
+        # 全商品の日別消費を連結し、消費量が0より大きい日だけを需要イベントとする
+        all_days = np.concatenate([series.days for series in series_list]).astype(np.int64)
+        all_totals = np.concatenate([series.daily_totals for series in series_list]).astype(np.float64)
+        all_groups = np.repeat(
+            np.arange(item_count), [len(series.days) for series in series_list]
+        )
+        demand = all_totals > 0
+        days, sizes, groups = all_days[demand], all_totals[demand], all_groups[demand]
+        lengths = np.bincount(groups, minlength=item_count)
+        if len(days) == 0:
+            return [None] * item_count
+
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        has_events = lengths > 0
+
+        # 各イベントの「最後のイベントから数えた位置」と「最初のイベントからの位置」
+        positions = np.arange(len(days)) - starts[groups]
+        from_end = lengths[groups] - 1 - positions
+
+        first_days = np.zeros(item_count, dtype=np.int64)
+        last_days = np.zeros(item_count, dtype=np.int64)
+        first_days[has_events] = days[starts[has_events]]
+        last_days[has_events] = days[ends[has_events] - 1]
+        first_sizes = np.zeros(item_count)
+        first_sizes[has_events] = sizes[starts[has_events]]
+        multiple = lengths > 1
+        first_intervals = np.ones(item_count)
+        first_intervals[multiple] = days[starts[multiple] + 1] - days[starts[multiple]]
+
+        spans = last_days - first_days + 1
+        adi = np.where(has_events, spans / np.maximum(lengths, 1), 0.0)
+
+        # Croston: z_k = z_{k-1} + α(s_k - z_{k-1})（初期値は最初の消費量）
+        later = positions > 0
+        size_weights = np.where(later, alpha * decay ** from_end, 0.0)
+        levels = decay ** np.maximum(lengths - 1, 0) * first_sizes + \
+            np.bincount(groups, weights=size_weights * sizes, minlength=item_count)
+
+        # Croston: p_k = p_{k-1} + α(q_k - p_{k-1})（初期値は最初の消費間隔）
+        previous_days = np.where(later, np.roll(days, 1), days)
+        event_intervals = (days - previous_days).astype(np.float64)
+        interval_weights = np.where(positions > 1, alpha * decay ** from_end, 0.0)
+        intervals = decay ** np.maximum(lengths - 2, 0) * first_intervals + \
+            np.bincount(groups, weights=interval_weights * event_intervals, minlength=item_count)
+
+        # SES: 最初の消費日から最後の消費日まで0を含む日次系列を平滑化（初期値は最初の消費量）
+        day_weights = np.where(later, alpha * decay ** (last_days[groups] - days), 0.0)
+        ses_levels = decay ** (spans - 1) * first_sizes + \
+            np.bincount(groups, weights=day_weights * sizes, minlength=item_count)
+
+        intermittent = adi >= self.intermittency_threshold
+        fitted_levels = np.where(intermittent, levels, ses_levels).tolist()
+        fitted_intervals = np.where(intermittent, intervals, 1.0).tolist()
+        methods = np.where(intermittent, 'croston_sba', 'ses').tolist()
+        observed_days = np.maximum(
+            np.array([series.last_day for series in series_list], dtype=np.int64), last_days
+        ).tolist()
+        last_days, first_days = last_days.tolist(), first_days.tolist()
+        lengths, adi = lengths.tolist(), adi.tolist()
+
+        return [
+            ForecastState(
+                method=methods[index],
+                level=fitted_levels[index],
+                interval=fitted_intervals[index],
+                last_day=observed_days[index],
+                last_demand_day=last_days[index],
+                first_demand_day=first_days[index],
+                demand_count=lengths[index],
+                adi=adi[index]
+            ) if lengths[index] > 0 else None
+            for index in range(item_count)
+        ]
+
+    def fit(self, series: "ConsumptionSeries") -> Optional[ForecastState]:
+        """1商品の予測状態を当てはめ"""
+        return self.fit_many([series])[0]
+
+    def update(self, state: ForecastState, day: int, quantity: float) -> Optional[ForecastState]:
+        """
+        新しい消費記録で予測状態を逐次更新
+
+        渡された状態は変更せず、更新後の状態を新しく返す。
+
+        Returns:
+            Optional[ForecastState]: 更新後の状態（過去日の記録や、平均需要間隔が
+            しきい値をまたいで予測手法が変わるなど逐次更新できない場合は None）
+        """
+        alpha = self.alpha
+        if day < state.last_day or quantity < 0:
+            return None
+        state = replace(state, last_day=day)
+        if quantity == 0:
+            return state
+
+        if day == state.last_demand_day:
+            # 同じ日の追加分は当日の反映量に線形に加わる（最初の消費日は初期値そのもの）
+            state.level += quantity if state.demand_count == 1 else alpha * quantity
+            return state
+
+        if state.method == 'ses':
+            # 消費のなかった日を0として平滑化してから当日分を反映
+            state.level *= (1 - alpha) ** (day - state.last_demand_day - 1)
+            state.level += alpha * (quantity - state.level)
+        else:
+            state.level += alpha * (quantity - state.level)
+            state.interval += alpha * ((day - state.last_demand_day) - state.interval)
+
+        state.demand_count += 1
+        state.last_demand_day = day
+        state.adi = (day - state.first_demand_day + 1) / state.demand_count
+        method = 'croston_sba' if state.adi >= self.intermittency_threshold else 'ses'
+        if method != state.method:
+            return None
+        return state
+
+    def _match_cached(
+        self,
+        cached_days: np.ndarray,
+        cached_totals: np.ndarray,
+        series: "ConsumptionSeries"
+    ) -> Optional[Tuple[float, np.ndarray]]:
+        """
+        キャッシュ済みの系列に対する追加分を取得
+
+        新しい系列が同じ日から始まり、重なり部分がキャッシュ時と一致する
+        場合のみ、最終日の増加量と最終日以降の日別消費を返す
+        （古い記録が期間外になった系列は当てはめ直す）
+        """
+        if len(cached_days) == 0 or len(series.days) == 0:
+            return None
+        if series.days[0] != cached_days[0]:
+            return None
+
+        cached_last = cached_days[-1]
+        overlap = series.days <= cached_last
+        cached_overlap = cached_days >= series.days[0]
+
+        new_days, new_totals = series.days[overlap], series.daily_totals[overlap]
+        old_days, old_totals = cached_days[cached_overlap], cached_totals[cached_overlap]
+        if len(new_days) != len(old_days) or not np.array_equal(new_days, old_days):
+            return None
+        if len(new_days) == 0:
+            extra = 0.0
+        else:
+            if not np.array_equal(new_totals[:-1], old_totals[:-1]) or new_totals[-1] < old_totals[-1]:
+                return None
+            extra = float(new_totals[-1] - old_totals[-1]) if new_days[-1] == cached_last else 0.0
+
+        return extra, np.flatnonzero(~overlap)
+
+    def get_state(self, series: "ConsumptionSeries", item_id: Optional[Hashable] = None) -> Optional[ForecastState]:
+        """予測状態を取得（商品IDがあればキャッシュを逐次更新して再利用）"""
+        return self.get_states([series], [item_id])[0]
+
+    def get_states(
+        self,
+        series_list: Sequence["ConsumptionSeries"],
+        item_ids: Optional[Sequence[Optional[Hashable]]] = None
+    ) -> List[Optional[ForecastState]]:
+        """複数商品の予測状態を取得（キャッシュにない商品だけをまとめて当てはめ）"""
+        item_ids = list(item_ids) if item_ids is not None else [None] * len(series_list)
+        states: List[Optional[ForecastState]] = [None] * len(series_list)
+        refit = []
+
+        for index, (series, item_id) in enumerate(zip(series_list, item_ids)):
+            cached = self._cache.get(item_id) if item_id is not None else None
+            if cached is None:
+                refit.append(index)
+                continue
+
+            state, cached_days, cached_totals = cached
+            match = self._match_cached(cached_days, cached_totals, series)
+            if match is None:
+                refit.append(index)
+                continue
+
+            extra, new_positions = match
+            updated: Optional[ForecastState] = state
+            if extra > 0:
+                updated = self.update(updated, int(cached_days[-1]), extra)
+            for position in new_positions:
+                if updated is None:
+                    break
+                updated = self.update(updated, int(series.days[position]), float(series.daily_totals[position]))
+
+            if updated is None:
+                refit.append(index)
+                continue
+            states[index] = updated
+            self._store(item_id, updated, series)
+
+        if refit:
+            fitted = self.fit_many([series_list[index] for index in refit])
+            for index, state in zip(refit, fitted):
+                states[index] = state
+                if state is not None and item_ids[index] is not None:
+                    self._store(item_ids[index], state, series_list[index])
+
+        return states
+
+    def _store(self, item_id: Hashable, state: ForecastState, series: "ConsumptionSeries") -> None:
+        """予測状態をキャッシュに保存（LRUで上限を超えたものから削除）"""
+        self._cache[item_id] = (state, series.days.copy(), series.daily_totals.copy())
+        self._cache.move_to_end(item_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def forecast(self, series: "ConsumptionSeries", days_ahead: int, item_id: Optional[Hashable] = None) -> Dict:
+        """
+        指定日数分の消費量を予測
+
+        Returns:
+            Dict: 予測手法・1日あたりの予測需要・期間中の予測消費量
+        """
+        state = self.get_state(series, item_id)
+        if state is None:
+            return {"forecast_method": "none", "daily_rate": 0.0, "predicted_consumption": 0.0}
+
+        rate = self.daily_rate(state)
+        return {
+            "forecast_method": state.method,
+            "daily_rate": rate,
+            "predicted_consumption": rate * days_ahead,
+            "average_demand_interval": state.adi
+        }
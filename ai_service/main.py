@@ -1,25 +1,103 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict
 from datetime import datetime, date, timedelta
 import httpx
 import os
 import json
+import asyncio
 import logging
+from dataclasses import asdict
 from consumption_analyzer import ConsumptionAnalyzer
-from recommendation_engine import RecommendationEngine
+from recommendation_engine import DETAIL_FULL, RecommendationDetail, RecommendationEngine
 from market_data_service import MarketDataService
+from analysis_cache import AnalysisCache, make_cache_key
+from analysis_executor import AnalysisExecutor, analyze_batch_inputs, default_worker_count, stockout_daily_demands
+from wire_format import (
+    COMPACT_CONTENT_ENCODING,
+    COMPACT_MEDIA_TYPE,
+    accepts_compact,
+    decode_payload,
+    encode_payload,
+    is_compact_available,
+    is_compact_content_type,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class CompactRequest(Request):
+    """msgpack + gzip 形式のリクエストボディをJSON互換オブジェクトとして扱うリクエスト"""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = decode_payload(await self.body())
+        return self._json
+
+class CompactRoute(APIRoute):
+    """コンパクト形式（msgpack + gzip）とJSONの両方に対応するルート"""
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def compact_route_handler(request: Request) -> Response:
+            compact_request = is_compact_content_type(request.headers.get("content-type"))
+            compact_response = accepts_compact(request.headers.get("accept"))
+
+            if compact_request:
+                if not is_compact_available():
+                    return Response(status_code=415)
+                # 以降のボディ解析はJSONとして扱わせる
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (key, value) for key, value in request.scope["headers"]
+                    if key != b"content-type"
+                ] + [(b"content-type", b"application/json")]
+                request = CompactRequest(scope, request.receive)
+
+            response = await original_route_handler(request)
+
+            if compact_response and is_compact_available() and response.status_code == 200 \
+                    and response.media_type == "application/json":
+                return Response(
+                    content=encode_payload(json.loads(response.body)),
+                    media_type=COMPACT_MEDIA_TYPE,
+                    headers={"Content-Encoding": COMPACT_CONTENT_ENCODING}
+                )
+            return response
+
+        return compact_route_handler
+
 app = FastAPI(title="Daily Stock AI Service", version="1.0.0")
+app.router.route_class = CompactRoute
 
 # Initialize services
 consumption_analyzer = ConsumptionAnalyzer()
 recommendation_engine = RecommendationEngine()
 market_data_service = MarketDataService()
+# 市場カタログはワーカーの fork 前に読み込み、コピーオンライトで共有する
+market_data_service.catalog.load()
+market_data_service.load_similarity_index()
+# 同一の消費記録・在庫入力に対する分析結果のキャッシュ（REDIS_URL があれば複数レプリカで共有）
+analysis_cache = AnalysisCache(
+    max_size=int(os.getenv("ANALYSIS_CACHE_SIZE", "5000")),
+    ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "300")),
+    redis_url=os.getenv("ANALYSIS_CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+)
+# CPU負荷の高いバッチ分析をイベントループの外（プロセスプール）で実行
+analysis_executor = AnalysisExecutor(
+    consumption_analyzer,
+    recommendation_engine,
+    workers=default_worker_count(),
+    inline_max_items=int(os.getenv("AI_ANALYSIS_INLINE_MAX_ITEMS", "20"))
+)
+
+@app.on_event("shutdown")
+def shutdown_analysis_executor():
+    """アプリケーション終了時にプロセスプールを停止"""
+    analysis_executor.shutdown()
 
 # Pydantic models
 class ConsumptionData(BaseModel):
@@ -29,10 +107,23 @@ class ConsumptionData(BaseModel):
     current_quantity: int
     minimum_threshold: int
 
+class MarketDataSearchRequest(BaseModel):
+    item_name: str
+
+class SimilarItemsRequest(BaseModel):
+    item_names: List[str]
+    top_k: int = 5
+
+class MarketDataUpdateRequest(BaseModel):
+    item_name: str
+    consumption_data: Dict  # average_consumption_per_day, category, unit, sample_size など
+
 class RecommendationRequest(BaseModel):
     user_id: int
     item_data: ConsumptionData
     target_stock_level: Optional[int] = None
+    stockout_risk: bool = False  # 在庫切れリスク（モンテカルロ）を推定するか
+    detail: RecommendationDetail = DETAIL_FULL  # summary の場合は additional_info を生成しない
 
 class RecommendationResponse(BaseModel):
     item_id: int
@@ -44,6 +135,7 @@ class RecommendationResponse(BaseModel):
     estimated_days_remaining: int
     recommendation_message: str
     confidence_score: float
+    additional_info: Optional[Dict] = None
 
 class HealthResponse(BaseModel):
     status: str
@@ -59,29 +151,119 @@ async def health_check():
         timestamp=datetime.now().isoformat()
     )
 
+def _build_pace_analysis(consumption_data: ConsumptionData, user_pace: float) -> Dict:
+    """消費ペース分析のレスポンスを組み立て"""
+    return {
+        "item_id": consumption_data.item_id,
+        "item_name": consumption_data.item_name,
+        "consumption_pace_per_day": user_pace,
+        "analysis_period_days": len(consumption_data.consumption_records),
+        "current_quantity": consumption_data.current_quantity,
+        "estimated_days_remaining": consumption_data.current_quantity / user_pace if user_pace > 0 else float('inf')
+    }
+
+async def _get_consumption_pattern(consumption_records: List[Dict]) -> Dict:
+    """消費パターンを取得（同一内容の消費記録はキャッシュから返す）"""
+    key = make_cache_key("pattern", consumption_records)
+    pattern = await analysis_cache.get(key)
+    if pattern is None:
+        pattern = asdict(consumption_analyzer.analyze_consumption_pattern(consumption_records))
+        await analysis_cache.set(key, pattern)
+    return pattern
+
+def _recommendation_cache_key(request: RecommendationRequest) -> str:
+    """推奨結果のキャッシュキー（消費記録と在庫・商品の入力値、市場カタログと更新内容のバージョン）"""
+    item_data = request.item_data
+    return make_cache_key(
+        "recommendation",
+        item_data.consumption_records,
+        item_id=item_data.item_id,
+        item_name=item_data.item_name,
+        current_quantity=item_data.current_quantity,
+        minimum_threshold=item_data.minimum_threshold,
+        target_stock_level=request.target_stock_level,
+        stockout_risk=request.stockout_risk,
+        detail=request.detail,
+        market_catalog_version=market_data_service.catalog.version,
+        market_override_version=market_data_service.catalog.override_version
+    )
+
+@app.get("/cache/stats", response_model=Dict)
+async def get_cache_stats():
+    """分析結果キャッシュのヒット率などを取得"""
+    return analysis_cache.get_stats()
+
+@app.get("/market-data/cache/stats", response_model=Dict)
+async def get_market_data_cache_stats():
+    """市場データ検索結果キャッシュのヒット率などを取得"""
+    return market_data_service.get_cache_stats()
+
+@app.get("/market-data/version", response_model=Dict)
+async def get_market_data_version():
+    """市場データのバージョン（カタログと保存済みの更新内容のバージョン、どのプロセスでも同じ値）"""
+    return {
+        "catalog_version": market_data_service.catalog.version,
+        "override_version": market_data_service.catalog.override_version
+    }
+
 @app.post("/analyze/consumption-pace", response_model=Dict)
 async def analyze_consumption_pace(consumption_data: ConsumptionData):
     """ユーザーの消費ペースを分析"""
     try:
-        user_pace = consumption_analyzer.calculate_user_consumption_pace(
-            consumption_data.consumption_records
+        # 消費ペースは消費パターンの平均消費量と同じ値
+        pattern = await _get_consumption_pattern(consumption_data.consumption_records)
+        user_pace = pattern["average_daily_consumption"]
+        
+        return _build_pace_analysis(consumption_data, user_pace)
+    except Exception as e:
+        logger.error(f"Error analyzing consumption pace: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"分析エラー: {str(e)}")
+
+@app.post("/analyze/full", response_model=Dict)
+async def analyze_full(consumption_data: ConsumptionData):
+    """消費ペース分析・市場データ・消費パターンを1回のリクエストで取得"""
+    try:
+        # 市場データの検索（I/O待ち）を先に開始し、その間に消費分析を行う
+        market_task = asyncio.create_task(
+            market_data_service.search_consumption_pace(consumption_data.item_name)
         )
         
+        pattern = await _get_consumption_pattern(consumption_data.consumption_records)
+        
         return {
-            "item_id": consumption_data.item_id,
-            "item_name": consumption_data.item_name,
-            "consumption_pace_per_day": user_pace,
-            "analysis_period_days": len(consumption_data.consumption_records),
-            "current_quantity": consumption_data.current_quantity,
-            "estimated_days_remaining": consumption_data.current_quantity / user_pace if user_pace > 0 else float('inf')
+            "analysis": _build_pace_analysis(consumption_data, pattern["average_daily_consumption"]),
+            "market_data": await market_task,
+            "pattern": pattern
         }
     except Exception as e:
-        logger.error(f"Error analyzing consumption pace: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"分析エラー: {str(e)}")
+        logger.error(f"Error in full analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"統合分析エラー: {str(e)}")
+
+@app.post("/consumption/predict", response_model=Dict)
+async def predict_consumption(
+    consumption_records: List[Dict],
+    days_ahead: int = 30,
+    item_id: Optional[int] = None
+):
+    """将来の消費量を予測（item_id を指定すると当てはめ済みの予測状態を再利用）"""
+    try:
+        return consumption_analyzer.predict_future_consumption(
+            consumption_records, days_ahead, item_id=item_id
+        )
+    except Exception as e:
+        logger.error(f"Error predicting consumption: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"消費予測エラー: {str(e)}")
 
 @app.post("/market-data/search", response_model=Dict)
-async def search_market_consumption_data(item_name: str):
-    """世間の消費ペースデータを検索"""
+async def search_market_consumption_data(
+    request: Optional[MarketDataSearchRequest] = None,
+    item_name: Optional[str] = None
+):
+    """世間の消費ペースデータを検索（商品名はJSONボディまたはクエリパラメータで指定）"""
+    item_name = request.item_name if request else item_name
+    if not item_name:
+        raise HTTPException(status_code=422, detail="item_name を指定してください")
+    
     try:
         market_data = await market_data_service.search_consumption_pace(item_name)
         return market_data
@@ -89,37 +271,108 @@ async def search_market_consumption_data(item_name: str):
         logger.error(f"Error searching market data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"市場データ検索エラー: {str(e)}")
 
-@app.post("/recommendations/generate", response_model=RecommendationResponse)
-async def generate_recommendation(request: RecommendationRequest):
-    """消費推奨を生成"""
-    try:
-        # ユーザーの消費ペースを計算
-        user_pace = consumption_analyzer.calculate_user_consumption_pace(
-            request.item_data.consumption_records
-        )
-        
-        # 市場の消費ペースを取得
+@app.post("/market-data/similar", response_model=List[List[Dict]])
+async def find_similar_market_items(request: SimilarItemsRequest):
+    """商品名ごとに類似したカタログの商品を類似度つきで検索（文字 n-gram）"""
+    if request.top_k < 1:
+        raise HTTPException(status_code=422, detail="top_k は1以上で指定してください")
+    return market_data_service.find_similar_items(request.item_names, request.top_k)
+
+@app.get("/market-data/category/{category}", response_model=Dict)
+async def get_category_market_data(category: str):
+    """カテゴリ別の市場消費データ（商品一覧と平均・中央値など）を取得"""
+    data = await market_data_service.get_category_consumption_data(category)
+    if "error" in data:
+        raise HTTPException(status_code=404, detail=data["error"])
+    return data
+
+@app.post("/market-data/update", response_model=Dict)
+async def update_market_data(request: MarketDataUpdateRequest):
+    """商品の市場消費データを更新"""
+    result = await market_data_service.update_market_data(request.item_name, request.consumption_data)
+    if result.get("status") != "success":
+        raise HTTPException(status_code=422, detail=result.get("message"))
+    return result
+
+@app.post("/market-data/update/batch", response_model=Dict)
+async def update_market_data_batch(requests: List[MarketDataUpdateRequest]):
+    """複数商品の市場消費データをまとめて更新（集計ジョブからの反映用）"""
+    return await market_data_service.update_market_data_many(
+        [(request.item_name, request.consumption_data) for request in requests]
+    )
+
+def _estimate_stockout_risks(requests: List[RecommendationRequest]) -> List[Optional[Dict]]:
+    """stockout_risk が指定された商品の在庫切れリスクをまとめて推定"""
+    risks: List[Optional[Dict]] = [None] * len(requests)
+    targets = [index for index, request in enumerate(requests) if request.stockout_risk]
+    if not targets:
+        return risks
+    
+    estimated = recommendation_engine.estimate_stockout_risks(
+        stockout_daily_demands([requests[index].item_data.consumption_records for index in targets]),
+        [requests[index].item_data.current_quantity for index in targets],
+        [requests[index].item_data.minimum_threshold for index in targets]
+    )
+    for index, risk in zip(targets, estimated):
+        risks[index] = risk
+    return risks
+
+async def _build_recommendation(
+    request: RecommendationRequest,
+    user_pace: float,
+    stockout_risk: Optional[Dict] = None,
+    market_data: Optional[Dict] = None
+) -> RecommendationResponse:
+    """算出済みの消費ペースと市場データから推奨を組み立て"""
+    # 市場の消費ペースを取得（バッチでは検索済みの結果を使用）
+    if market_data is None:
         market_data = await market_data_service.search_consumption_pace(
             request.item_data.item_name
         )
-        market_pace = market_data.get("average_consumption_per_day", user_pace)
+    market_pace = market_data.get("average_consumption_per_day", user_pace)
+    
+    # 推奨を生成
+    recommendation = recommendation_engine.generate_recommendation(
+        user_pace=user_pace,
+        market_pace=market_pace,
+        current_quantity=request.item_data.current_quantity,
+        minimum_threshold=request.item_data.minimum_threshold,
+        target_stock_level=request.target_stock_level,
+        stockout_risk=stockout_risk,
+        detail=request.detail
+    )
+    
+    return RecommendationResponse(
+        item_id=request.item_data.item_id,
+        item_name=request.item_data.item_name,
+        user_consumption_pace=user_pace,
+        market_consumption_pace=market_pace,
+        **recommendation
+    )
+
+@app.post("/recommendations/generate", response_model=RecommendationResponse)
+async def generate_recommendation(request: RecommendationRequest):
+    """消費推奨を生成（同一入力の推奨はキャッシュから返す）"""
+    try:
+        cache_key = _recommendation_cache_key(request)
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            return RecommendationResponse(**cached)
         
-        # 推奨を生成
-        recommendation = recommendation_engine.generate_recommendation(
-            user_pace=user_pace,
-            market_pace=market_pace,
-            current_quantity=request.item_data.current_quantity,
-            minimum_threshold=request.item_data.minimum_threshold,
-            target_stock_level=request.target_stock_level
-        )
+        # ユーザーの消費ペースを計算（十分な記録があれば需要予測の値を使用）
+        records = request.item_data.consumption_records
+        forecast_pace = consumption_analyzer.forecast_paces(
+            [records], [request.item_data.item_id]
+        )[0]
+        if forecast_pace is not None:
+            user_pace = forecast_pace
+        else:
+            user_pace = consumption_analyzer.calculate_user_consumption_pace(records)
         
-        return RecommendationResponse(
-            item_id=request.item_data.item_id,
-            item_name=request.item_data.item_name,
-            user_consumption_pace=user_pace,
-            market_consumption_pace=market_pace,
-            **recommendation
-        )
+        stockout_risk = _estimate_stockout_risks([request])[0]
+        recommendation = await _build_recommendation(request, user_pace, stockout_risk)
+        await analysis_cache.set(cache_key, recommendation.dict())
+        return recommendation
         
     except Exception as e:
         logger.error(f"Error generating recommendation: {str(e)}")
@@ -127,17 +380,78 @@ async def generate_recommendation(request: RecommendationRequest):
 
 @app.post("/recommendations/batch", response_model=List[RecommendationResponse])
 async def generate_batch_recommendations(requests: List[RecommendationRequest]):
-    """複数商品の推奨を一括生成"""
+    """複数商品の推奨を一括生成（キャッシュにない商品だけを計算）"""
     try:
+        cache_keys = [_recommendation_cache_key(request) for request in requests]
+        cached_results = await analysis_cache.get_many(cache_keys)
+        pending = [request for request, cached in zip(requests, cached_results) if cached is None]
+        
+        # キャッシュにない商品の消費ペース・需要予測・在庫切れリスクを一括で計算
+        computed = {}
+        if pending:
+            # 市場データの検索（I/O待ち）を先に開始し、その間に分析を行う
+            market_task = asyncio.create_task(
+                market_data_service.search_consumption_pace_many(
+                    [request.item_data.item_name for request in pending]
+                )
+            )
+            item_ids = [request.item_data.item_id for request in pending]
+            average_paces, forecast_paces, stockout_risks = await analysis_executor.run(
+                analyze_batch_inputs,
+                item_ids,
+                [request.item_data.consumption_records for request in pending],
+                item_ids,
+                [
+                    (request.item_data.current_quantity, request.item_data.minimum_threshold)
+                    if request.stockout_risk else None
+                    for request in pending
+                ]
+            )
+            market_data_by_name = await market_task
+            
+            # 推奨は商品全体の配列でまとめて計算
+            items_data = []
+            for request, average_pace, forecast_pace, stockout_risk in zip(
+                pending, average_paces, forecast_paces, stockout_risks
+            ):
+                user_pace = forecast_pace if forecast_pace is not None else average_pace
+                market_data = market_data_by_name[request.item_data.item_name]
+                items_data.append({
+                    "item_id": request.item_data.item_id,
+                    "item_name": request.item_data.item_name,
+                    "user_pace": user_pace,
+                    "market_pace": market_data.get("average_consumption_per_day", user_pace),
+                    "current_quantity": request.item_data.current_quantity,
+                    "minimum_threshold": request.item_data.minimum_threshold,
+                    "target_stock_level": request.target_stock_level,
+                    "stockout_risk": stockout_risk,
+                    "detail": request.detail
+                })
+            
+            for request, item_data, recommendation in zip(
+                pending, items_data, recommendation_engine.batch_generate_recommendations(items_data)
+            ):
+                try:
+                    computed[id(request)] = RecommendationResponse(
+                        user_consumption_pace=item_data["user_pace"],
+                        market_consumption_pace=item_data["market_pace"],
+                        **recommendation
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing item {request.item_data.item_id}: {str(e)}")
+                    # 個別エラーをスキップして処理を続行
+                    continue
+        
         recommendations = []
-        for request in requests:
-            try:
-                recommendation = await generate_recommendation(request)
+        new_entries = []
+        for request, key, cached in zip(requests, cache_keys, cached_results):
+            if cached is not None:
+                recommendations.append(RecommendationResponse(**cached))
+            elif id(request) in computed:
+                recommendation = computed[id(request)]
+                new_entries.append((key, recommendation.dict()))
                 recommendations.append(recommendation)
-            except Exception as e:
-                logger.error(f"Error processing item {request.item_data.item_id}: {str(e)}")
-                # 個別エラーをスキップして処理を続行
-                continue
+        await analysis_cache.set_many(new_entries)
         
         return recommendations
         
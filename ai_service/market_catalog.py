@@ -0,0 +1,363 @@
+from bisect import bisect_left, insort
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from catalog_index import CatalogIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "market_catalog.json")
+DEFAULT_OVERRIDES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "market_overrides.sqlite3")
+
+class CategoryAggregate:
+    """
+    カテゴリに属する商品と消費ペースの集計
+
+    商品の追加・削除のたびに合計と整列済みの消費ペースを更新し、
+    平均・中央値・最小・最大を再集計せずに返す
+    """
+
+    def __init__(self):
+        self.items: Dict[str, Dict] = {}  # 商品名 → 市場消費データ（カテゴリ内）
+        self._paces: List[float] = []  # 消費ペース（昇順）
+        self._total = 0.0
+
+    def add(self, item_name: str, data: Dict) -> None:
+        """商品を追加"""
+        pace = float(data["average_consumption_per_day"])
+        self.items[item_name] = data
+        insort(self._paces, pace)
+        self._total += pace
+
+    def remove(self, item_name: str) -> None:
+        """商品を削除"""
+        data = self.items.pop(item_name)
+        pace = float(data["average_consumption_per_day"])
+        del self._paces[bisect_left(self._paces, pace)]
+        self._total -= pace
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def copy(self) -> "CategoryAggregate":
+        """集計の複製（新しいスナップショット用）"""
+        aggregate = CategoryAggregate()
+        aggregate.items = dict(self.items)
+        aggregate._paces = list(self._paces)
+        aggregate._total = self._total
+        return aggregate
+
+    def to_dict(self, category: str) -> Dict:
+        """カテゴリの統計情報"""
+        count = len(self._paces)
+        middle = count // 2
+        median = self._paces[middle] if count % 2 else (self._paces[middle - 1] + self._paces[middle]) / 2
+        return {
+            "category": category,
+            "item_count": count,
+            "average_consumption": self._total / count,
+            "median_consumption": median,
+            "min_consumption": self._paces[0],
+            "max_consumption": self._paces[-1],
+            "items": self.items
+        }
+
+@dataclass
+class CatalogSnapshot:
+    """
+    読み込み済みの市場カタログ（作成後は変更しない）
+
+    商品の更新は with_items で新しいスナップショットを作成して差し替える。
+    変更のないカテゴリの集計と、キーが増えない場合の索引は元のスナップショットと共有する
+    """
+    version: Optional[int]
+    items: Dict[str, Dict]  # 商品名 → 市場消費データ
+    category_defaults: Dict[str, float]  # カテゴリ別のデフォルト消費ペース
+    index: CatalogIndex = field(repr=False)  # 部分マッチ用の索引
+    categories: Dict[str, CategoryAggregate] = field(default_factory=dict, repr=False)  # カテゴリ別の集計
+    path: Optional[str] = None
+    mtime_ns: int = 0
+    override_version: int = 0  # 適用した更新内容（OverrideStore）のバージョン
+
+    @classmethod
+    def from_dict(cls, data: Dict, path: Optional[str] = None, mtime_ns: int = 0) -> "CatalogSnapshot":
+        """スナップショットファイルの内容からカタログを作成"""
+        items = {}
+        categories: Dict[str, CategoryAggregate] = {}
+        for item in data.get("items", []):
+            item = dict(item)
+            item_name = item.pop("name")
+            items[item_name] = item
+        for item_name, item in items.items():
+            categories.setdefault(item.get("category"), CategoryAggregate()).add(item_name, item)
+        return cls(
+            version=data.get("version"),
+            items=items,
+            category_defaults={
+                category: float(pace) for category, pace in data.get("category_defaults", {}).items()
+            },
+            index=CatalogIndex(items.keys()),
+            categories=categories,
+            path=path,
+            mtime_ns=mtime_ns
+        )
+
+    def with_items(self, updates: Dict[str, Dict], **changes) -> "CatalogSnapshot":
+        """商品の市場消費データを追加・更新した新しいスナップショット（カテゴリ別の集計と索引も更新）"""
+        items = dict(self.items)
+        categories = dict(self.categories)
+        copied = set()
+
+        def aggregate_for(category) -> CategoryAggregate:
+            if category not in copied:
+                categories[category] = categories[category].copy() if category in categories else CategoryAggregate()
+                copied.add(category)
+            return categories[category]
+
+        for item_name, data in updates.items():
+            previous = items.get(item_name)
+            if previous is not None:
+                aggregate_for(previous.get("category")).remove(item_name)
+            items[item_name] = data
+            aggregate_for(data.get("category")).add(item_name, data)
+        for category in copied:
+            if not categories[category]:
+                del categories[category]
+
+        index = self.index
+        if any(item_name not in index for item_name in updates):
+            index = CatalogIndex(items.keys())
+        return replace(self, items=items, categories=categories, index=index, **changes)
+
+class OverrideStore:
+    """
+    商品の市場消費データの更新内容を保存する SQLite ストア
+
+    商品ごとに1行で保存し、保存のたびに全体のバージョンを1つ進めて、変更した行に
+    そのバージョンを記録する。保存は変更した商品の行だけを書き込み、他のプロセスは
+    適用済みのバージョンより新しい行だけを読み込む（件数が増えても全体を読み書きしない）。
+    プロセス間の排他は SQLite のロックで行う。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """接続を作成（fork・スレッドをまたいで共有しないよう操作ごとに作成する）"""
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._schema_ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS overrides ("
+                "item_name TEXT PRIMARY KEY, data TEXT NOT NULL, version INTEGER NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_overrides_version ON overrides(version)")
+            self._schema_ready = True
+        return connection
+
+    def version(self) -> int:
+        """保存済みの更新内容のバージョン（ストアがなければ0）"""
+        if not os.path.exists(self.path):
+            return 0
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COALESCE(MAX(version), 0) FROM overrides").fetchone()[0]
+
+    def changes_since(self, version: int) -> Tuple[int, Dict[str, Dict]]:
+        """
+        指定したバージョンより後に保存された更新内容
+
+        Returns:
+            Tuple: 現在のバージョンと、商品名 → 市場消費データ
+        """
+        if not os.path.exists(self.path):
+            return 0, {}
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN")
+            try:
+                current = connection.execute("SELECT COALESCE(MAX(version), 0) FROM overrides").fetchone()[0]
+                rows = connection.execute(
+                    "SELECT item_name, data FROM overrides WHERE version > ?", (version,)
+                ).fetchall()
+            finally:
+                connection.execute("COMMIT")
+        return current, {item_name: json.loads(data) for item_name, data in rows}
+
+    def save(self, updates: Dict[str, Dict]) -> int:
+        """更新内容を1つのトランザクションで保存し、新しいバージョンを返す"""
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                version = connection.execute("SELECT COALESCE(MAX(version), 0) FROM overrides").fetchone()[0] + 1
+                connection.executemany(
+                    "INSERT INTO overrides (item_name, data, version) VALUES (?, ?, ?) "
+                    "ON CONFLICT(item_name) DO UPDATE SET data = excluded.data, version = excluded.version",
+                    [(item_name, json.dumps(data, ensure_ascii=False), version) for item_name, data in updates.items()]
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return version
+
+class MarketCatalog:
+    """
+    ファイルから読み込む市場カタログ
+
+    カタログは初回参照時に読み込み、以降は一定間隔でカタログファイルの更新時刻と
+    保存済みの更新内容のバージョンを確認して、変更されていれば新しいスナップショットに
+    差し替える（再起動不要）。確認と再読み込み・索引の作成はバックグラウンドの
+    スレッドで行い、完了するまでリクエストは現在のスナップショットをそのまま使う。
+    ワーカーを fork する前に読み込んでおけば、各ワーカーはコピーオンライトで
+    同じメモリを共有する。
+
+    update_items による更新（集計ジョブが反映する消費ペースなど）は OverrideStore
+    （SQLite）に保存してカタログに重ねて適用するため、再起動後も失われず、
+    同じストアを参照する他のワーカー・レプリカには変更された商品だけが反映される。
+    更新内容のバージョンは保存のたびに増え、プロセスをまたいで共通の値になる。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        reload_interval_seconds: Optional[float] = None,
+        overrides_path: Optional[str] = None
+    ):
+        self.path = path or os.getenv("MARKET_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+        self.overrides_path = overrides_path or os.getenv("MARKET_OVERRIDES_PATH", DEFAULT_OVERRIDES_PATH)
+        self.overrides = OverrideStore(self.overrides_path)
+        if reload_interval_seconds is None:
+            reload_interval_seconds = float(os.getenv("MARKET_CATALOG_RELOAD_SECONDS", "5"))
+        self.reload_interval_seconds = reload_interval_seconds  # 0以下の場合は自動で再読み込みしない
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._revision = 0  # 読み込み・更新のたびに増える（プロセス内のキャッシュの無効化に使用）
+        self._next_check = 0.0
+        self._lock = threading.Lock()  # スナップショットの差し替えを直列化（参照はロック不要）
+        self._refresh_executor: Optional[ThreadPoolExecutor] = None
+        self._refresh_future: Optional[Future] = None
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """現在のスナップショット（未読み込みなら読み込み、確認間隔ごとに変更の確認を開始）"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.load()
+        if self.reload_interval_seconds > 0 and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.reload_interval_seconds
+            self._schedule_refresh()
+        return snapshot
+
+    @property
+    def version(self) -> Optional[int]:
+        """現在のカタログのバージョン"""
+        return self.snapshot.version
+
+    @property
+    def override_version(self) -> int:
+        """適用済みの更新内容のバージョン（保存されるため再起動・レプリカ間で共通）"""
+        return self.snapshot.override_version
+
+    @property
+    def revision(self) -> int:
+        """カタログの内容が変わるたびに増える番号（このプロセス内）"""
+        self.snapshot  # 必要であれば変更の確認を開始してから返す
+        return self._revision
+
+    def _schedule_refresh(self) -> None:
+        """変更の確認と再読み込みをバックグラウンドのスレッドで開始（実行中なら何もしない）"""
+        if self._refresh_future is not None and not self._refresh_future.done():
+            return
+        if self._refresh_executor is None:
+            # fork 後のワーカーで初めて作成されるよう、初回の確認時に起動する
+            self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="market-catalog")
+        self._refresh_future = self._refresh_executor.submit(self.refresh)
+
+    def refresh(self) -> CatalogSnapshot:
+        """
+        カタログファイルまたは保存済みの更新内容が変わっていれば差し替え
+
+        カタログファイルが変わった場合は全体を読み込み直し、更新内容だけが増えた場合は
+        新しい行だけを現在のスナップショットに適用する
+        """
+        snapshot = self._snapshot
+        if snapshot is None or self._file_mtime_ns(self.path) not in (None, snapshot.mtime_ns):
+            return self.load()
+        try:
+            stored_version = self.overrides.version()
+            if stored_version < snapshot.override_version:
+                return self.load()  # ストアが作り直された場合
+            if stored_version > snapshot.override_version:
+                with self._lock:
+                    self._apply_stored_changes()
+        except Exception as e:
+            logger.error(f"市場データの更新内容の読み込みエラー: {str(e)}")
+        return self._snapshot
+
+    def _apply_stored_changes(self) -> None:
+        """現在のスナップショットより新しい保存済みの更新内容を適用（ロックを取得して呼び出すこと）"""
+        snapshot = self._snapshot
+        version, changes = self.overrides.changes_since(snapshot.override_version)
+        changed = {item_name: data for item_name, data in changes.items() if snapshot.items.get(item_name) != data}
+        self._snapshot = snapshot.with_items(changed, override_version=version)
+        self._revision += 1
+
+    def update_item(self, item_name: str, data: Dict) -> None:
+        """商品の市場消費データを更新"""
+        self.update_items({item_name: data})
+
+    def update_items(self, updates: Dict[str, Dict]) -> None:
+        """
+        複数商品の市場消費データをまとめて更新
+
+        更新した商品の行だけをストアに保存してバージョンを1つ進め、保存済みの
+        更新内容のうち現在のスナップショットより新しいもの（他のプロセスの更新を含む）を
+        適用した新しいスナップショットに差し替える。新しい商品がある場合は索引を
+        作り直すため、イベントループからはスレッドで呼び出すこと。保存に失敗した
+        場合は例外を送出する（スナップショットは変更しない）。
+        """
+        self.snapshot  # 未読み込みであれば読み込む
+        with self._lock:
+            self.overrides.save(updates)
+            self._apply_stored_changes()
+
+    def _file_mtime_ns(self, path: str) -> Optional[int]:
+        """ファイルの更新時刻（存在しない場合は None）"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self) -> CatalogSnapshot:
+        """
+        スナップショットファイルと保存済みの更新内容を読み込んで差し替え
+
+        読み込みに失敗した場合は現在のスナップショット（未読み込みなら空のカタログ）を使い続ける
+        """
+        with self._lock:
+            try:
+                mtime_ns = self._file_mtime_ns(self.path) or 0
+                with open(self.path, encoding="utf-8") as f:
+                    snapshot = CatalogSnapshot.from_dict(json.load(f), self.path, mtime_ns)
+                override_version, overrides = self.overrides.changes_since(0)
+                snapshot = snapshot.with_items(overrides, override_version=override_version)
+                previous = self._snapshot
+                self._snapshot = snapshot
+                self._revision += 1
+                if previous is None:
+                    logger.info(f"市場カタログを読み込みました: {self.path}（version {snapshot.version}, {len(snapshot.items)}件）")
+                else:
+                    logger.info(f"市場カタログを再読み込みしました: version {previous.version} → {snapshot.version}")
+            except Exception as e:
+                logger.error(f"市場カタログの読み込みエラー: {str(e)}")
+                if self._snapshot is None:
+                    self._snapshot = CatalogSnapshot.from_dict({})
+            self._next_check = time.monotonic() + self.reload_interval_seconds
+            return self._snapshot
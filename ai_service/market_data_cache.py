@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+FRESH = "fresh"  # 有効期限内
+STALE = "stale"  # 有効期限切れだが、再取得までの間は返してよい
+MISS = "miss"  # キャッシュにない（または使えない）
+
+class MarketDataCache:
+    """
+    商品名ごとの市場データ検索結果のキャッシュ
+
+    有効期限（TTL）内の結果はそのまま返し、期限切れ後も stale_seconds の間は
+    古い結果を返しつつ呼び出し側で再取得できるよう STALE を返す
+    （stale-while-revalidate）。市場データが見つからなかった結果（デフォルト推定値）は
+    negative_ttl_seconds の短い期限でキャッシュする。カタログのバージョンが
+    変わった場合、それ以前の結果は使わない。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl_seconds: float = 3600.0,
+        negative_ttl_seconds: float = 300.0,
+        stale_seconds: float = 600.0
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.stale_seconds = stale_seconds
+        # 商品名 → (有効期限, 古い結果を返せる期限, 見つからなかった結果か, カタログのバージョン, 結果)
+        self._entries: "OrderedDict[str, Tuple[float, float, bool, Any, Dict]]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    def get(self, item_name: str, version: Any = None) -> Tuple[str, Optional[Dict]]:
+        """
+        キャッシュから検索結果を取得
+
+        Returns:
+            Tuple[str, Optional[Dict]]: 状態（FRESH / STALE / MISS）と結果
+        """
+        entry = self._entries.get(item_name)
+        if entry is None or entry[3] != version:
+            self._stats["misses"] += 1
+            return MISS, None
+
+        fresh_until, stale_until, negative, _, value = entry
+        now = time.monotonic()
+        if now >= stale_until:
+            del self._entries[item_name]
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return MISS, None
+
+        self._entries.move_to_end(item_name)
+        if negative:
+            self._stats["negative_hits"] += 1
+        if now < fresh_until:
+            self._stats["hits"] += 1
+            return FRESH, value
+        self._stats["stale_hits"] += 1
+        return STALE, value
+
+    def set(self, item_name: str, value: Dict, negative: bool = False, version: Any = None) -> None:
+        """検索結果を保存（上限を超えたら最も古いものから削除）"""
+        ttl = self.negative_ttl_seconds if negative else self.ttl_seconds
+        fresh_until = time.monotonic() + ttl
+        self._entries[item_name] = (fresh_until, fresh_until + self.stale_seconds, negative, version, value)
+        self._entries.move_to_end(item_name)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get_stats(self) -> Dict:
+        """ヒット率などの統計情報を取得"""
+        lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+        served = self._stats["hits"] + self._stats["stale_hits"]
+        return {
+            **self._stats,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "stale_seconds": self.stale_seconds
+        }
+
+    def clear(self) -> None:
+        """キャッシュを空にする"""
+        self._entries.clear()
@@ -1,10 +1,18 @@
 import httpx
 import json
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import asyncio
-import random
+import hashlib
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from catalog_index import CatalogIndex
+from market_catalog import CatalogSnapshot, MarketCatalog
+from category_classifier import CategoryClassifier
+from market_data_cache import FRESH, STALE, MarketDataCache
+import similarity_index
 
 logger = logging.getLogger(__name__)
 
@@ -12,65 +20,124 @@ class MarketDataService:
     """市場の消費ペースデータを検索・提供するサービス"""
     
     def __init__(self):
-        self.base_consumption_data = {
-            # 食品関連
-            "米": {"average_consumption_per_day": 0.15, "category": "staple_food", "unit": "kg"},
-            "パン": {"average_consumption_per_day": 0.3, "category": "staple_food", "unit": "個"},
-            "牛乳": {"average_consumption_per_day": 0.2, "category": "dairy", "unit": "L"},
-            "卵": {"average_consumption_per_day": 1.5, "category": "protein", "unit": "個"},
-            "肉": {"average_consumption_per_day": 0.08, "category": "protein", "unit": "kg"},
-            "野菜": {"average_consumption_per_day": 0.3, "category": "vegetables", "unit": "kg"},
-            
-            # 日用品
-            "トイレットペーパー": {"average_consumption_per_day": 0.08, "category": "hygiene", "unit": "ロール"},
-            "シャンプー": {"average_consumption_per_day": 0.01, "category": "hygiene", "unit": "ml"},
-            "石鹸": {"average_consumption_per_day": 0.02, "category": "hygiene", "unit": "個"},
-            "歯磨き粉": {"average_consumption_per_day": 0.005, "category": "hygiene", "unit": "g"},
-            "洗剤": {"average_consumption_per_day": 0.03, "category": "cleaning", "unit": "ml"},
-            "ティッシュ": {"average_consumption_per_day": 3.0, "category": "hygiene", "unit": "枚"},
-            
-            # 調味料
-            "塩": {"average_consumption_per_day": 0.01, "category": "seasoning", "unit": "g"},
-            "砂糖": {"average_consumption_per_day": 0.02, "category": "seasoning", "unit": "g"},
-            "醤油": {"average_consumption_per_day": 0.015, "category": "seasoning", "unit": "ml"},
-            "味噌": {"average_consumption_per_day": 0.02, "category": "seasoning", "unit": "g"},
-            "油": {"average_consumption_per_day": 0.025, "category": "seasoning", "unit": "ml"},
-            
-            # 飲み物
-            "コーヒー": {"average_consumption_per_day": 0.01, "category": "beverage", "unit": "g"},
-            "茶": {"average_consumption_per_day": 0.005, "category": "beverage", "unit": "g"},
-            "ジュース": {"average_consumption_per_day": 0.15, "category": "beverage", "unit": "L"},
-            
-            # その他
-            "電池": {"average_consumption_per_day": 0.05, "category": "electronics", "unit": "個"},
-            "マスク": {"average_consumption_per_day": 1.2, "category": "hygiene", "unit": "枚"},
-            "タオル": {"average_consumption_per_day": 0.02, "category": "textile", "unit": "枚"}
-        }
+        # 市場カタログ（data/market_catalog.json から読み込み、更新時は自動で再読み込み）
+        self.catalog = MarketCatalog()
         
-        # カテゴリ別のデフォルト消費ペース
-        self.category_defaults = {
-            "staple_food": 0.2,
-            "dairy": 0.15,
-            "protein": 0.1,
-            "vegetables": 0.25,
-            "hygiene": 0.08,
-            "cleaning": 0.03,
-            "seasoning": 0.01,
-            "beverage": 0.05,
-            "electronics": 0.02,
-            "textile": 0.01
-        }
+        # カテゴリ推定の規則（data/category_rules.json から読み込み）
+        self.category_classifier = CategoryClassifier.from_file()
+        
+        # 商品名ごとの検索結果キャッシュ
+        self.result_cache = MarketDataCache(
+            max_size=int(os.getenv("MARKET_DATA_CACHE_SIZE", "10000")),
+            ttl_seconds=float(os.getenv("MARKET_DATA_CACHE_TTL_SECONDS", "3600")),
+            negative_ttl_seconds=float(os.getenv("MARKET_DATA_NEGATIVE_TTL_SECONDS", "300")),
+            stale_seconds=float(os.getenv("MARKET_DATA_STALE_SECONDS", "600"))
+        )
+        # 実行中の検索（同じ商品名の同時検索・バックグラウンド更新をまとめる）
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._refreshes = 0
+        self._refresh_errors = 0
+        
+        # 外部APIへの一括リクエスト（件数の上限と最大待ち時間）
+        self.external_batch_size = max(int(os.getenv("MARKET_DATA_BATCH_SIZE", "50")), 1)
+        self.external_batch_max_wait = float(os.getenv("MARKET_DATA_BATCH_MAX_WAIT_MS", "10")) / 1000
+        self._pending_external: Dict[str, asyncio.Future] = {}
+        self._external_flush_handle: Optional[asyncio.TimerHandle] = None
+        self._external_batches = set()  # 実行中の一括リクエスト
+        self._upstream_requests = 0
+        self._upstream_items = 0
+        
+        # 類似検索（文字 n-gram）で採用する類似度の下限
+        self.similarity_threshold = float(os.getenv("MARKET_SIMILARITY_THRESHOLD", "0.7"))
+        # (カタログのスナップショット, 類似検索の索引) の組（1回の代入で差し替える）
+        self._similarity: Optional[Tuple[CatalogSnapshot, Optional[similarity_index.SimilarityIndex]]] = None
+        self._similarity_executor: Optional[ThreadPoolExecutor] = None
+        self._similarity_future: Optional[Future] = None
+    
+    @property
+    def base_consumption_data(self) -> Dict[str, Dict]:
+        """商品別の市場消費データ（現在のカタログ）"""
+        return self.catalog.snapshot.items
+    
+    @property
+    def category_defaults(self) -> Dict[str, float]:
+        """カテゴリ別のデフォルト消費ペース（現在のカタログ）"""
+        return self.catalog.snapshot.category_defaults
+    
+    @property
+    def catalog_index(self) -> CatalogIndex:
+        """部分マッチ用の索引（現在のカタログ）"""
+        return self.catalog.snapshot.index
     
     async def search_consumption_pace(self, item_name: str) -> Dict:
         """
         商品名から市場の消費ペースを検索
         
+        キャッシュの有効期限内であればキャッシュから返す。期限切れ直後の
+        結果は古いまま返し、バックグラウンドで再検索する。
+        
         Args:
             item_name: 商品名
             
         Returns:
             Dict: 市場消費データ
         """
+        state, cached = self.result_cache.get(item_name, self.catalog.revision)
+        if state == FRESH:
+            return dict(cached)
+        if state == STALE:
+            self._schedule_refresh(item_name)
+            return dict(cached)
+        return dict(await self._search_once(item_name))
+    
+    async def _search_once(self, item_name: str) -> Dict:
+        """同じ商品名の検索が実行中であればその結果を待つ（なければ検索を開始）"""
+        task = self._inflight.get(item_name)
+        if task is None:
+            task = asyncio.ensure_future(self._search_and_store(item_name))
+            self._inflight[item_name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(item_name, None))
+        # 待っている呼び出し側がキャンセルされても、他の呼び出し側の検索は継続する
+        return await asyncio.shield(task)
+    
+    async def _search_and_store(self, item_name: str) -> Dict:
+        """検索してキャッシュに保存（市場データが見つからない場合は短い期限で保存）"""
+        revision = self.catalog.revision
+        result = await self._search_uncached(item_name)
+        self.result_cache.set(
+            item_name, result, negative=result.get("data_source") == "default_estimate", version=revision
+        )
+        return result
+    
+    def _schedule_refresh(self, item_name: str) -> None:
+        """期限切れの結果をバックグラウンドで再検索"""
+        if item_name in self._inflight:
+            return
+        self._refreshes += 1
+        task = asyncio.ensure_future(self._search_and_store(item_name))
+        self._inflight[item_name] = task
+        task.add_done_callback(lambda done: self._refresh_done(item_name, done))
+    
+    def _refresh_done(self, item_name: str, task: asyncio.Task) -> None:
+        """バックグラウンド更新の完了処理"""
+        self._inflight.pop(item_name, None)
+        if not task.cancelled() and task.exception() is not None:
+            self._refresh_errors += 1
+            logger.error(f"市場データのバックグラウンド更新エラー: {item_name}: {str(task.exception())}")
+    
+    def get_cache_stats(self) -> Dict:
+        """検索結果キャッシュの統計情報を取得"""
+        return {
+            **self.result_cache.get_stats(),
+            "refreshes": self._refreshes,
+            "refresh_errors": self._refresh_errors,
+            "inflight": len(self._inflight),
+            "upstream_requests": self._upstream_requests,
+            "upstream_items": self._upstream_items
+        }
+    
+    async def _search_uncached(self, item_name: str) -> Dict:
+        """キャッシュを使わずに市場データを検索"""
         try:
             # まず直接マッチを試行
             market_data = self._direct_search(item_name)
@@ -86,8 +153,15 @@ class MarketDataService:
                 logger.info(f"部分マッチで市場データを取得: {item_name}")
                 return self._format_market_data(market_data, item_name, "fuzzy_match")
             
+            # 類似した商品名を検索
+            market_data = self._similar_search(item_name)
+            
+            if market_data:
+                logger.info(f"類似検索で市場データを取得: {item_name}")
+                return self._format_market_data(market_data, item_name, "similar_match")
+            
             # 外部APIを模擬（実際の実装では本物のAPIを使用）
-            market_data = await self._simulate_external_api_search(item_name)
+            market_data = await self._external_search(item_name)
             
             if market_data:
                 logger.info(f"外部API模擬で市場データを取得: {item_name}")
@@ -106,73 +180,196 @@ class MarketDataService:
         return self.base_consumption_data.get(item_name)
     
     def _fuzzy_search(self, item_name: str) -> Optional[Dict]:
-        """あいまい検索（部分マッチ）"""
-        item_name_lower = item_name.lower()
+        """あいまい検索（部分マッチ、最も長く一致したキーを優先）"""
+        snapshot = self.catalog.snapshot  # 索引とデータを同じスナップショットから参照
+        key = snapshot.index.match(item_name)
+        return snapshot.items.get(key) if key is not None else None
+    
+    def load_similarity_index(self) -> None:
+        """現在のカタログに対応する類似検索の索引を読み込み（起動時・ワーカーの fork 前に使用）"""
+        self._similarity = self._build_similarity(self.catalog.snapshot)
+    
+    def _build_similarity(self, snapshot: CatalogSnapshot):
+        """スナップショットに対応する索引を用意（キーが変わっていなければ現在の索引を使う）"""
+        current = self._similarity
+        if current is not None and current[1] is not None \
+                and current[1].keys_digest == similarity_index.keys_digest(snapshot.items.keys()):
+            return snapshot, current[1]
+        return snapshot, similarity_index.load_or_build(snapshot.items.keys(), snapshot.version)
+    
+    def _refresh_similarity(self, snapshot: CatalogSnapshot) -> None:
+        """索引の読み込み・作成（バックグラウンドのスレッドで実行）"""
+        try:
+            self._similarity = self._build_similarity(snapshot)
+        except Exception as e:
+            logger.error(f"類似検索の索引の作成エラー: {str(e)}")
+    
+    def _get_similarity(self):
+        """
+        類似検索に使うスナップショットと索引の組
         
-        for key, data in self.base_consumption_data.items():
-            if (key.lower() in item_name_lower or 
-                item_name_lower in key.lower()):
-                return data
+        カタログが変わった場合、キーが同じ（値だけの更新）であれば索引をそのまま使う。
+        キーが変わった場合は索引の読み込み・作成をバックグラウンドのスレッドで開始し、
+        完了して差し替えるまでは以前のスナップショットと索引を組のまま使う。
+        索引がまだない場合（初回）だけはその場で作成する。
+        """
+        snapshot = self.catalog.snapshot
+        current = self._similarity
+        if current is None:
+            current = self._similarity = self._build_similarity(snapshot)
+        elif current[0] is not snapshot:
+            if current[0].index is snapshot.index:
+                # 部分マッチの索引が共有されている＝キーは同じ
+                current = self._similarity = (snapshot, current[1])
+            elif self._similarity_future is None or self._similarity_future.done():
+                if self._similarity_executor is None:
+                    self._similarity_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="market-similarity")
+                self._similarity_future = self._similarity_executor.submit(self._refresh_similarity, snapshot)
+        return current
+    
+    def find_similar_items(self, item_names: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        商品名ごとに類似したカタログの商品を検索
         
-        return None
+        Args:
+            item_names: 商品名のリスト
+            top_k: 商品名ごとに返す件数
+            
+        Returns:
+            List[List[Dict]]: 商品名ごとの類似商品（類似度の降順）
+        """
+        snapshot, index = self._get_similarity()
+        if index is None:
+            return [[] for _ in item_names]
+        
+        items = snapshot.items
+        return [
+            [
+                {"item_name": key, "similarity": score, **items[key]}
+                for key, score in matches if key in items
+            ]
+            for matches in index.query_many(item_names, top_k)
+        ]
+    
+    def _similar_search(self, item_name: str) -> Optional[Dict]:
+        """類似検索（類似度がしきい値以上の最も近い商品、信頼度は類似度に応じて下げる）"""
+        matches = self.find_similar_items([item_name], top_k=1)[0]
+        if not matches or matches[0]["similarity"] < self.similarity_threshold:
+            return None
+        match = matches[0]
+        return {
+            **match,
+            "confidence": round(match.get("confidence", 0.8) * match["similarity"], 4)
+        }
     
     async def _simulate_external_api_search(self, item_name: str) -> Optional[Dict]:
+        """外部APIの検索を模擬（1件）"""
+        return (await self._simulate_external_api_batch([item_name])).get(item_name)
+    
+    async def _simulate_external_api_batch(self, item_names: List[str]) -> Dict[str, Optional[Dict]]:
         """
-        外部APIの検索を模擬
+        外部APIの一括検索を模擬
         実際の実装では、OpenAI API、Google Search API、
-        または専門の消費データAPIを使用
+        または専門の消費データAPIに複数の商品名を1回のリクエストで問い合わせる
         """
         try:
-            # API呼び出しをシミュレート
+            # API呼び出しをシミュレート（件数によらず1往復）
             await asyncio.sleep(0.1)  # ネットワーク遅延をシミュレート
             
             # カテゴリを推測して、それに基づいてデータを生成
-            estimated_category = self._estimate_category(item_name)
-            base_consumption = self.category_defaults.get(estimated_category, 0.05)
-            
-            # ランダムに変動させる（±30%）
-            variation = random.uniform(0.7, 1.3)
-            estimated_consumption = base_consumption * variation
-            
-            return {
-                "average_consumption_per_day": round(estimated_consumption, 4),
-                "category": estimated_category,
-                "unit": "個",  # デフォルト単位
-                "confidence": 0.6,  # 推定データの信頼度
-                "source": "estimated"
-            }
+            estimated_categories = self.estimate_categories(item_names)
+            results = {}
+            for item_name, estimated_category in zip(item_names, estimated_categories):
+                base_consumption = self.category_defaults.get(estimated_category, 0.05)
+                
+                # 商品名から決まる変動（±30%）。同じ商品名には常に同じ推定値を返す
+                variation = 0.7 + 0.6 * self._name_fraction(item_name)
+                estimated_consumption = base_consumption * variation
+                
+                results[item_name] = {
+                    "average_consumption_per_day": round(estimated_consumption, 4),
+                    "category": estimated_category,
+                    "unit": "個",  # デフォルト単位
+                    "confidence": 0.6,  # 推定データの信頼度
+                    "source": "estimated"
+                }
+            return results
             
         except Exception as e:
             logger.error(f"外部API模擬エラー: {str(e)}")
-            return None
+            return {}
     
-    def _estimate_category(self, item_name: str) -> str:
-        """商品名からカテゴリを推定"""
-        # 簡単なキーワードマッチング
-        hygiene_keywords = ["シャンプー", "石鹸", "歯磨き", "タオル", "ティッシュ", "マスク"]
-        food_keywords = ["米", "パン", "肉", "魚", "野菜", "果物"]
-        cleaning_keywords = ["洗剤", "漂白剤", "柔軟剤"]
-        seasoning_keywords = ["塩", "砂糖", "醤油", "味噌", "油", "酢"]
-        
-        item_name_lower = item_name.lower()
-        
-        for keyword in hygiene_keywords:
-            if keyword in item_name_lower:
-                return "hygiene"
-        
-        for keyword in food_keywords:
-            if keyword in item_name_lower:
-                return "staple_food"
+    async def _external_search(self, item_name: str) -> Optional[Dict]:
+        """
+        外部APIで検索（同時期の検索をまとめて1回のリクエストで送信）
         
-        for keyword in cleaning_keywords:
-            if keyword in item_name_lower:
-                return "cleaning"
+        最初の検索から external_batch_max_wait 秒待つか、external_batch_size 件
+        たまった時点でまとめて送信する
+        """
+        future = self._pending_external.get(item_name)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending_external[item_name] = future
+            if len(self._pending_external) >= self.external_batch_size:
+                self._flush_external()
+            elif self._external_flush_handle is None:
+                self._external_flush_handle = loop.call_later(self.external_batch_max_wait, self._flush_external)
+        return await asyncio.shield(future)
+    
+    def _flush_external(self) -> None:
+        """待機中の外部API検索を送信"""
+        if self._external_flush_handle is not None:
+            self._external_flush_handle.cancel()
+            self._external_flush_handle = None
+        pending, self._pending_external = self._pending_external, {}
+        if pending:
+            task = asyncio.ensure_future(self._run_external_batch(pending))
+            self._external_batches.add(task)
+            task.add_done_callback(self._external_batches.discard)
+    
+    async def _run_external_batch(self, pending: Dict[str, asyncio.Future]) -> None:
+        """一括検索を実行し、待機中の検索に結果を渡す"""
+        self._upstream_requests += 1
+        self._upstream_items += len(pending)
+        try:
+            results = await self._simulate_external_api_batch(list(pending))
+        except Exception as e:
+            logger.error(f"外部API一括検索エラー: {str(e)}")
+            results = {}
+        for item_name, future in pending.items():
+            if not future.done():
+                future.set_result(results.get(item_name))
+    
+    async def search_consumption_pace_many(self, item_names: List[str]) -> Dict[str, Dict]:
+        """
+        複数の商品名の市場消費データをまとめて検索
         
-        for keyword in seasoning_keywords:
-            if keyword in item_name_lower:
-                return "seasoning"
+        商品名は重複を除き、キャッシュにある結果はそのまま返す。キャッシュにない
+        商品のうち外部APIが必要なものは一括リクエストにまとめて送信する。
         
-        return "staple_food"  # デフォルト
+        Args:
+            item_names: 商品名のリスト
+            
+        Returns:
+            Dict[str, Dict]: 商品名 → 市場消費データ
+        """
+        unique_names = list(dict.fromkeys(item_names))
+        results = await asyncio.gather(*[self.search_consumption_pace(name) for name in unique_names])
+        return dict(zip(unique_names, results))
+    
+    def _name_fraction(self, item_name: str) -> float:
+        """商品名のハッシュから [0, 1) の値を求める"""
+        digest = hashlib.blake2b(item_name.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64
+    
+    def _estimate_category(self, item_name: str) -> str:
+        """商品名からカテゴリを推定"""
+        return self.category_classifier.classify_one(item_name)
+    
+    def estimate_categories(self, item_names: List[str]) -> List[str]:
+        """複数の商品名のカテゴリをまとめて推定（カタログ取り込みなど）"""
+        return self.category_classifier.classify(item_names)
     
     def _format_market_data(self, market_data: Dict, item_name: str, search_method: str) -> Dict:
         """市場データを標準フォーマットに変換"""
@@ -186,7 +383,8 @@ class MarketDataService:
             "last_updated": datetime.now().isoformat(),
             "market_trend": "stable",  # デフォルトトレンド
             "regional_variation": 0.1,  # 地域変動係数
-            "sample_size": market_data.get("sample_size", 1000)  # 推定サンプルサイズ
+            "sample_size": market_data.get("sample_size", 1000),  # 推定サンプルサイズ
+            "catalog_version": self.catalog.version
         }
     
     def _get_default_data(self, item_name: str) -> Dict:
@@ -205,42 +403,51 @@ class MarketDataService:
             "market_trend": "stable",
             "regional_variation": 0.2,
             "sample_size": 100,
+            "catalog_version": self.catalog.version,
             "note": "デフォルト推定値。より正確なデータが必要な場合は、追加の市場調査が推奨されます。"
         }
     
     async def get_category_consumption_data(self, category: str) -> Dict:
-        """カテゴリ別の消費データを取得"""
+        """カテゴリ別の消費データを取得（カタログの読み込み・更新時に集計済み）"""
         try:
-            category_items = {
-                k: v for k, v in self.base_consumption_data.items()
-                if v.get("category") == category
-            }
+            aggregate = self.catalog.snapshot.categories.get(category)
             
-            if not category_items:
+            if not aggregate:
                 return {"error": f"カテゴリ '{category}' のデータが見つかりません"}
             
-            # カテゴリの統計を計算
-            consumptions = [item["average_consumption_per_day"] for item in category_items.values()]
-            
-            return {
-                "category": category,
-                "item_count": len(category_items),
-                "average_consumption": sum(consumptions) / len(consumptions),
-                "min_consumption": min(consumptions),
-                "max_consumption": max(consumptions),
-                "items": category_items
-            }
+            return aggregate.to_dict(category)
             
         except Exception as e:
             logger.error(f"カテゴリデータ取得エラー: {str(e)}")
             return {"error": str(e)}
     
+    def _merge_market_data(self, item_name: str, consumption_data: Dict) -> Dict:
+        """指定された項目を既存のデータに上書きして検証（新しい商品は追加）"""
+        current = self.base_consumption_data.get(item_name, {})
+        data = {**current, **consumption_data}
+        if "average_consumption_per_day" not in data:
+            raise ValueError("average_consumption_per_day を指定してください")
+        data["average_consumption_per_day"] = float(data["average_consumption_per_day"])
+        if data["average_consumption_per_day"] < 0:
+            raise ValueError("average_consumption_per_day は0以上で指定してください")
+        data.setdefault("category", self._estimate_category(item_name))
+        data.setdefault("unit", "個")
+        return data
+    
     async def update_market_data(self, item_name: str, consumption_data: Dict) -> Dict:
-        """市場データを更新（将来の機能拡張用）"""
+        """
+        市場データを更新
+        
+        指定された項目だけを既存のデータに上書きする（新しい商品は追加）。
+        更新内容は保存され、カテゴリ別の集計と部分マッチ用の索引も合わせて更新される。
+        """
         try:
-            # 実際の実装では、データベースやキャッシュを更新
             logger.info(f"市場データ更新要求: {item_name}")
             
+            data = self._merge_market_data(item_name, consumption_data)
+            # 保存と索引の更新はイベントループを止めないようスレッドで実行
+            await asyncio.get_running_loop().run_in_executor(None, self.catalog.update_item, item_name, data)
+            
             return {
                 "status": "success",
                 "message": f"{item_name}の市場データが更新されました",
@@ -249,4 +456,29 @@ class MarketDataService:
             
         except Exception as e:
             logger.error(f"市場データ更新エラー: {str(e)}")
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
+    
+    async def update_market_data_many(self, updates: List[Tuple[str, Dict]]) -> Dict:
+        """
+        複数商品の市場データをまとめて更新（保存は1回）
+        
+        Returns:
+            Dict: 更新した件数と、更新できなかった商品のエラー
+        """
+        merged: Dict[str, Dict] = {}
+        errors = []
+        for item_name, consumption_data in updates:
+            try:
+                merged[item_name] = self._merge_market_data(item_name, consumption_data)
+            except Exception as e:
+                errors.append({"item_name": item_name, "message": str(e)})
+        
+        if merged:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.catalog.update_items, merged)
+            except Exception as e:
+                logger.error(f"市場データ一括更新エラー: {str(e)}")
+                errors.extend({"item_name": item_name, "message": str(e)} for item_name in merged)
+                merged = {}
+        
+        return {"updated": len(merged), "errors": errors}
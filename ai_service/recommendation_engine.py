@@ -1,9 +1,14 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional, Sequence
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
 import logging
 import math
+import os
+
+import numpy as np
+
+from stockout_simulator import StockoutSimulator
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +25,68 @@ class RecommendationAction(Enum):
     PURCHASE_NOW = "purchase_now"
     URGENT_PURCHASE = "urgent_purchase"
 
+# 推奨アクションの並び（緊急度の高い順、一括計算での添字）
+ACTION_ORDER = (
+    RecommendationAction.URGENT_PURCHASE,
+    RecommendationAction.PURCHASE_NOW,
+    RecommendationAction.PURCHASE_SOON,
+    RecommendationAction.PREPARE,
+    RecommendationAction.MONITOR
+)
+
+# 推奨の詳細度（summary は additional_info を生成しない）
+DETAIL_SUMMARY = "summary"
+DETAIL_FULL = "full"
+RecommendationDetail = Literal["summary", "full"]
+
+# 以下の閾値と文言は単体の計算（_calculate_* など）と列単位の一括計算で共有する
+MIN_EFFECTIVE_PACE = 0.01  # 残り日数計算で使う消費ペースの下限（ゼロ除算防止）
+PREPARE_DAYS_THRESHOLD = 21  # 緊急度が LOW でもこの日数以内なら購入準備を勧める
+SUGGESTED_STOCK_DAYS = 30  # 目標在庫レベルがない場合に確保する日数分の在庫
+
+# 最適な購入タイミング（残り日数がそれぞれの上限以下なら対応する区分、超える場合は最後の区分）
+PURCHASE_TIMING_BOUNDS = (1, 3, 7, 14)
+PURCHASE_TIMING_LABELS = ("immediate", "within_24_hours", "within_week", "within_2_weeks", "monitor_for_now")
+
+# 市場の消費ペースとの比による区分（上限の扱いは購入タイミングと同じ）
+CONSUMPTION_CATEGORY_BOUNDS = (0.3, 0.7, 1.3, 1.8)
+CONSUMPTION_CATEGORY_LABELS = ("very_low", "low", "normal", "high", "very_high")
+BUDGET_IMPACT_BOUNDS = (0.8, 1.5)
+BUDGET_IMPACT_LABELS = ("lower_than_average", "average", "higher_than_average")
+
+# 市場との比較メッセージ
+PACE_COMPARISON_HIGH_RATIO = 1.5
+PACE_COMPARISON_LOW_RATIO = 0.5
+PACE_COMPARISON_HIGH_MESSAGE = "あなたの消費ペースは一般的な消費ペースより約{:.0f}%高いです。"
+PACE_COMPARISON_LOW_MESSAGE = "あなたの消費ペースは一般的な消費ペースより約{:.0f}%低いです。"
+PACE_COMPARISON_NORMAL_MESSAGE = "あなたの消費ペースは一般的な範囲内です。"
+
+# トレンド情報（トレンド分析の結果を反映するまでの既定値）
+DEFAULT_TRENDS = {
+    "consumption_trend": "stable",
+    "market_trend": "stable",
+    "seasonal_factor": 1.0
+}
+
+def _bounded_label(value: float, bounds: Sequence[float], labels: Sequence[str]) -> str:
+    """値が最初に上限以下となる区分のラベル（np.searchsorted(side="left") と同じ判定）"""
+    for bound, label in zip(bounds, labels):
+        if value <= bound:
+            return label
+    return labels[-1]
+
+def _days_text(days_remaining: float) -> str:
+    """メッセージに埋め込む残り日数"""
+    return f"{int(days_remaining)}" if days_remaining >= 1 else "1未満"
+
+def _pace_comparison_message(pace_ratio: float) -> str:
+    """市場の消費ペースとの比較メッセージ"""
+    if pace_ratio > PACE_COMPARISON_HIGH_RATIO:
+        return PACE_COMPARISON_HIGH_MESSAGE.format((pace_ratio - 1) * 100)
+    elif pace_ratio < PACE_COMPARISON_LOW_RATIO:
+        return PACE_COMPARISON_LOW_MESSAGE.format((1 - pace_ratio) * 100)
+    return PACE_COMPARISON_NORMAL_MESSAGE
+
 @dataclass
 class RecommendationResult:
     """推奨結果を格納するデータクラス"""
@@ -45,6 +112,13 @@ class RecommendationEngine:
         # 市場との比較閾値
         self.consumption_variance_threshold = 0.5  # 50%以上の差がある場合
         
+        # 在庫切れリスク（モンテカルロ）の設定
+        self.stockout_simulator = StockoutSimulator(
+            paths=int(os.getenv("STOCKOUT_SIMULATION_PATHS", "1000")),
+            seed=int(os.getenv("STOCKOUT_SIMULATION_SEED", "42"))
+        )
+        self.stockout_probability_threshold = 0.5  # この確率以上で在庫切れが見込まれる日数を緊急度に反映
+        
         # 推奨メッセージテンプレート
         self.message_templates = {
             RecommendationAction.MONITOR: {
@@ -75,7 +149,9 @@ class RecommendationEngine:
         market_pace: float,
         current_quantity: int,
         minimum_threshold: int,
-        target_stock_level: Optional[int] = None
+        target_stock_level: Optional[int] = None,
+        stockout_risk: Optional[Dict] = None,
+        detail: str = DETAIL_FULL
     ) -> Dict:
         """
         総合的な推奨を生成
@@ -86,18 +162,22 @@ class RecommendationEngine:
             current_quantity: 現在の在庫数
             minimum_threshold: 最小在庫閾値
             target_stock_level: 目標在庫レベル（オプション）
+            stockout_risk: estimate_stockout_risks の推定結果（オプション）
+            detail: 詳細度（summary の場合 additional_info は None）
             
         Returns:
             Dict: 推奨結果
         """
         try:
             # 基本計算
-            effective_pace = max(user_pace, 0.01)  # ゼロ除算防止
+            effective_pace = max(user_pace, MIN_EFFECTIVE_PACE)  # ゼロ除算防止
             usable_quantity = max(current_quantity - minimum_threshold, 0)
             days_remaining = usable_quantity / effective_pace
             
             # 緊急度レベルを決定
             urgency_level = self._determine_urgency_level(days_remaining)
+            if stockout_risk:
+                urgency_level = self._escalate_urgency_by_risk(urgency_level, stockout_risk)
             
             # 推奨アクションを決定
             recommended_action = self._determine_recommended_action(
@@ -114,11 +194,15 @@ class RecommendationEngine:
                 recommended_action, days_remaining, user_pace, market_pace
             )
             
-            # 追加情報を生成
-            additional_info = self._generate_additional_info(
-                user_pace, market_pace, current_quantity, minimum_threshold,
-                days_remaining, target_stock_level
-            )
+            # 追加情報を生成（summary では省略）
+            additional_info = None
+            if detail != DETAIL_SUMMARY:
+                additional_info = self._generate_additional_info(
+                    user_pace, market_pace, current_quantity, minimum_threshold,
+                    days_remaining, target_stock_level
+                )
+                if stockout_risk:
+                    additional_info["stockout_risk"] = stockout_risk
             
             return {
                 "recommended_action": recommended_action.value,
@@ -131,7 +215,43 @@ class RecommendationEngine:
             
         except Exception as e:
             logger.error(f"推奨生成エラー: {str(e)}")
-            return self._get_default_recommendation()
+            return self._get_default_recommendation(detail)
+    
+    def estimate_stockout_risks(
+        self,
+        daily_demands: Sequence[np.ndarray],
+        current_quantities: Sequence[int],
+        minimum_thresholds: Sequence[int]
+    ) -> List[Optional[Dict]]:
+        """
+        複数商品の在庫切れリスクをまとめて推定
+        
+        Args:
+            daily_demands: 商品ごとの日別消費量（消費のない日は0）
+            current_quantities: 現在の在庫数
+            minimum_thresholds: 最小在庫閾値
+            
+        Returns:
+            List[Optional[Dict]]: 在庫切れ確率と残り日数の分位点（消費履歴のない商品は None）
+        """
+        try:
+            usable_quantities = [
+                max(current - minimum, 0)
+                for current, minimum in zip(current_quantities, minimum_thresholds)
+            ]
+            return self.stockout_simulator.simulate_many(daily_demands, usable_quantities)
+        except Exception as e:
+            logger.error(f"在庫切れリスク推定エラー: {str(e)}")
+            return [None] * len(daily_demands)
+    
+    def _escalate_urgency_by_risk(self, urgency_level: UrgencyLevel, stockout_risk: Dict) -> UrgencyLevel:
+        """在庫切れ確率が高い場合は緊急度を引き上げる（引き下げはしない）"""
+        probabilities = stockout_risk.get("stockout_probability", {})
+        order = list(self.urgency_thresholds.keys())  # CRITICAL → LOW の順
+        for level, threshold in self.urgency_thresholds.items():
+            if probabilities.get(f"{threshold}d", 0.0) >= self.stockout_probability_threshold:
+                return level if order.index(level) < order.index(urgency_level) else urgency_level
+        return urgency_level
     
     def _determine_urgency_level(self, days_remaining: float) -> UrgencyLevel:
         """残り日数から緊急度レベルを決定"""
@@ -155,7 +275,7 @@ class RecommendationEngine:
             return RecommendationAction.PURCHASE_NOW
         elif urgency_level == UrgencyLevel.MEDIUM:
             return RecommendationAction.PURCHASE_SOON
-        elif days_remaining <= 21:  # 3週間以内
+        elif days_remaining <= PREPARE_DAYS_THRESHOLD:
             return RecommendationAction.PREPARE
         else:
             return RecommendationAction.MONITOR
@@ -219,22 +339,15 @@ class RecommendationEngine:
             template_data = self.message_templates.get(action, self.message_templates[RecommendationAction.MONITOR])
             
             # メッセージをフォーマット
-            days_text = f"{int(days_remaining)}" if days_remaining >= 1 else "1未満"
             message = template_data["template"].format(
                 item_name="{item_name}",  # 後でフロントエンドで置換
-                days=days_text
+                days=_days_text(days_remaining)
             )
             
             # 市場との比較情報を追加
             pace_comparison = ""
             if market_pace > 0:
-                pace_ratio = user_pace / market_pace
-                if pace_ratio > 1.5:
-                    pace_comparison = "あなたの消費ペースは一般的な消費ペースより約{:.0f}%高いです。".format((pace_ratio - 1) * 100)
-                elif pace_ratio < 0.5:
-                    pace_comparison = "あなたの消費ペースは一般的な消費ペースより約{:.0f}%低いです。".format((1 - pace_ratio) * 100)
-                else:
-                    pace_comparison = "あなたの消費ペースは一般的な範囲内です。"
+                pace_comparison = _pace_comparison_message(user_pace / market_pace)
             
             full_message = message
             if pace_comparison:
@@ -280,11 +393,7 @@ class RecommendationEngine:
                     ),
                     "budget_impact": self._estimate_budget_impact(user_pace, market_pace)
                 },
-                "trends": {
-                    "consumption_trend": "stable",  # 実装時は実際のトレンド分析結果を使用
-                    "market_trend": "stable",
-                    "seasonal_factor": 1.0
-                }
+                "trends": dict(DEFAULT_TRENDS)
             }
             
             return info
@@ -298,30 +407,11 @@ class RecommendationEngine:
         if market_pace <= 0:
             return "unknown"
         
-        ratio = user_pace / market_pace
-        if ratio > 1.8:
-            return "very_high"
-        elif ratio > 1.3:
-            return "high"
-        elif ratio > 0.7:
-            return "normal"
-        elif ratio > 0.3:
-            return "low"
-        else:
-            return "very_low"
+        return _bounded_label(user_pace / market_pace, CONSUMPTION_CATEGORY_BOUNDS, CONSUMPTION_CATEGORY_LABELS)
     
     def _calculate_optimal_purchase_timing(self, days_remaining: float) -> str:
         """最適な購入タイミングを計算"""
-        if days_remaining <= 1:
-            return "immediate"
-        elif days_remaining <= 3:
-            return "within_24_hours"
-        elif days_remaining <= 7:
-            return "within_week"
-        elif days_remaining <= 14:
-            return "within_2_weeks"
-        else:
-            return "monitor_for_now"
+        return _bounded_label(days_remaining, PURCHASE_TIMING_BOUNDS, PURCHASE_TIMING_LABELS)
     
     def _calculate_suggested_purchase_quantity(
         self,
@@ -337,8 +427,8 @@ class RecommendationEngine:
                 needed_quantity = max(target_stock_level - current_quantity, 0)
                 return needed_quantity
             
-            # デフォルト：30日分の在庫を目標とする
-            monthly_consumption = user_pace * 30
+            # デフォルト：SUGGESTED_STOCK_DAYS 日分の在庫を目標とする
+            monthly_consumption = user_pace * SUGGESTED_STOCK_DAYS
             target_quantity = int(monthly_consumption + minimum_threshold)
             needed_quantity = max(target_quantity - current_quantity, 0)
             
@@ -353,29 +443,226 @@ class RecommendationEngine:
         if market_pace <= 0:
             return "unknown"
         
-        ratio = user_pace / market_pace
-        if ratio > 1.5:
-            return "higher_than_average"
-        elif ratio > 0.8:
-            return "average"
-        else:
-            return "lower_than_average"
+        return _bounded_label(user_pace / market_pace, BUDGET_IMPACT_BOUNDS, BUDGET_IMPACT_LABELS)
     
-    def _get_default_recommendation(self) -> Dict:
-        """デフォルト推奨を返す"""
+    def _get_default_recommendation(self, detail: str = DETAIL_FULL) -> Dict:
+        """デフォルト推奨を返す（summary の場合 additional_info は None）"""
+        additional_info = None
+        if detail != DETAIL_SUMMARY:
+            additional_info = {
+                "note": "データ不足により、デフォルト推奨を表示しています。"
+            }
         return {
             "recommended_action": RecommendationAction.MONITOR.value,
             "urgency_level": UrgencyLevel.LOW.value,
             "estimated_days_remaining": 30,
             "recommendation_message": "商品の状況を定期的に確認してください。",
             "confidence_score": 0.3,
-            "additional_info": {
-                "note": "データ不足により、デフォルト推奨を表示しています。"
-            }
+            "additional_info": additional_info
         }
     
+    def generate_recommendation_columns(
+        self,
+        user_paces: Sequence[float],
+        market_paces: Sequence[float],
+        current_quantities: Sequence[int],
+        minimum_thresholds: Sequence[int],
+        target_stock_levels: Optional[Sequence[Optional[int]]] = None,
+        stockout_risks: Optional[Sequence[Optional[Dict]]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        複数商品の推奨を列（配列）単位で計算
+        
+        generate_recommendation と同じ計算を商品全体の配列に対して行う。
+        math.log / math.log10 は NumPy と最下位ビットが異なる場合があるため、
+        対数だけは math で計算して結果を単体の計算と完全に一致させる。
+        
+        Returns:
+            Dict[str, np.ndarray]: 残り日数・緊急度・アクション・信頼度などの列
+        """
+        user = np.asarray(user_paces, dtype=np.float64)
+        market = np.asarray(market_paces, dtype=np.float64)
+        current = np.asarray(current_quantities)
+        minimum = np.asarray(minimum_thresholds)
+        count = len(user)
+        
+        # 基本計算
+        effective = np.maximum(user, MIN_EFFECTIVE_PACE)  # ゼロ除算防止
+        usable = np.maximum(current - minimum, 0)
+        days = usable / effective
+        
+        # 緊急度（urgency_thresholds の昇順の閾値で二分探索、該当なしは LOW）
+        levels = list(self.urgency_thresholds.keys())
+        thresholds = np.array(list(self.urgency_thresholds.values()), dtype=np.float64)
+        urgency = np.minimum(np.searchsorted(thresholds, days, side="left"), levels.index(UrgencyLevel.LOW))
+        if stockout_risks is not None:
+            urgency = np.minimum(urgency, [self._risk_urgency_index(risk) for risk in stockout_risks])
+        
+        # 推奨アクション（CRITICAL, HIGH, MEDIUM はそのまま対応、それ以外は残り日数で判定）
+        actions = np.full(count, 4, dtype=np.int64)  # ACTION_ORDER の添字
+        actions[days <= PREPARE_DAYS_THRESHOLD] = 3
+        for level, action_index in ((UrgencyLevel.MEDIUM, 2), (UrgencyLevel.HIGH, 1), (UrgencyLevel.CRITICAL, 0)):
+            actions[urgency == levels.index(level)] = action_index
+        
+        # 信頼度スコア
+        has_market = market > 0
+        ratio = np.divide(user, market, out=np.zeros(count), where=has_market)
+        larger = np.maximum(user, market)
+        similarity = 1 - np.abs(user - market) / np.where(has_market, larger, 1.0)
+        stock_log = np.zeros(count)
+        in_stock = current > 0
+        stock_log[in_stock] = [math.log(quantity + 1) for quantity in current[in_stock].tolist()]
+        valid_days = (days > 0) & (days < 365)
+        valid_pace = (user > 0.001) & (user < 10)
+        pace_log = np.zeros(count)
+        pace_log[valid_pace] = [math.log10(pace) for pace in user[valid_pace].tolist()]
+        confidence = (
+            np.where(has_market, similarity * 0.3, 0.1)
+            + np.where(in_stock, np.minimum(1.0, stock_log / math.log(10)) * 0.2, 0.0)
+            + np.where(valid_days, np.maximum(1 - np.abs(days - 30) / 365, 0.1) * 0.3, 0.1)
+            + np.where(valid_pace, np.maximum(1 - np.abs(pace_log) / 4, 0.1) * 0.2, 0.1)
+        )
+        confidence = np.maximum(np.minimum(confidence, 1.0), 0.1)
+        
+        # 推奨購入数量（目標在庫レベルがなければ SUGGESTED_STOCK_DAYS 日分 + 最小在庫閾値を目標とする）
+        targets = np.trunc(user * SUGGESTED_STOCK_DAYS + minimum)
+        if target_stock_levels is not None:
+            has_target = np.array([bool(level) for level in target_stock_levels])
+            targets = np.where(has_target, [level if level else 0 for level in target_stock_levels], targets)
+        suggested = np.maximum(targets - current, 0).astype(np.int64)
+        
+        return {
+            "days_remaining": days,
+            "usable_quantity": usable,
+            "urgency": urgency,
+            "action": actions,
+            "confidence": confidence,
+            "suggested_quantity": suggested,
+            "has_market": has_market,
+            "ratio": ratio,
+            # 以下は各 *_LABELS の添字
+            "timing": np.searchsorted(np.array(PURCHASE_TIMING_BOUNDS, dtype=np.float64), days, side="left"),
+            "consumption_category": np.searchsorted(np.array(CONSUMPTION_CATEGORY_BOUNDS), ratio, side="left"),
+            "budget_impact": np.searchsorted(np.array(BUDGET_IMPACT_BOUNDS), ratio, side="left")
+        }
+    
+    def _risk_urgency_index(self, stockout_risk: Optional[Dict]) -> int:
+        """在庫切れリスクから見た緊急度（urgency_thresholds の添字、引き上げない場合は LOW）"""
+        levels = list(self.urgency_thresholds.keys())
+        if stockout_risk:
+            probabilities = stockout_risk.get("stockout_probability", {})
+            for index, threshold in enumerate(self.urgency_thresholds.values()):
+                if probabilities.get(f"{threshold}d", 0.0) >= self.stockout_probability_threshold:
+                    return index
+        return levels.index(UrgencyLevel.LOW)
+    
+    def _materialize_recommendations(
+        self,
+        columns: Dict[str, np.ndarray],
+        user_paces: Sequence[float],
+        market_paces: Sequence[float],
+        current_quantities: Sequence[int],
+        minimum_thresholds: Sequence[int],
+        stockout_risks: Optional[Sequence[Optional[Dict]]] = None,
+        details: Optional[Sequence[str]] = None
+    ) -> List[Dict]:
+        """列単位の計算結果を generate_recommendation と同じ形式の辞書に変換（details は商品ごとの詳細度）"""
+        levels = [level.value for level in self.urgency_thresholds.keys()]
+        actions = list(ACTION_ORDER)
+        messages = [self.message_templates[action] for action in actions]
+        
+        recommendations = []
+        for index, (days, usable, urgency, action, confidence, suggested, has_market, ratio,
+                    timing, category, budget) in enumerate(zip(
+            columns["days_remaining"].tolist(), columns["usable_quantity"].tolist(),
+            columns["urgency"].tolist(), columns["action"].tolist(), columns["confidence"].tolist(),
+            columns["suggested_quantity"].tolist(), columns["has_market"].tolist(), columns["ratio"].tolist(),
+            columns["timing"].tolist(), columns["consumption_category"].tolist(), columns["budget_impact"].tolist()
+        )):
+            user_pace = user_paces[index]
+            market_pace = market_paces[index]
+            
+            # 推奨メッセージ（_generate_recommendation_message と同じ組み立て）
+            template_data = messages[action]
+            message = template_data["template"].format(item_name="{item_name}", days=_days_text(days))
+            if has_market:
+                message += f" {_pace_comparison_message(ratio)}"
+            message += f" {template_data['advice']}"
+            
+            recommendation = {
+                "recommended_action": actions[action].value,
+                "urgency_level": levels[urgency],
+                "estimated_days_remaining": max(int(days), 0),
+                "recommendation_message": message,
+                "confidence_score": confidence,
+                "additional_info": None
+            }
+            recommendations.append(recommendation)
+            if details is not None and details[index] == DETAIL_SUMMARY:
+                continue
+            
+            additional_info = {
+                "consumption_analysis": {
+                    "user_daily_consumption": round(user_pace, 3),
+                    "market_daily_consumption": round(market_pace, 3),
+                    "consumption_ratio": round(ratio, 2) if has_market else None,
+                    "consumption_category": CONSUMPTION_CATEGORY_LABELS[category] if has_market else "unknown"
+                },
+                "inventory_status": {
+                    "current_stock": current_quantities[index],
+                    "minimum_threshold": minimum_thresholds[index],
+                    "usable_quantity": usable,
+                    "days_until_threshold": int(days)
+                },
+                "purchase_suggestions": {
+                    "optimal_purchase_timing": PURCHASE_TIMING_LABELS[timing],
+                    "suggested_quantity": suggested,
+                    "budget_impact": BUDGET_IMPACT_LABELS[budget] if has_market else "unknown"
+                },
+                "trends": dict(DEFAULT_TRENDS)
+            }
+            stockout_risk = stockout_risks[index] if stockout_risks is not None else None
+            if stockout_risk:
+                additional_info["stockout_risk"] = stockout_risk
+            recommendation["additional_info"] = additional_info
+        return recommendations
+    
     def batch_generate_recommendations(self, items_data: List[Dict]) -> List[Dict]:
-        """複数商品の推奨を一括生成"""
+        """
+        複数商品の推奨を一括生成
+        
+        数値計算は generate_recommendation_columns で配列単位に行い、
+        辞書やメッセージは最後にまとめて組み立てる。入力に不正な値が含まれる
+        場合は商品ごとの計算に切り替える。各商品の "detail" が summary の場合は
+        additional_info を生成しない。
+        """
+        try:
+            user_paces = [item_data.get("user_pace", 1.0) for item_data in items_data]
+            market_paces = [item_data.get("market_pace", 1.0) for item_data in items_data]
+            current_quantities = [item_data.get("current_quantity", 0) for item_data in items_data]
+            minimum_thresholds = [item_data.get("minimum_threshold", 1) for item_data in items_data]
+            stockout_risks = [item_data.get("stockout_risk") for item_data in items_data]
+            details = [item_data.get("detail", DETAIL_FULL) for item_data in items_data]
+            with np.errstate(all="ignore"):
+                columns = self.generate_recommendation_columns(
+                    user_paces, market_paces, current_quantities, minimum_thresholds,
+                    [item_data.get("target_stock_level") for item_data in items_data],
+                    stockout_risks
+                )
+            recommendations = self._materialize_recommendations(
+                columns, user_paces, market_paces, current_quantities, minimum_thresholds, stockout_risks, details
+            )
+        except Exception as e:
+            logger.error(f"一括推奨生成エラー（商品ごとの計算に切り替えます）: {str(e)}")
+            return self._batch_generate_recommendations_scalar(items_data)
+        
+        for recommendation, item_data in zip(recommendations, items_data):
+            recommendation["item_id"] = item_data.get("item_id")
+            recommendation["item_name"] = item_data.get("item_name", "不明")
+        return recommendations
+    
+    def _batch_generate_recommendations_scalar(self, items_data: List[Dict]) -> List[Dict]:
+        """複数商品の推奨を商品ごとに生成"""
         recommendations = []
         
         for item_data in items_data:
@@ -385,7 +672,9 @@ class RecommendationEngine:
                     market_pace=item_data.get("market_pace", 1.0),
                     current_quantity=item_data.get("current_quantity", 0),
                     minimum_threshold=item_data.get("minimum_threshold", 1),
-                    target_stock_level=item_data.get("target_stock_level")
+                    target_stock_level=item_data.get("target_stock_level"),
+                    stockout_risk=item_data.get("stockout_risk"),
+                    detail=item_data.get("detail", DETAIL_FULL)
                 )
                 recommendation["item_id"] = item_data.get("item_id")
                 recommendation["item_name"] = item_data.get("item_name", "不明")
@@ -396,4 +685,4 @@ class RecommendationEngine:
                 # エラーが発生した商品はスキップ
                 continue
         
-        return recommendations
\ No newline at end of file
+        return recommendations
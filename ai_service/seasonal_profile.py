@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Hashable, List, Optional, Sequence, Tuple
+import hashlib
+import logging
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from consumption_analyzer import ConsumptionSeries
+
+logger = logging.getLogger(__name__)
+
+# 指数を1.0に引き寄せる疑似観測数（データが少ない曜日・月の指数を抑える）
+WEEKDAY_PRIOR = 2.0  # 週（各曜日の観測回数）
+MONTH_PRIOR = 30.0  # 日（各月の観測日数）
+
+@dataclass
+class SeasonalProfile:
+    """商品ごとの季節指数（1.0が平均的な消費量）"""
+    weekday_indices: np.ndarray  # 月曜日=0 〜 日曜日=6
+    monthly_indices: np.ndarray  # 1月=0 〜 12月=11
+
+    def factors(self, days: np.ndarray) -> np.ndarray:
+        """指定日（エポック日数）ごとの季節係数"""
+        days = np.asarray(days, dtype=np.int64)
+        weekdays = (days + 3) % 7  # 1970-01-01は木曜日
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12
+        return self.weekday_indices[weekdays] * self.monthly_indices[months]
+
+    def to_dict(self) -> dict:
+        """JSONレスポンス用の辞書に変換"""
+        return {
+            "weekday_indices": [round(float(v), 4) for v in self.weekday_indices],
+            "monthly_indices": [round(float(v), 4) for v in self.monthly_indices]
+        }
+
+def _shrunk_indices(sums: np.ndarray, counts: np.ndarray, overall: np.ndarray, prior: float) -> np.ndarray:
+    """グループ平均を全体平均で割った指数を、疑似観測で1.0に引き寄せて正規化"""
+    raw = np.divide(
+        sums, counts * overall[:, None],
+        out=np.ones_like(sums), where=(counts > 0) & (overall[:, None] > 0)
+    )
+    indices = (counts * raw + prior) / (counts + prior)
+    return indices / indices.mean(axis=1, keepdims=True)
+
+def compute_profiles(series_list: Sequence["ConsumptionSeries"]) -> List[SeasonalProfile]:
+    """
+    複数商品の曜日・月別季節指数をまとめて計算
+
+    消費のなかった日も0として数えるため、各曜日・各月の日数は
+    期間（最初の記録日〜最後の記録日）から算出し、消費量は
+    商品×曜日（月）の bincount で集計する
+    """
+    item_count = len(series_list)
+    if item_count == 0:
+        return []
+
+    first_days = np.array([series.first_day for series in series_list], dtype=np.int64)
+    last_days = np.array([series.last_day for series in series_list], dtype=np.int64)
+    lengths = [len(series.days) for series in series_list]
+    spans = np.where(np.array(lengths) > 0, last_days - first_days + 1, 0)
+
+    groups = np.repeat(np.arange(item_count), lengths)
+    days = np.concatenate([series.days for series in series_list]).astype(np.int64)
+    totals = np.concatenate([series.daily_totals for series in series_list]).astype(np.float64)
+    overall = np.divide(
+        np.bincount(groups, weights=totals, minlength=item_count), spans,
+        out=np.zeros(item_count), where=spans > 0
+    )
+
+    # 曜日別: 期間内の各曜日の日数は閉形式で求まる
+    start_weekdays = (first_days + 3) % 7
+    offsets = (np.arange(7)[None, :] - start_weekdays[:, None]) % 7
+    weekday_counts = (spans // 7)[:, None] + (offsets < (spans % 7)[:, None])
+    weekday_sums = np.bincount(
+        groups * 7 + (days + 3) % 7, weights=totals, minlength=item_count * 7
+    ).reshape(item_count, 7)
+    weekday_indices = _shrunk_indices(weekday_sums, weekday_counts.astype(np.float64), overall, WEEKDAY_PRIOR)
+
+    # 月別: 期間にかかる暦月ごとに日数を数えて月（1〜12月）に集計
+    first_months = first_days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    last_months = last_days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    month_spans = np.where(spans > 0, last_months - first_months + 1, 0)
+    month_groups = np.repeat(np.arange(item_count), month_spans)
+    month_ids = first_months[month_groups] + (
+        np.arange(month_spans.sum()) - np.repeat(np.cumsum(month_spans) - month_spans, month_spans)
+    )
+    month_starts = month_ids.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    month_ends = (month_ids + 1).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) - 1
+    days_in_span = np.minimum(month_ends, last_days[month_groups]) - np.maximum(month_starts, first_days[month_groups]) + 1
+    month_counts = np.bincount(
+        month_groups * 12 + month_ids % 12, weights=days_in_span, minlength=item_count * 12
+    ).reshape(item_count, 12)
+    record_months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12
+    month_sums = np.bincount(
+        groups * 12 + record_months, weights=totals, minlength=item_count * 12
+    ).reshape(item_count, 12)
+    monthly_indices = _shrunk_indices(month_sums, month_counts, overall, MONTH_PRIOR)
+
+    return [
+        SeasonalProfile(weekday_indices=weekday_indices[index], monthly_indices=monthly_indices[index])
+        for index in range(item_count)
+    ]
+
+def history_version(series: "ConsumptionSeries") -> str:
+    """消費系列の内容から履歴バージョン（ダイジェスト）を計算"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(series.days, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(series.daily_totals, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+class SeasonalProfileCache:
+    """商品と履歴バージョンをキーに季節指数を保持するLRUキャッシュ"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._profiles: "OrderedDict[Tuple[Hashable, str], SeasonalProfile]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(
+        self,
+        series_list: Sequence["ConsumptionSeries"],
+        item_ids: Optional[Sequence[Optional[Hashable]]] = None
+    ) -> List[SeasonalProfile]:
+        """複数商品の季節指数を取得（キャッシュにない商品だけをまとめて計算）"""
+        item_ids = list(item_ids) if item_ids is not None else [None] * len(series_list)
+        keys = [
+            (item_id, history_version(series)) if item_id is not None else None
+            for series, item_id in zip(series_list, item_ids)
+        ]
+
+        profiles: List[Optional[SeasonalProfile]] = [None] * len(series_list)
+        missing = []
+        for index, key in enumerate(keys):
+            profile = self._profiles.get(key) if key is not None else None
+            if profile is None:
+                missing.append(index)
+                continue
+            self._profiles.move_to_end(key)
+            profiles[index] = profile
+        self.hits += len(series_list) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = compute_profiles([series_list[index] for index in missing])
+            for index, profile in zip(missing, computed):
+                profiles[index] = profile
+                if keys[index] is not None:
+                    self._profiles[keys[index]] = profile
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+        return profiles
+
+    def get(self, series: "ConsumptionSeries", item_id: Optional[Hashable] = None) -> SeasonalProfile:
+        """1商品の季節指数を取得"""
+        return self.get_many([series], [item_id])[0]
@@ -0,0 +1,196 @@
+from typing import Iterable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:  # scikit-learn未導入の環境では類似検索を使用しない
+    sparse = None
+    TfidfVectorizer = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "market_similarity.npz")
+
+def keys_digest(keys: Iterable[str]) -> str:
+    """カタログのキー（順序を含む）のダイジェスト（索引を作り直す必要があるかの判定に使用）"""
+    return hashlib.blake2b("\n".join(keys).encode("utf-8"), digest_size=16).hexdigest()
+
+def is_available() -> bool:
+    """類似検索（scikit-learn）が使用可能かどうか"""
+    return TfidfVectorizer is not None
+
+class SimilarityIndex:
+    """
+    商品名の文字 n-gram による類似検索の索引
+
+    カタログのキーを文字 n-gram の TF-IDF ベクトル（L2正規化）に変換して保持し、
+    検索する商品名とのコサイン類似度の上位 k 件を返す。複数の商品名は
+    1回の疎行列積でまとめて計算する。索引はキーの集合（keys_digest）に対応し、
+    市場データの値だけが変わった場合はそのまま使える。
+
+    検索時のベクトル化は TfidfVectorizer.transform と同じ計算を直接行う
+    （transform は入力検証などの固定コストが大きく、1件の検索では支配的になるため）。
+    """
+
+    def __init__(self, keys: List[str], vectorizer, matrix, catalog_version=None):
+        self.keys = keys
+        self.catalog_version = catalog_version
+        self.keys_digest = keys_digest(keys)
+        self._vectorizer = vectorizer
+        self._analyzer = vectorizer.build_analyzer()
+        self._vocabulary = vectorizer.vocabulary_
+        self._idf = np.asarray(vectorizer.idf_, dtype=np.float32)
+        self._matrix_t = matrix.T.tocsr()  # n-gram × キー（検索時の行列積用）
+
+    @classmethod
+    def build(cls, keys: Iterable[str], catalog_version=None, ngram_range: Tuple[int, int] = (2, 3)) -> "SimilarityIndex":
+        """
+        カタログのキーから索引を作成
+
+        1文字の n-gram はほぼすべてのキーに現れて候補を増やすだけのため使わない
+        （char_wb は単語の前後に空白を補うため、1文字の商品名も2文字の n-gram になる）
+        """
+        keys = list(keys)
+        vectorizer = TfidfVectorizer(
+            analyzer="char_wb", ngram_range=ngram_range, lowercase=True, sublinear_tf=True, dtype=np.float32
+        )
+        matrix = vectorizer.fit_transform(keys)
+        return cls(keys, vectorizer, matrix, catalog_version)
+
+    def save(self, path: str) -> None:
+        """索引をファイル（圧縮した npz）に保存"""
+        matrix = self._matrix_t.T.tocsr()
+        vocabulary = sorted(self._vectorizer.vocabulary_.items(), key=lambda item: item[1])
+        np.savez_compressed(
+            path,
+            keys=np.array(self.keys),
+            terms=np.array([term for term, _ in vocabulary]),
+            idf=self._vectorizer.idf_.astype(np.float32),
+            data=matrix.data.astype(np.float32),
+            indices=matrix.indices.astype(np.int32),
+            indptr=matrix.indptr.astype(np.int64),
+            shape=np.array(matrix.shape, dtype=np.int64),
+            meta=np.array(json.dumps({
+                "catalog_version": self.catalog_version,
+                "keys_digest": self.keys_digest,
+                "ngram_range": list(self._vectorizer.ngram_range)
+            }))
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        """保存した索引を読み込み（n-gram の抽出規則と IDF を復元）"""
+        with np.load(path, allow_pickle=False) as artifact:
+            meta = json.loads(str(artifact["meta"]))
+            vectorizer = TfidfVectorizer(
+                analyzer="char_wb", ngram_range=tuple(meta["ngram_range"]),
+                lowercase=True, sublinear_tf=True, dtype=np.float32
+            )
+            vectorizer.vocabulary_ = {str(term): index for index, term in enumerate(artifact["terms"])}
+            vectorizer.idf_ = artifact["idf"]
+            matrix = sparse.csr_matrix(
+                (artifact["data"], artifact["indices"], artifact["indptr"]), shape=tuple(artifact["shape"])
+            )
+            return cls([str(key) for key in artifact["keys"]], vectorizer, matrix, meta["catalog_version"])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _vectorize(self, item_names: List[str]):
+        """商品名を TF-IDF ベクトル（L2正規化、sublinear_tf）の疎行列に変換"""
+        indptr = [0]
+        indices: List[np.ndarray] = []
+        data: List[np.ndarray] = []
+        for item_name in item_names:
+            counts = {}
+            for gram in self._analyzer(item_name):
+                column = self._vocabulary.get(gram)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            columns = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self._idf[columns]
+            norm = np.sqrt(np.dot(weights, weights))
+            if norm > 0:
+                weights /= norm
+            indices.append(columns)
+            data.append(weights)
+            indptr.append(indptr[-1] + len(columns))
+        return sparse.csr_matrix(
+            (
+                np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+                np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+                np.array(indptr)
+            ),
+            shape=(len(item_names), len(self._idf))
+        )
+
+    def query_many(self, item_names: List[str], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        """
+        複数の商品名について類似するキーを検索
+
+        Returns:
+            List[List[Tuple[str, float]]]: 商品名ごとの (キー, 類似度) の上位 top_k 件（類似度の降順）
+        """
+        if not item_names or not self.keys:
+            return [[] for _ in item_names]
+
+        scores = (self._vectorize(item_names) @ self._matrix_t).tocsr()
+        results = []
+        for row in range(len(item_names)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            data = scores.data[start:end]
+            columns = scores.indices[start:end]
+            if len(data) > top_k:
+                selected = np.argpartition(-data, top_k - 1)[:top_k]
+                data, columns = data[selected], columns[selected]
+            # 類似度の降順（同じ類似度はカタログの順）
+            order = np.lexsort((columns, -data))
+            results.append([(self.keys[columns[i]], round(float(data[i]), 4)) for i in order])
+        return results
+
+    def query(self, item_name: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """1件の商品名について類似するキーを検索"""
+        return self.query_many([item_name], top_k)[0]
+
+def load_or_build(keys: Iterable[str], catalog_version=None, path: Optional[str] = None) -> Optional[SimilarityIndex]:
+    """
+    保存済みの索引を読み込み（キーが異なる・存在しない場合はその場で作成）
+
+    カタログのバージョンが同じでも、更新内容（OverrideStore）で追加された商品があれば
+    キーが異なるため、保存済みの索引はキーのダイジェストで照合する
+
+    scikit-learn が使用できない場合は None を返す
+    """
+    if not is_available():
+        logger.warning("scikit-learn がインストールされていないため、類似検索を使用しません")
+        return None
+
+    keys = list(keys)
+    path = path or os.getenv("MARKET_SIMILARITY_INDEX_PATH", DEFAULT_INDEX_PATH)
+    if os.path.exists(path):
+        try:
+            index = SimilarityIndex.load(path)
+            if index.keys_digest == keys_digest(keys):
+                index.catalog_version = catalog_version
+                return index
+            logger.info(f"類似検索の索引がカタログと異なるため作成し直します（索引 {index.catalog_version}, {len(index)}件 / カタログ {catalog_version}, {len(keys)}件）")
+        except Exception as e:
+            logger.error(f"類似検索の索引の読み込みエラー: {str(e)}")
+    return SimilarityIndex.build(keys, catalog_version)
+
+# イメージの作成時などに実行: python similarity_index.py [出力先]
+if __name__ == "__main__":
+    from market_catalog import MarketCatalog
+
+    logging.basicConfig(level=logging.INFO)
+    snapshot = MarketCatalog(reload_interval_seconds=0).snapshot
+    output = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_INDEX_PATH
+    SimilarityIndex.build(snapshot.items.keys(), snapshot.version).save(output)
+    logger.info(f"類似検索の索引を作成しました: {output}（{len(snapshot.items)}件）")
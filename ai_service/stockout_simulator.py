@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class StockoutSimulator:
+    """
+    経験分布に基づく在庫切れリスクのモンテカルロ推定
+
+    商品ごとの日別消費量（消費のない日は0）から復元抽出で将来の
+    日別消費を生成し、累積消費が使用可能在庫に達する日を数える。
+    全商品・全試行を1つの配列でまとめて計算し、乱数シードを固定して
+    同じ入力には同じ結果を返す。
+    """
+
+    def __init__(
+        self,
+        paths: int = 1000,
+        horizon_days: int = 30,
+        checkpoints: Sequence[int] = (1, 3, 7, 14),
+        quantiles: Sequence[float] = (0.1, 0.5, 0.9),
+        seed: int = 42,
+        max_chunk_elements: int = 4_000_000
+    ):
+        self.paths = paths  # 試行回数
+        self.horizon_days = max(horizon_days, max(checkpoints))  # シミュレーション日数
+        self.checkpoints = list(checkpoints)  # 在庫切れ確率を求める日数
+        self.quantiles = list(quantiles)  # 残り日数の分位点
+        self.seed = seed
+        self.max_chunk_elements = max_chunk_elements  # 一度に生成する乱数の上限（メモリ使用量の制御）
+
+    def simulate_many(
+        self,
+        daily_demands: Sequence[np.ndarray],
+        usable_quantities: Sequence[float]
+    ) -> List[Optional[Dict]]:
+        """
+        複数商品の在庫切れリスクをまとめて推定
+
+        Args:
+            daily_demands: 商品ごとの日別消費量の経験分布（0を含む）
+            usable_quantities: 商品ごとの使用可能在庫（現在庫 - 最小在庫閾値）
+
+        Returns:
+            List[Optional[Dict]]: 商品順の推定結果（消費履歴のない商品は None）
+        """
+        item_count = len(daily_demands)
+        results: List[Optional[Dict]] = [None] * item_count
+        simulated = [index for index in range(item_count) if len(daily_demands[index]) > 0]
+        if not simulated:
+            return results
+
+        # 全商品で同じ一様乱数を共有する（共通乱数法）。一括処理と単体処理で結果が一致する
+        uniforms = self._uniforms()
+        chunk_size = max(self.max_chunk_elements // (self.paths * self.horizon_days), 1)
+        for start in range(0, len(simulated), chunk_size):
+            chunk = simulated[start:start + chunk_size]
+            chunk_results = self._simulate_chunk(
+                uniforms,
+                [np.asarray(daily_demands[index], dtype=np.float64) for index in chunk],
+                np.array([usable_quantities[index] for index in chunk], dtype=np.float64)
+            )
+            for index, result in zip(chunk, chunk_results):
+                results[index] = result
+        return results
+
+    def simulate(self, daily_demand: np.ndarray, usable_quantity: float) -> Optional[Dict]:
+        """1商品の在庫切れリスクを推定"""
+        return self.simulate_many([daily_demand], [usable_quantity])[0]
+
+    def _uniforms(self) -> np.ndarray:
+        """試行×日の一様乱数（固定シード）"""
+        return np.random.default_rng(self.seed).random((self.paths, self.horizon_days))
+
+    def _simulate_chunk(
+        self,
+        uniforms: np.ndarray,
+        daily_demands: List[np.ndarray],
+        usable: np.ndarray
+    ) -> List[Dict]:
+        """商品のまとまりについてシミュレーションを実行"""
+        lengths = np.array([len(demand) for demand in daily_demands], dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        pool = np.concatenate(daily_demands)
+
+        # 抽出した日別消費を累積し、使用可能在庫に達したかを判定
+        offsets = (uniforms[None, :, :] * lengths[:, None, None]).astype(np.int64)
+        draws = pool[starts[:, None, None] + offsets]
+        cumulative = np.cumsum(draws, axis=2)
+        depleted = cumulative >= usable[:, None, None]
+
+        # 在庫切れまでの日数（シミュレーション期間内に切れない試行は期間日数）
+        days_remaining = np.where(depleted.any(axis=2), depleted.argmax(axis=2), self.horizon_days)
+        probabilities = depleted[:, :, [day - 1 for day in self.checkpoints]].mean(axis=1)
+        quantile_days = np.quantile(days_remaining, self.quantiles, axis=1, method='lower').T
+
+        results = []
+        for row in range(len(daily_demands)):
+            results.append({
+                "stockout_probability": {
+                    f"{day}d": round(float(probabilities[row, column]), 4)
+                    for column, day in enumerate(self.checkpoints)
+                },
+                # シミュレーション期間内に在庫切れにならない分位点は None
+                "days_remaining_quantiles": {
+                    f"p{int(q * 100)}": int(quantile_days[row, column])
+                    if quantile_days[row, column] < self.horizon_days else None
+                    for column, q in enumerate(self.quantiles)
+                },
+                "simulation_paths": self.paths,
+                "horizon_days": self.horizon_days
+            })
+        return results
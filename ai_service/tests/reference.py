@@ -0,0 +1,162 @@
+"""
+最適化前の実装（パリティテスト・ベンチマークの比較基準）
+
+本体から置き換えた素直な実装を残し、新しい実装と結果が一致することを
+確認するために使用する。本体からは import しないこと。
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MIN_DATA_POINTS = 3
+
+def _daily_consumption(consumption_records: List[Dict]) -> pd.Series:
+    """日別消費量（pandas で集計）"""
+    df = pd.DataFrame(consumption_records)
+    df['consumption_date'] = pd.to_datetime(df['consumption_date'])
+    df = df.sort_values('consumption_date')
+    return df.groupby('consumption_date')['consumed_quantity'].sum()
+
+def consumption_pace(consumption_records: List[Dict]) -> float:
+    """pandas 版の消費ペース（ConsumptionAnalyzer.calculate_user_consumption_pace）"""
+    if not consumption_records or len(consumption_records) < MIN_DATA_POINTS:
+        return 1.0
+
+    daily_consumption = _daily_consumption(consumption_records)
+    if len(daily_consumption) < 2:
+        dates = pd.to_datetime(pd.Series([record['consumption_date'] for record in consumption_records]))
+        total_consumption = sum(record['consumed_quantity'] for record in consumption_records)
+        return total_consumption / max((dates.max() - dates.min()).days + 1, 1)
+
+    total_days = (daily_consumption.index.max() - daily_consumption.index.min()).days + 1
+    return max(daily_consumption.sum() / total_days, 0.1)
+
+def confidence_score(consumption_records: List[Dict]) -> float:
+    """pandas 版の信頼度スコア（ConsumptionAnalyzer._calculate_confidence_score）"""
+    data_points = len(consumption_records)
+    if data_points < 3:
+        base_score = 0.3
+    elif data_points < 10:
+        base_score = 0.6
+    elif data_points < 30:
+        base_score = 0.8
+    else:
+        base_score = 0.9
+
+    df = pd.DataFrame(consumption_records)
+    if 'consumption_date' not in df.columns:
+        return base_score
+    dates = pd.to_datetime(df['consumption_date'])
+    date_range = (dates.max() - dates.min()).days
+    if date_range > 90:
+        period_bonus = 0.1
+    elif date_range > 30:
+        period_bonus = 0.05
+    else:
+        period_bonus = 0.0
+    return min(base_score + period_bonus, 1.0)
+
+def seasonality(daily_consumption: pd.Series) -> Optional[str]:
+    """pandas 版の季節性判定（ConsumptionAnalyzer._analyze_seasonality）"""
+    weekday_consumption = daily_consumption.groupby(daily_consumption.index.dayofweek).mean()
+    if weekday_consumption.std() > weekday_consumption.mean() * 0.3:
+        return 'weekly'
+
+    if len(daily_consumption) > 90:
+        monthly_consumption = daily_consumption.groupby(daily_consumption.index.month).mean()
+        if monthly_consumption.std() > monthly_consumption.mean() * 0.2:
+            return 'monthly'
+    return None
+
+def consumption_pattern(consumption_records: List[Dict]) -> Dict:
+    """
+    pandas 版の消費パターン（トレンド以外）
+
+    トレンドは暦日ベースの回帰に変更済みのため比較対象に含めない
+    """
+    if not consumption_records or len(consumption_records) < MIN_DATA_POINTS:
+        return {
+            "average_daily_consumption": 1.0,
+            "consumption_variance": 0.0,
+            "seasonal_pattern": None,
+            "confidence_score": 0.3
+        }
+
+    daily_consumption = _daily_consumption(consumption_records)
+    return {
+        "average_daily_consumption": consumption_pace(consumption_records),
+        "consumption_variance": daily_consumption.var() if len(daily_consumption) > 1 else 0.0,
+        "seasonal_pattern": seasonality(daily_consumption) if len(daily_consumption) > 30 else None,
+        "confidence_score": confidence_score(consumption_records)
+    }
+
+def polyfit_slope(x, y) -> float:
+    """np.polyfit による1次回帰の傾き（TrendEstimator の閉形式の比較基準）"""
+    if len(x) < 2 or len(set(x)) < 2:
+        return 0.0
+    return float(np.polyfit(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), 1)[0])
+
+def pairwise_median_slope(x, y) -> float:
+    """全ての2点間の傾きの中央値を素直なループで計算（Theil-Sen の比較基準）"""
+    slopes = [
+        (y[j] - y[i]) / (x[j] - x[i])
+        for i in range(len(x))
+        for j in range(i + 1, len(x))
+        if x[j] != x[i]
+    ]
+    return float(np.median(slopes)) if slopes else 0.0
+
+def first_contained_key(keys: List[str], item_name: str) -> Optional[str]:
+    """
+    旧 _fuzzy_search の線形走査（どちらかの方向に含まれる最初のキー）
+
+    結果がカタログの登録順に依存するため、ベンチマークの比較基準としてのみ使用する
+    """
+    text = item_name.lower()
+    for key in keys:
+        if key.lower() in text or text in key.lower():
+            return key
+    return None
+
+def longest_contained_key(keys: List[str], item_name: str) -> Optional[str]:
+    """
+    全キーを走査して最長一致のキーを選ぶ（CatalogIndex.match の比較基準）
+
+    一致した部分が長いもの、次に短いキー、次に登録順が早いキーを優先する
+    """
+    text = item_name.lower()
+    if not text:
+        return None
+
+    best = None
+    for position, key in enumerate(keys):
+        normalized = key.lower()
+        if normalized in text:
+            rank = (-len(normalized), len(normalized), position)
+        elif text in normalized:
+            rank = (-len(text), len(normalized), position)
+        else:
+            continue
+        if best is None or rank < best:
+            best = rank
+    return keys[best[2]] if best else None
+
+def stockout_days_remaining(uniforms: np.ndarray, daily_demand: List[float], usable_quantity: float) -> List[int]:
+    """
+    試行ごとに1日ずつ消費を積み上げて在庫切れ日を求める（StockoutSimulator の比較基準）
+
+    uniforms は (試行, 日) の一様乱数。期間内に在庫切れにならない試行は期間日数
+    """
+    paths, horizon_days = uniforms.shape
+    results = []
+    for path in range(paths):
+        consumed = 0.0
+        day_remaining = horizon_days
+        for day in range(horizon_days):
+            consumed += daily_demand[int(uniforms[path, day] * len(daily_demand))]
+            if consumed >= usable_quantity:
+                day_remaining = day
+                break
+        results.append(day_remaining)
+    return results
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from catalog_index import CatalogIndex
+from tests import reference
+
+CHARACTERS = [chr(code) for code in range(0x30A1, 0x30F6)] + list("米肉茶油塩乳卵紙石鹸洗剤ABCabc")
+
+def random_word(rng: random.Random, shortest: int, longest: int) -> str:
+    return "".join(rng.choice(CHARACTERS) for _ in range(rng.randint(shortest, longest)))
+
+def random_catalog(rng: random.Random, size: int):
+    return list(dict.fromkeys(random_word(rng, 1, 8) for _ in range(size)))
+
+def random_queries(rng: random.Random, keys, count: int):
+    """キーの一部・キーを含む商品名・無関係な商品名を混ぜた検索語"""
+    queries = []
+    for _ in range(count):
+        draw = rng.random()
+        key = rng.choice(keys)
+        if draw < 0.3:
+            queries.append(key[1:-1] or key)
+        elif draw < 0.6:
+            queries.append(random_word(rng, 0, 3) + key + random_word(rng, 0, 3))
+        elif draw < 0.7:
+            queries.append(key.upper())
+        else:
+            queries.append(random_word(rng, 1, 10))
+    return queries
+
+@pytest.mark.parametrize("size", [20, 300, 3000])
+def test_match_equals_brute_force_longest_match(size):
+    rng = random.Random(size)
+    keys = random_catalog(rng, size)
+    index = CatalogIndex(keys)
+    for query in random_queries(rng, keys, 1000):
+        assert index.match(query) == reference.longest_contained_key(keys, query)
+
+def test_match_many_equals_match():
+    rng = random.Random(1)
+    keys = random_catalog(rng, 500)
+    index = CatalogIndex(keys)
+    queries = random_queries(rng, keys, 500)
+    queries += queries[:100]
+    assert index.match_many(queries) == [index.match(query) for query in queries]
+
+def test_incremental_add_equals_fresh_build():
+    rng = random.Random(2)
+    keys = random_catalog(rng, 600)
+    incremental = CatalogIndex(keys[:300])
+    queries = random_queries(rng, keys, 500)
+    incremental.match_many(queries)  # 構築済みのオートマトンに後からキーを追加する
+    for key in keys[300:]:
+        incremental.add(key)
+
+    fresh = CatalogIndex(keys)
+    assert incremental.match_many(queries) == fresh.match_many(queries)
+
+def test_empty_name_matches_nothing():
+    assert CatalogIndex(["米", "お茶"]).match("") is None
@@ -0,0 +1,102 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from consumption_analyzer import ConsumptionAnalyzer, ConsumptionSeries
+from tests import reference
+
+def random_records(rng: random.Random):
+    """0〜150件・期間1〜400日のランダムな消費履歴"""
+    count = rng.choice([0, 1, 2, 3, 4, 5, 10, 30, 60, 100, 150])
+    span = rng.choice([1, 3, 10, 40, 100, 200, 400])
+    start = date(2023, 1, 1) + timedelta(days=rng.randint(0, 300))
+    return [
+        {
+            "consumption_date": (start + timedelta(days=rng.randint(0, span - 1))).isoformat(),
+            "consumed_quantity": rng.choice([0, 1, 1, 2, 3, 5]) if rng.random() < 0.9 else rng.randint(0, 50)
+        }
+        for _ in range(count)
+    ]
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return ConsumptionAnalyzer()
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_pandas_implementation(analyzer, seed):
+    """NumPy 版の分析結果が pandas 版と完全に一致する"""
+    rng = random.Random(seed)
+    for _ in range(250):
+        records = random_records(rng)
+        pattern = analyzer.analyze_consumption_pattern(records)
+        expected = reference.consumption_pattern(records)
+
+        assert analyzer.calculate_user_consumption_pace(records) == reference.consumption_pace(records)
+        assert analyzer._calculate_confidence_score(records) == reference.confidence_score(records)
+        assert pattern.average_daily_consumption == expected["average_daily_consumption"]
+        assert pattern.consumption_variance == expected["consumption_variance"]
+        assert pattern.seasonal_pattern == expected["seasonal_pattern"]
+        assert pattern.confidence_score == expected["confidence_score"]
+
+def test_prebuilt_series_matches_records(analyzer):
+    """記録リストと作成済みの系列で結果が一致する"""
+    rng = random.Random(10)
+    for _ in range(200):
+        records = random_records(rng)
+        if not records:
+            continue
+        series = ConsumptionSeries.from_records(records)
+        assert analyzer.analyze_consumption_pattern(series) == analyzer.analyze_consumption_pattern(records)
+        assert analyzer.calculate_user_consumption_pace(series) == analyzer.calculate_user_consumption_pace(records)
+
+def test_null_dates_match_pandas_implementation(analyzer):
+    """日付が欠けた記録は pandas 版と同じく日別集計から除外される"""
+    rng = random.Random(20)
+    checked = 0
+    while checked < 200:
+        records = random_records(rng)
+        if not records:
+            continue
+        for record in rng.sample(records, rng.randint(1, max(len(records) // 3, 1))):
+            record["consumption_date"] = None
+        if all(record["consumption_date"] is None for record in records):
+            continue
+        checked += 1
+        pattern = analyzer.analyze_consumption_pattern(records)
+        expected = reference.consumption_pattern(records)
+
+        assert analyzer.calculate_user_consumption_pace(records) == reference.consumption_pace(records)
+        assert analyzer._calculate_confidence_score(records) == reference.confidence_score(records)
+        assert pattern.consumption_variance == expected["consumption_variance"]
+        assert pattern.seasonal_pattern == expected["seasonal_pattern"]
+
+def test_single_day_with_null_date():
+    """単日の記録に日付のない記録が混ざっても総量を期間で割る"""
+    records = [
+        {"consumption_date": "2024-01-01", "consumed_quantity": 1},
+        {"consumption_date": "2024-01-01", "consumed_quantity": 1},
+        {"consumption_date": None, "consumed_quantity": 1}
+    ]
+    assert ConsumptionAnalyzer().calculate_user_consumption_pace(records) == reference.consumption_pace(records) == 3.0
+
+def test_batch_with_null_date_item_matches_per_item(analyzer):
+    """日付のない記録を含む商品が混ざっても一括分析は商品ごとの分析と一致する"""
+    rng = random.Random(30)
+    records_list = [random_records(rng) for _ in range(40)]
+    records_list[5] = [
+        {"consumption_date": "2024-01-01", "consumed_quantity": 2},
+        {"consumption_date": None, "consumed_quantity": 1},
+        {"consumption_date": "2024-01-05", "consumed_quantity": 3}
+    ]
+    records_list[6] = [{"consumption_date": None, "consumed_quantity": 1} for _ in range(4)]
+
+    batch = analyzer.analyze_batch(records_list)
+    assert len(batch) == len(records_list)
+    for index, records in enumerate(records_list):
+        pattern = analyzer.analyze_consumption_pattern(records)
+        assert batch.paces[index] == pytest.approx(pattern.average_daily_consumption)
+        assert batch.variances[index] == pytest.approx(pattern.consumption_variance)
+        assert batch.confidence_scores[index] == pattern.confidence_score
+        assert batch.trend_directions[index] == pattern.trend_direction
+    assert analyzer.forecast_paces(records_list)[0:5] == analyzer.forecast_paces(records_list[0:5])
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from recommendation_engine import DETAIL_SUMMARY, RecommendationEngine
+
+def random_stockout_risk(rng: random.Random):
+    if rng.random() < 0.7:
+        return None
+    return {
+        "stockout_probability": {f"{days}d": rng.random() for days in (1, 3, 7, 14)},
+        "days_remaining_p50": rng.randint(0, 30)
+    }
+
+def random_items(rng: random.Random, count: int):
+    """ゼロ・負の市場ペース、在庫0、範囲外の消費ペース、目標在庫、在庫切れリスクを含む商品"""
+    items = []
+    for index in range(count):
+        user_pace = rng.choice([0, 0.0005, 0.01, rng.random() * 3, rng.uniform(0, 20), 1, 2.5])
+        items.append({
+            "item_id": index,
+            "item_name": f"商品{index}",
+            "user_pace": user_pace,
+            "market_pace": rng.choice([0, -1, rng.random() * 3, user_pace, 1.0]),
+            "current_quantity": rng.choice([0, 1, rng.randint(0, 200), 10 ** 6]),
+            "minimum_threshold": rng.randint(0, 5),
+            "target_stock_level": rng.choice([None, 0, rng.randint(1, 50)]),
+            "stockout_risk": random_stockout_risk(rng)
+        })
+    return items
+
+@pytest.fixture(scope="module")
+def engine():
+    return RecommendationEngine()
+
+@pytest.mark.parametrize("seed", range(3))
+def test_columnar_batch_matches_per_item(engine, seed):
+    """列単位の一括計算が商品ごとの計算と（キーの順序も含めて）一致する"""
+    items = random_items(random.Random(seed), 3000)
+    expected = engine._batch_generate_recommendations_scalar(items)
+    actual = engine.batch_generate_recommendations(items)
+
+    assert len(actual) == len(expected)
+    for actual_item, expected_item in zip(actual, expected):
+        assert actual_item == expected_item
+        assert list(actual_item) == list(expected_item)
+
+def test_summary_detail_matches_per_item(engine):
+    items = random_items(random.Random(10), 1000)
+    for item in items:
+        item["detail"] = DETAIL_SUMMARY
+
+    actual = engine.batch_generate_recommendations(items)
+    assert actual == engine._batch_generate_recommendations_scalar(items)
+    assert all(result["additional_info"] is None for result in actual)
+
+def test_matches_generate_recommendation(engine):
+    """一括計算の結果が単体の generate_recommendation と一致する"""
+    items = random_items(random.Random(20), 500)
+    for item, result in zip(items, engine.batch_generate_recommendations(items)):
+        single = engine.generate_recommendation(
+            user_pace=item["user_pace"],
+            market_pace=item["market_pace"],
+            current_quantity=item["current_quantity"],
+            minimum_threshold=item["minimum_threshold"],
+            target_stock_level=item["target_stock_level"],
+            stockout_risk=item["stockout_risk"]
+        )
+        assert {key: result[key] for key in single} == single
+
+def test_summary_detail_omits_additional_info_on_fallback(engine):
+    """summary ではデフォルト推奨（エラー時）でも additional_info を返さない"""
+    single = engine.generate_recommendation(
+        user_pace=None, market_pace=1.0, current_quantity=3, minimum_threshold=1, detail=DETAIL_SUMMARY
+    )
+    assert single["additional_info"] is None
+    assert engine.generate_recommendation(
+        user_pace=None, market_pace=1.0, current_quantity=3, minimum_threshold=1
+    )["additional_info"] is not None
+
+    items = random_items(random.Random(30), 50)
+    for item in items:
+        item["detail"] = DETAIL_SUMMARY
+    items[0]["user_pace"] = None  # 列単位の計算が失敗し商品ごとの計算に切り替わる
+    actual = engine.batch_generate_recommendations(items)
+    assert len(actual) == len(items)
+    assert all(result["additional_info"] is None for result in actual)
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("sklearn")
+
+import similarity_index
+from market_catalog import MarketCatalog
+from market_data_service import MarketDataService
+from similarity_index import SimilarityIndex
+
+BODY_SOAP_REFILL = {"average_consumption_per_day": 0.02, "category": "日用品", "unit": "L"}
+
+def test_saved_index_is_rebuilt_when_keys_change(tmp_path):
+    path = str(tmp_path / "index.npz")
+    SimilarityIndex.build(["牛乳", "食パン"], catalog_version=1).save(path)
+
+    same = similarity_index.load_or_build(["牛乳", "食パン"], catalog_version=1, path=path)
+    added = similarity_index.load_or_build(["牛乳", "食パン", "ボディソープ詰め替え"], catalog_version=1, path=path)
+
+    assert same.keys == ["牛乳", "食パン"]
+    assert added.keys == ["牛乳", "食パン", "ボディソープ詰め替え"]
+
+def test_added_item_is_found_after_background_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setenv("MARKET_SIMILARITY_INDEX_PATH", str(tmp_path / "missing.npz"))
+    service = MarketDataService()
+    service.catalog = MarketCatalog(reload_interval_seconds=0, overrides_path=str(tmp_path / "overrides.sqlite3"))
+    service.load_similarity_index()
+    before = service._similarity[1]
+
+    service.catalog.update_item("ボディソープ詰め替え", BODY_SOAP_REFILL)
+    service.find_similar_items(["ボディソープ詰め替え用"], 3)  # 以前の索引のまま作成を開始
+    service._similarity_future.result()
+    matches = service.find_similar_items(["ボディソープ詰め替え用"], 3)[0]
+
+    assert service._similarity[1] is not before
+    assert matches[0]["item_name"] == "ボディソープ詰め替え"
+    assert matches[0]["average_consumption_per_day"] == 0.02
+
+def test_value_only_update_reuses_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("MARKET_SIMILARITY_INDEX_PATH", str(tmp_path / "missing.npz"))
+    service = MarketDataService()
+    service.catalog = MarketCatalog(reload_interval_seconds=0, overrides_path=str(tmp_path / "overrides.sqlite3"))
+    service.load_similarity_index()
+    before = service._similarity[1]
+    key = before.keys[0]
+
+    service.catalog.update_item(key, {**service.catalog.snapshot.items[key], "average_consumption_per_day": 9.5})
+    matches = service.find_similar_items([key], 1)[0]
+
+    assert service._similarity[1] is before
+    assert service._similarity_future is None
+    assert matches[0]["average_consumption_per_day"] == 9.5
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+
+from stockout_simulator import StockoutSimulator
+from tests import reference
+
+def random_demand(rng: random.Random):
+    """消費のない日を多く含む日別消費量（長さ1〜120日）"""
+    return np.array([
+        0.0 if rng.random() < 0.6 else float(rng.choice([1, 1, 2, 3, 10]))
+        for _ in range(rng.randint(1, 120))
+    ])
+
+@pytest.fixture(scope="module")
+def simulator():
+    return StockoutSimulator(paths=200)
+
+def test_matches_per_path_loop(simulator):
+    """まとめて計算した在庫切れ確率・分位点が試行ごとのループと一致する"""
+    rng = random.Random(0)
+    demands = [random_demand(rng) for _ in range(30)]
+    usable = [rng.choice([0, 1, 3, 10, 50, 500]) for _ in demands]
+    uniforms = simulator._uniforms()
+
+    for demand, quantity, result in zip(demands, usable, simulator.simulate_many(demands, usable)):
+        days_remaining = np.array(reference.stockout_days_remaining(uniforms, list(demand), quantity))
+        for day in simulator.checkpoints:
+            assert result["stockout_probability"][f"{day}d"] == round(float(np.mean(days_remaining <= day - 1)), 4)
+        for q in simulator.quantiles:
+            expected = int(np.quantile(days_remaining, q, method='lower'))
+            assert result["days_remaining_quantiles"][f"p{int(q * 100)}"] == (
+                expected if expected < simulator.horizon_days else None
+            )
+
+def test_reproducible_with_fixed_seed():
+    """同じシードでは同じ結果、一括と単体・チャンク分割の有無でも一致する"""
+    rng = random.Random(1)
+    demands = [random_demand(rng) for _ in range(20)]
+    usable = [rng.randint(0, 40) for _ in demands]
+
+    first = StockoutSimulator(seed=7).simulate_many(demands, usable)
+    assert StockoutSimulator(seed=7).simulate_many(demands, usable) == first
+    assert StockoutSimulator(seed=7, max_chunk_elements=1).simulate_many(demands, usable) == first
+    single = StockoutSimulator(seed=7)
+    assert [single.simulate(demand, quantity) for demand, quantity in zip(demands, usable)] == first
+
+def test_edge_inputs_stay_in_range(simulator):
+    """消費ゼロ・在庫ゼロ・履歴なしでも確率は [0, 1] に収まる"""
+    demands = [np.zeros(30), np.array([1.0, 2.0]), np.empty(0), np.zeros(1), np.array([0.0, 5.0])]
+    usable = [10, 0, 5, 0, -3]
+    results = simulator.simulate_many(demands, usable)
+
+    assert results[2] is None  # 履歴なし
+    zero_pace = results[0]
+    assert all(value == 0.0 for value in zero_pace["stockout_probability"].values())
+    assert all(value is None for value in zero_pace["days_remaining_quantiles"].values())
+    for result in (results[1], results[3], results[4]):
+        # 使用可能在庫が0以下なら初日に在庫切れ
+        assert all(value == 1.0 for value in result["stockout_probability"].values())
+        assert all(value == 0 for value in result["days_remaining_quantiles"].values())
+
+    rng = random.Random(2)
+    demands = [random_demand(rng) for _ in range(50)]
+    for result in simulator.simulate_many(demands, [rng.randint(0, 100) for _ in demands]):
+        probabilities = list(result["stockout_probability"].values())
+        assert all(0.0 <= value <= 1.0 for value in probabilities)
+        assert probabilities == sorted(probabilities)  # 期間が長いほど確率は下がらない
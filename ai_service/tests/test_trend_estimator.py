@@ -0,0 +1,75 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from consumption_analyzer import ConsumptionAnalyzer, ConsumptionSeries
+from tests import reference
+from trend_estimator import (
+    TrendEstimator,
+    grouped_least_squares_slopes,
+    least_squares_slope,
+    theil_sen_slope
+)
+
+def random_points(rng: np.random.Generator, count: int):
+    """昇順の消費日（エポック日数）と消費量"""
+    days = np.sort(rng.choice(np.arange(19000, 19400), size=count, replace=False))
+    return days, rng.integers(0, 6, count).astype(np.float64)
+
+def test_least_squares_matches_polyfit():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        days, values = random_points(rng, int(rng.integers(2, 60)))
+        offsets = days - days[0]
+        assert least_squares_slope(offsets, values) == pytest.approx(
+            reference.polyfit_slope(offsets, values), rel=1e-9, abs=1e-12
+        )
+
+def test_grouped_slopes_match_per_item():
+    rng = np.random.default_rng(1)
+    points = [random_points(rng, int(rng.integers(1, 40))) for _ in range(300)]
+    days = np.concatenate([item_days for item_days, _ in points])
+    values = np.concatenate([item_values for _, item_values in points])
+    groups = np.repeat(np.arange(len(points)), [len(item_days) for item_days, _ in points])
+
+    grouped = grouped_least_squares_slopes(days, values, groups, len(points))
+    expected = [least_squares_slope(item_days, item_values) for item_days, item_values in points]
+    np.testing.assert_allclose(grouped, expected, rtol=1e-9, atol=1e-12)
+
+def test_theil_sen_matches_pairwise_loop():
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        days, values = random_points(rng, int(rng.integers(2, 25)))
+        offsets = (days - days[0]).astype(np.float64)
+        assert theil_sen_slope(offsets, values) == pytest.approx(
+            reference.pairwise_median_slope(offsets.tolist(), values.tolist()), abs=1e-12
+        )
+
+@pytest.mark.parametrize("robust", [False, True])
+def test_batch_trend_matches_single_item(robust):
+    """analyze_batch（グループ計算）と商品ごとの分析でトレンドが一致する"""
+    analyzer = ConsumptionAnalyzer()
+    analyzer.trend_estimator = TrendEstimator(threshold=analyzer.trend_threshold, robust=robust)
+    rng = random.Random(3)
+    records_list = []
+    for _ in range(1000):
+        start = date(2023, 1, 1) + timedelta(days=rng.randint(0, 300))
+        span = rng.choice([3, 10, 40, 100])
+        records_list.append([
+            {
+                "consumption_date": (start + timedelta(days=rng.randint(0, span - 1))).isoformat(),
+                "consumed_quantity": rng.choice([0, 1, 2, 3, 5])
+            }
+            for _ in range(rng.choice([0, 2, 3, 4, 5, 10, 30, 60]))
+        ])
+
+    batch = analyzer.analyze_batch(records_list)
+    for index, records in enumerate(records_list):
+        assert analyzer.analyze_consumption_pattern(records).trend_direction == batch.trend_directions[index]
+        if len(records) >= 3:
+            series = ConsumptionSeries.from_records(records)
+            assert batch.trend_slopes[index] == pytest.approx(
+                analyzer.trend_estimator.slope(series.days, series.daily_totals), abs=1e-12
+            )
@@ -0,0 +1,141 @@
+import gzip
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import wire_format
+from wire_format import (
+    COMPACT_CONTENT_ENCODING,
+    COMPACT_MEDIA_TYPE,
+    accepts_compact,
+    decode_payload,
+    encode_payload,
+    is_compact_content_type,
+)
+
+msgpack = pytest.importorskip("msgpack")
+
+RECORDS = [
+    {"consumption_date": "2024-01-01T08:30:00", "consumed_quantity": 2, "notes": "朝食"},
+    {"consumption_date": date(2024, 1, 3), "consumed_quantity": 1.5},
+    {"consumption_date": datetime(2024, 2, 29, 23, 59), "consumed_quantity": 0},
+    {"consumption_date": 19000, "consumed_quantity": 4}
+]
+
+def consumption_payload():
+    return {
+        "item_id": 1,
+        "item_name": "牛乳",
+        "consumption_records": [
+            {"consumption_date": f"2024-01-{day:02d}", "consumed_quantity": day % 3 + 1, "notes": "メモ"}
+            for day in range(1, 21)
+        ],
+        "current_quantity": 5,
+        "minimum_threshold": 1
+    }
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+def test_backend_and_ai_service_copies_are_identical():
+    """backend と ai_service の wire_format.py が同じ内容である"""
+    root = Path(__file__).resolve().parents[2]
+    assert (root / "backend" / "wire_format.py").read_bytes() == (root / "ai_service" / "wire_format.py").read_bytes()
+
+def test_round_trip_normalizes_records():
+    """msgpack + gzip の往復で消費記録は日付（ISO）と数量だけになり、それ以外はそのまま戻る"""
+    payload = [{"user_id": 3, "item_data": {"item_name": "卵", "consumption_records": RECORDS}, "detail": "summary"}]
+    body = encode_payload(payload)
+
+    assert body[:2] == b"\x1f\x8b"
+    assert decode_payload(body) == [{
+        "user_id": 3,
+        "item_data": {
+            "item_name": "卵",
+            "consumption_records": [
+                {"consumption_date": "2024-01-01", "consumed_quantity": 2},
+                {"consumption_date": "2024-01-03", "consumed_quantity": 1.5},
+                {"consumption_date": "2024-02-29", "consumed_quantity": 0},
+                {"consumption_date": "2022-01-08", "consumed_quantity": 4}
+            ]
+        },
+        "detail": "summary"
+    }]
+    # gzip を外した msgpack（HTTP クライアントが Content-Encoding を展開した場合）も解釈できる
+    assert decode_payload(gzip.decompress(body)) == decode_payload(body)
+
+def test_invalid_dates_are_rejected():
+    with pytest.raises(ValueError):
+        encode_payload({"consumption_records": [{"consumption_date": True, "consumed_quantity": 1}]})
+    with pytest.raises(ValueError):
+        encode_payload({"consumption_records": [{"consumption_date": 1.5, "consumed_quantity": 1}]})
+
+def test_header_negotiation_helpers():
+    assert is_compact_content_type("application/x-msgpack; charset=binary")
+    assert not is_compact_content_type("application/json")
+    assert not is_compact_content_type(None)
+    assert accepts_compact(f"{COMPACT_MEDIA_TYPE}, application/json;q=0.5")
+    assert not accepts_compact("application/json")
+    assert not accepts_compact(None)
+
+def test_compact_request_and_response(client):
+    """コンパクト形式で送受信した結果がJSONでの結果と一致する"""
+    payload = consumption_payload()
+    expected = client.post("/analyze/consumption-pace", json=payload)
+    response = client.post(
+        "/analyze/consumption-pace",
+        content=encode_payload(payload),
+        headers={
+            "Content-Type": COMPACT_MEDIA_TYPE,
+            "Content-Encoding": COMPACT_CONTENT_ENCODING,
+            "Accept": f"{COMPACT_MEDIA_TYPE}, application/json;q=0.5"
+        }
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == COMPACT_MEDIA_TYPE
+    assert response.headers["content-encoding"] == COMPACT_CONTENT_ENCODING
+    assert decode_payload(response.content) == expected.json()
+
+def test_compact_request_without_compact_accept_returns_json(client):
+    """Accept にコンパクト形式を含まない場合はJSONで応答する"""
+    response = client.post(
+        "/analyze/consumption-pace",
+        content=encode_payload(consumption_payload()),
+        headers={"Content-Type": COMPACT_MEDIA_TYPE, "Content-Encoding": COMPACT_CONTENT_ENCODING}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == client.post("/analyze/consumption-pace", json=consumption_payload()).json()
+
+def test_falls_back_to_json_without_msgpack(client, monkeypatch):
+    """msgpack がない場合、コンパクト形式の送信は 415（クライアントはJSONで再送）、応答はJSON"""
+    body = encode_payload(consumption_payload())
+    monkeypatch.setattr(wire_format, "msgpack", None)
+    monkeypatch.setattr(main, "is_compact_available", wire_format.is_compact_available)
+
+    rejected = client.post(
+        "/analyze/consumption-pace",
+        content=body,
+        headers={"Content-Type": COMPACT_MEDIA_TYPE, "Content-Encoding": COMPACT_CONTENT_ENCODING}
+    )
+    assert rejected.status_code == 415
+
+    response = client.post(
+        "/analyze/consumption-pace", json=consumption_payload(), headers={"Accept": COMPACT_MEDIA_TYPE}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    with pytest.raises(RuntimeError):
+        encode_payload(consumption_payload())
+
+def test_compact_payload_is_smaller_than_json():
+    payload = [{"item_data": consumption_payload()} for _ in range(20)]
+    assert len(encode_payload(payload)) < len(json.dumps(payload).encode("utf-8")) / 3
+    assert len(msgpack.packb(payload)) > len(encode_payload(payload))
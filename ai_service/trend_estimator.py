@@ -0,0 +1,141 @@
+from typing import Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def least_squares_slope(x: np.ndarray, y: np.ndarray) -> float:
+    """
+    最小二乗法による傾きを閉形式で計算
+
+    Args:
+        x: 経過日数などの説明変数
+        y: 消費量
+
+    Returns:
+        float: 傾き（xが1つしかない場合は0.0）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(x)
+    if count < 2:
+        return 0.0
+
+    # 数値誤差を抑えるため平均からの偏差で計算
+    x_centered = x - x.mean()
+    denominator = np.dot(x_centered, x_centered)
+    if denominator <= 0:
+        return 0.0
+    return float(np.dot(x_centered, y - y.mean()) / denominator)
+
+def grouped_least_squares_slopes(
+    x: np.ndarray,
+    y: np.ndarray,
+    groups: np.ndarray,
+    group_count: int
+) -> np.ndarray:
+    """
+    グループ（商品）ごとの最小二乗法の傾きをまとめて計算
+
+    Args:
+        x: 説明変数（全グループを連結した配列）
+        y: 目的変数（全グループを連結した配列）
+        groups: 各要素が属するグループ番号（0 〜 group_count-1）
+        group_count: グループ数
+
+    Returns:
+        np.ndarray: グループごとの傾き（点が2つ未満のグループは0.0）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    counts = np.bincount(groups, minlength=group_count)
+    safe_counts = np.maximum(counts, 1)
+
+    # グループ平均からの偏差で計算（大きな日付値でも桁落ちしない）
+    x_means = np.bincount(groups, weights=x, minlength=group_count) / safe_counts
+    y_means = np.bincount(groups, weights=y, minlength=group_count) / safe_counts
+    x_centered = x - x_means[groups]
+    y_centered = y - y_means[groups]
+
+    sxx = np.bincount(groups, weights=x_centered * x_centered, minlength=group_count)
+    sxy = np.bincount(groups, weights=x_centered * y_centered, minlength=group_count)
+
+    return np.divide(sxy, sxx, out=np.zeros(group_count), where=(counts >= 2) & (sxx > 0))
+
+def theil_sen_slope(x: np.ndarray, y: np.ndarray) -> float:
+    """
+    Theil-Sen推定による頑健な傾き（全ての2点間の傾きの中央値）
+
+    外れ値（まとめ買い直後の大量消費など）の影響を受けにくい
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) < 2:
+        return 0.0
+
+    i, j = np.triu_indices(len(x), k=1)
+    dx = x[j] - x[i]
+    valid = dx != 0
+    if not valid.any():
+        return 0.0
+    return float(np.median((y[j] - y[i])[valid] / dx[valid]))
+
+class TrendEstimator:
+    """暦日ベースの消費トレンド推定"""
+
+    def __init__(self, threshold: float = 0.1, robust: bool = False, min_points: int = 3):
+        self.threshold = threshold  # トレンド判定閾値（1日あたりの変化量）
+        self.robust = robust  # Theil-Sen推定を使用するか
+        self.min_points = min_points
+
+    def slope(self, days: np.ndarray, values: np.ndarray) -> float:
+        """消費日（エポック日数）と消費量から傾きを推定"""
+        if len(days) < self.min_points:
+            return 0.0
+        offsets = np.asarray(days, dtype=np.float64) - days[0]
+        if self.robust:
+            return theil_sen_slope(offsets, values)
+        return least_squares_slope(offsets, values)
+
+    def slopes(
+        self,
+        days: np.ndarray,
+        values: np.ndarray,
+        groups: np.ndarray,
+        group_count: int,
+        first_days: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """複数商品の傾きをまとめて推定"""
+        counts = np.bincount(groups, minlength=group_count)
+        if first_days is not None:
+            offsets = np.asarray(days, dtype=np.float64) - first_days[groups]
+        else:
+            offsets = np.asarray(days, dtype=np.float64)
+
+        if self.robust:
+            slopes = np.zeros(group_count)
+            order = np.argsort(groups, kind='stable')
+            boundaries = np.concatenate([[0], np.cumsum(counts)])
+            for group in np.flatnonzero(counts >= self.min_points):
+                members = order[boundaries[group]:boundaries[group + 1]]
+                slopes[group] = theil_sen_slope(offsets[members], values[members])
+            return slopes
+
+        slopes = grouped_least_squares_slopes(offsets, values, groups, group_count)
+        return np.where(counts < self.min_points, 0.0, slopes)
+
+    def direction(self, slope: float) -> str:
+        """傾きからトレンド方向を判定"""
+        if slope > self.threshold:
+            return 'increasing'
+        elif slope < -self.threshold:
+            return 'decreasing'
+        return 'stable'
+
+    def directions(self, slopes: np.ndarray) -> list:
+        """複数の傾きからトレンド方向をまとめて判定"""
+        return np.where(
+            slopes > self.threshold, 'increasing',
+            np.where(slopes < -self.threshold, 'decreasing', 'stable')
+        ).tolist()
@@ -0,0 +1,113 @@
+"""
+backend ↔ ai_service 間のワイヤーフォーマット（msgpack + gzip / JSON）
+
+各サービスのイメージは別々にビルドされるため、backend/wire_format.py と
+ai_service/wire_format.py に同じ内容を置いている。変更する場合は両方を同じ
+内容に保つこと（ai_service/tests/test_wire_format.py で確認している）。
+"""
+import gzip
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # msgpack未導入の環境ではJSONのみで通信する
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# backend ↔ ai_service 間で使用するメディアタイプ
+JSON_MEDIA_TYPE = "application/json"
+COMPACT_MEDIA_TYPE = "application/x-msgpack"
+COMPACT_CONTENT_ENCODING = "gzip"
+
+# 消費記録のうち分析で使用するフィールド（それ以外は送信しない）
+RECORDS_FIELD = "consumption_records"
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def is_compact_available() -> bool:
+    """コンパクト形式（msgpack + gzip）が利用可能かどうか"""
+    return msgpack is not None
+
+def date_to_epoch_day(value: Any) -> int:
+    """日付（date / datetime / ISO文字列 / エポック日数）をエポック日数に変換"""
+    if isinstance(value, bool):
+        raise ValueError(f"日付として解釈できません: {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    raise ValueError(f"日付として解釈できません: {value!r}")
+
+def epoch_day_to_iso(day: int) -> str:
+    """エポック日数をISO形式の日付文字列に変換"""
+    return date.fromordinal(int(day) + _EPOCH_ORDINAL).isoformat()
+
+def pack_records(records: List[Dict]) -> Dict[str, List]:
+    """
+    消費記録のリストを列指向の形式に変換
+
+    日付はエポック日数、数量はそのまま保持し、notes などの
+    分析で使用しないフィールドは除外する
+    """
+    return {
+        "d": [date_to_epoch_day(r["consumption_date"]) for r in records],
+        "q": [r.get("consumed_quantity", 0) for r in records]
+    }
+
+def unpack_records(packed: Dict[str, List]) -> List[Dict]:
+    """列指向の消費記録を通常の消費記録リストに戻す"""
+    return [
+        {"consumption_date": epoch_day_to_iso(day), "consumed_quantity": quantity}
+        for day, quantity in zip(packed.get("d", []), packed.get("q", []))
+    ]
+
+def _compact_records(obj: Any) -> Any:
+    """ペイロード内の消費記録を再帰的に列指向形式へ変換"""
+    if isinstance(obj, list):
+        return [_compact_records(v) for v in obj]
+    if isinstance(obj, dict):
+        return {
+            k: pack_records(v) if k == RECORDS_FIELD and isinstance(v, list) else _compact_records(v)
+            for k, v in obj.items()
+        }
+    return obj
+
+def _expand_records(obj: Any) -> Any:
+    """ペイロード内の列指向消費記録を再帰的に通常形式へ戻す"""
+    if isinstance(obj, list):
+        return [_expand_records(v) for v in obj]
+    if isinstance(obj, dict):
+        return {
+            k: unpack_records(v) if k == RECORDS_FIELD and isinstance(v, dict) else _expand_records(v)
+            for k, v in obj.items()
+        }
+    return obj
+
+def encode_payload(payload: Any) -> bytes:
+    """ペイロードをコンパクト形式（msgpack + gzip）にエンコード"""
+    if msgpack is None:
+        raise RuntimeError("msgpack がインストールされていません")
+    packed = msgpack.packb(_compact_records(payload), use_bin_type=True)
+    return gzip.compress(packed, compresslevel=6)
+
+def decode_payload(body: bytes) -> Any:
+    """コンパクト形式のペイロードをJSON互換のオブジェクトにデコード"""
+    if msgpack is None:
+        raise RuntimeError("msgpack がインストールされていません")
+    if body[:2] == b"\x1f\x8b":  # gzipのマジックナンバー
+        body = gzip.decompress(body)
+    return _expand_records(msgpack.unpackb(body, raw=False))
+
+def is_compact_content_type(content_type: Optional[str]) -> bool:
+    """Content-Type がコンパクト形式かどうか"""
+    return bool(content_type) and content_type.split(";")[0].strip().lower() == COMPACT_MEDIA_TYPE
+
+def accepts_compact(accept: Optional[str]) -> bool:
+    """Accept ヘッダーがコンパクト形式を受け入れるかどうか"""
+    return bool(accept) and COMPACT_MEDIA_TYPE in accept.lower()
@@ -1,20 +1,47 @@
+import asyncio
+import hashlib
 import httpx
 import logging
 from typing import List, Dict, Optional
 from datetime import datetime
+from urllib.parse import quote, urlencode
 import json
 import os
 
+from wire_format import (
+    COMPACT_CONTENT_ENCODING,
+    COMPACT_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    decode_payload,
+    encode_payload,
+    is_compact_available,
+    is_compact_content_type,
+)
+from request_coalescer import RequestCoalescer, request_coalescer
+
 logger = logging.getLogger(__name__)
 
+class AIServiceError(Exception):
+    """AI サービス呼び出しのエラー（HTTPエラーの場合はステータスコードを保持）"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
 class AIServiceClient:
     """AI サービスとの通信を担当するクライアント"""
     
     def __init__(self, ai_service_url: str = None):
         self.ai_service_url = ai_service_url or os.getenv("AI_SERVICE_URL", "http://ai_service:8001")
         self.timeout = 30.0
+        # 消費記録を含むリクエストのワイヤーフォーマット（msgpack / json）
+        self.wire_format = os.getenv("AI_SERVICE_WIRE_FORMAT", "msgpack").lower()
+        self._compact_supported = self.wire_format == "msgpack" and is_compact_available()
+        # バッチ推奨のチャンク分割設定
+        self.batch_chunk_size = max(int(os.getenv("AI_BATCH_CHUNK_SIZE", "50")), 1)
+        self.batch_concurrency = max(int(os.getenv("AI_BATCH_CONCURRENCY", "4")), 1)
         
-    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, compact: bool = False) -> Dict:
         """AI サービスへのHTTPリクエストを実行"""
         try:
             url = f"{self.ai_service_url}{endpoint}"
@@ -23,51 +50,213 @@ class AIServiceClient:
                 if method.upper() == "GET":
                     response = await client.get(url, params=data)
                 elif method.upper() == "POST":
-                    response = await client.post(url, json=data)
+                    if compact and self._compact_supported:
+                        response = await self._post_compact(client, url, data)
+                    else:
+                        response = await client.post(url, json=data)
                 else:
                     raise ValueError(f"サポートされていないHTTPメソッド: {method}")
                 
                 response.raise_for_status()
-                return response.json()
+                return self._decode_response(response)
                 
         except httpx.TimeoutException:
             logger.error(f"AI サービスへのリクエストがタイムアウトしました: {endpoint}")
             raise Exception("AI サービスの応答がタイムアウトしました")
         except httpx.HTTPError as e:
             logger.error(f"AI サービスへのリクエストエラー: {e}")
-            raise Exception(f"AI サービスとの通信エラー: {str(e)}")
+            status_code = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            raise AIServiceError(f"AI サービスとの通信エラー: {str(e)}", status_code)
         except Exception as e:
             logger.error(f"予期しないエラー: {e}")
             raise Exception(f"AI サービス呼び出しエラー: {str(e)}")
     
+    async def _post_compact(self, client: httpx.AsyncClient, url: str, data) -> httpx.Response:
+        """コンパクト形式（msgpack + gzip）でPOSTし、未対応のサービスにはJSONで再送"""
+        response = await client.post(
+            url,
+            content=encode_payload(data),
+            headers={
+                "Content-Type": COMPACT_MEDIA_TYPE,
+                "Content-Encoding": COMPACT_CONTENT_ENCODING,
+                "Accept": f"{COMPACT_MEDIA_TYPE}, {JSON_MEDIA_TYPE};q=0.5"
+            }
+        )
+        
+        if response.status_code in (415, 422):
+            # 旧バージョンのAIサービスはコンパクト形式を解釈できないためJSONで再送
+            json_response = await client.post(url, json=data)
+            if json_response.is_success:
+                logger.warning("AI サービスがコンパクト形式に未対応のため、JSON形式にフォールバックします")
+                self._compact_supported = False
+            return json_response
+        
+        return response
+    
+    def _decode_response(self, response: httpx.Response):
+        """レスポンスをContent-Typeに応じてデコード"""
+        if is_compact_content_type(response.headers.get("content-type")):
+            return decode_payload(response.content)
+        return response.json()
+    
     async def check_health(self) -> Dict:
         """AI サービスのヘルスチェック"""
         return await self._make_request("GET", "/health")
     
     async def analyze_consumption_pace(self, consumption_data: Dict) -> Dict:
         """消費ペース分析を実行"""
-        return await self._make_request("POST", "/analyze/consumption-pace", consumption_data)
+        return await self._make_request("POST", "/analyze/consumption-pace", consumption_data, compact=True)
+    
+    async def analyze_full(self, consumption_data: Dict) -> Dict:
+        """消費ペース分析・市場データ・消費パターンを一括取得"""
+        return await self._make_request("POST", "/analyze/full", consumption_data, compact=True)
+    
+    async def predict_consumption(
+        self,
+        consumption_records: List[Dict],
+        days_ahead: int = 30,
+        item_id: Optional[int] = None
+    ) -> Dict:
+        """将来の消費量を予測（需要予測はAIサービスの DemandForecaster で実行）"""
+        params = {"days_ahead": days_ahead}
+        if item_id is not None:
+            params["item_id"] = item_id
+        return await self._make_request("POST", f"/consumption/predict?{urlencode(params)}", consumption_records)
     
     async def search_market_data(self, item_name: str) -> Dict:
         """市場データを検索"""
         return await self._make_request("POST", "/market-data/search", {"item_name": item_name})
     
+    async def get_category_market_data(self, category: str) -> Dict:
+        """カテゴリ別の市場データ（AIサービスで集計済み）を取得"""
+        return await self._make_request("GET", f"/market-data/category/{quote(category, safe='')}")
+    
+    async def get_market_data_version(self) -> Dict:
+        """市場データのバージョン（catalog_version と override_version）を取得"""
+        return await self._make_request("GET", "/market-data/version")
+    
+    async def update_market_data_many(self, updates: List[Dict]) -> Dict:
+        """市場データをまとめて更新（item_name と consumption_data のリスト）"""
+        return await self._make_request("POST", "/market-data/update/batch", updates, compact=True)
+    
     async def generate_recommendation(self, request_data: Dict) -> Dict:
         """推奨を生成"""
-        return await self._make_request("POST", "/recommendations/generate", request_data)
+        return await self._make_request("POST", "/recommendations/generate", request_data, compact=True)
     
     async def generate_batch_recommendations(self, requests_data: List[Dict]) -> List[Dict]:
-        """複数商品の推奨を一括生成"""
-        return await self._make_request("POST", "/recommendations/batch", requests_data)
+        """
+        複数商品の推奨を一括生成
+        
+        大きなバッチはチャンクに分割して並行送信し、失敗したチャンクを除いた結果を返す
+        """
+        if len(requests_data) <= self.batch_chunk_size:
+            return await self._make_request("POST", "/recommendations/batch", requests_data, compact=True)
+        
+        chunks = [
+            requests_data[i:i + self.batch_chunk_size]
+            for i in range(0, len(requests_data), self.batch_chunk_size)
+        ]
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def dispatch_chunk(chunk: List[Dict]) -> List[Dict]:
+            async with semaphore:
+                return await self._make_request("POST", "/recommendations/batch", chunk, compact=True)
+        
+        results = await asyncio.gather(
+            *(dispatch_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+        
+        recommendations = []
+        failed_chunks = 0
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                failed_chunks += 1
+                logger.error(f"バッチ推奨チャンク {index + 1}/{len(chunks)} の生成に失敗しました: {result}")
+                continue
+            recommendations.extend(result)
+        
+        if failed_chunks == len(chunks):
+            raise Exception("全てのバッチ推奨チャンクの生成に失敗しました")
+        
+        if failed_chunks:
+            logger.warning(f"バッチ推奨: {len(chunks)} チャンク中 {failed_chunks} チャンクが失敗しました")
+        
+        return recommendations
 
 class ConsumptionAnalysisService:
     """消費分析サービス"""
     
-    def __init__(self, ai_client: AIServiceClient = None):
+    def __init__(self, ai_client: AIServiceClient = None, coalescer: RequestCoalescer = None):
         self.ai_client = ai_client or AIServiceClient()
+        self.coalescer = coalescer or request_coalescer
+        # 推奨生成時に在庫切れリスク（モンテカルロ）の推定を依頼するか
+        self.stockout_risk = os.getenv("AI_STOCKOUT_RISK", "false").lower() == "true"
+    
+    def _payload_digest(self, payload: Dict) -> str:
+        """AIサービスへ送る内容のダイジェスト（同一内容のリクエストの合流キー）"""
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+    
+    async def get_input_fingerprints(
+        self, user_id: int, items: List, db, target_stock_level: Optional[int] = None, detail: str = "full"
+    ) -> Dict[int, str]:
+        """
+        商品ごとに推奨の入力のフィンガープリントを計算
+        
+        最新の消費記録ID・消費統計のバージョン（記録の更新・削除を反映）・在庫数・閾値・
+        目標在庫レベル・市場データのバージョン（カタログと保存済みの更新内容、いずれも
+        プロセスによらない値）・在庫切れリスク推定の有無・詳細度から作成する。
+        市場データのバージョンを取得できない場合は空の辞書を返す（すべて再生成される）。
+        
+        Returns:
+            Dict[int, str]: 商品ID → フィンガープリント
+        """
+        from sqlalchemy import func
+        from models import ConsumptionRecord, ItemConsumptionStats
+        
+        if not items:
+            return {}
+        try:
+            market_version = await self.ai_client.get_market_data_version()
+        except Exception as e:
+            logger.warning(f"市場データのバージョンを取得できないため、推奨を再利用しません: {str(e)}")
+            return {}
+        
+        item_ids = [item.id for item in items]
+        latest_record_ids = dict(
+            db.query(ConsumptionRecord.item_id, func.max(ConsumptionRecord.id)).filter(
+                ConsumptionRecord.user_id == user_id,
+                ConsumptionRecord.item_id.in_(item_ids)
+            ).group_by(ConsumptionRecord.item_id).all()
+        )
+        stats_versions = dict(
+            db.query(ItemConsumptionStats.item_id, ItemConsumptionStats.version).filter(
+                ItemConsumptionStats.item_id.in_(item_ids)
+            ).all()
+        )
+        
+        fingerprints = {}
+        for item in items:
+            payload = json.dumps(
+                [
+                    latest_record_ids.get(item.id), stats_versions.get(item.id),
+                    item.current_quantity, item.minimum_threshold, target_stock_level,
+                    market_version.get("catalog_version"), market_version.get("override_version"),
+                    self.stockout_risk, detail
+                ],
+                separators=(",", ":"), default=str
+            )
+            fingerprints[item.id] = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+        return fingerprints
     
     async def analyze_user_consumption_pattern(self, user_id: int, item_id: int, db) -> Dict:
-        """ユーザーの消費パターンを分析"""
+        """
+        ユーザーの消費パターンを分析
+        
+        商品と消費記録は呼び出し元のセッションで読み込み、同時に届いた同一内容の
+        AIサービスへの分析リクエストだけを1回にまとめる（セッションは共有しない）
+        """
         try:
             from models import ConsumptionRecord, DailyItem
             
@@ -108,15 +297,11 @@ class ConsumptionAnalysisService:
                 "minimum_threshold": item.minimum_threshold
             }
             
-            # AIサービスで消費ペースを分析
-            analysis_result = await self.ai_client.analyze_consumption_pace(consumption_data)
-            
-            # 市場データも取得
-            market_data = await self.ai_client.search_market_data(item.name)
+            key = ("analyze", user_id, item_id, self._payload_digest(consumption_data))
+            result = await self.coalescer.run(key, lambda: self._request_analysis(consumption_data))
             
             return {
-                "analysis": analysis_result,
-                "market_data": market_data,
+                **result,
                 "item_info": {
                     "id": item.id,
                     "name": item.name,
@@ -130,8 +315,37 @@ class ConsumptionAnalysisService:
             logger.error(f"消費パターン分析エラー: {str(e)}")
             raise
     
-    async def generate_item_recommendation(self, user_id: int, item_id: int, db, target_stock_level: Optional[int] = None) -> Dict:
-        """商品の推奨を生成"""
+    async def _request_analysis(self, consumption_data: Dict) -> Dict:
+        """AIサービスで消費ペース分析と市場データ検索を実行（DBにはアクセスしない）"""
+        pattern = None
+        try:
+            full_result = await self.ai_client.analyze_full(consumption_data)
+            analysis_result = full_result["analysis"]
+            market_data = full_result["market_data"]
+            pattern = full_result.get("pattern")
+        except Exception as e:
+            # 統合エンドポイントが使えない場合は個別のリクエストを並行して実行
+            logger.warning(f"統合分析に失敗したため個別に取得します: {str(e)}")
+            analysis_result, market_data = await asyncio.gather(
+                self.ai_client.analyze_consumption_pace(consumption_data),
+                self.ai_client.search_market_data(consumption_data["item_name"])
+            )
+        
+        return {
+            "analysis": analysis_result,
+            "market_data": market_data,
+            "pattern": pattern
+        }
+    
+    async def generate_item_recommendation(
+        self, user_id: int, item_id: int, db, target_stock_level: Optional[int] = None, detail: str = "full"
+    ) -> Dict:
+        """
+        商品の推奨を生成（detail が summary の場合 additional_info は生成されない）
+        
+        商品と消費記録は呼び出し元のセッションで読み込み、同時に届いた同一内容の
+        AIサービスへの推奨リクエストだけを1回にまとめる（セッションは共有しない）
+        """
         try:
             from models import ConsumptionRecord, DailyItem
             
@@ -170,25 +384,36 @@ class ConsumptionAnalysisService:
                     "current_quantity": item.current_quantity,
                     "minimum_threshold": item.minimum_threshold
                 },
-                "target_stock_level": target_stock_level
+                "target_stock_level": target_stock_level,
+                "stockout_risk": self.stockout_risk,
+                "detail": detail
             }
             
-            # AIサービスで推奨を生成
-            recommendation = await self.ai_client.generate_recommendation(request_data)
-            
-            return recommendation
+            # AIサービスで推奨を生成（同一内容のリクエストは1回にまとめる）
+            key = ("generate", user_id, item_id, self._payload_digest(request_data))
+            return await self.coalescer.run(key, lambda: self.ai_client.generate_recommendation(request_data))
             
         except Exception as e:
             logger.error(f"推奨生成エラー: {str(e)}")
             raise
     
-    async def generate_user_recommendations(self, user_id: int, db) -> List[Dict]:
-        """ユーザーの全商品に対する推奨を生成"""
+    async def generate_user_recommendations(
+        self, user_id: int, db, detail: str = "full", item_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """
+        ユーザーの全商品に対する推奨を生成
+        
+        item_ids を指定した場合はその商品だけを対象にする。detail が summary の場合
+        additional_info は生成されない。
+        """
         try:
             from models import DailyItem, ConsumptionRecord
             
-            # ユーザーの全商品を取得
-            items = db.query(DailyItem).filter(DailyItem.user_id == user_id).all()
+            # ユーザーの全商品（または指定された商品）を取得
+            query = db.query(DailyItem).filter(DailyItem.user_id == user_id)
+            if item_ids is not None:
+                query = query.filter(DailyItem.id.in_(item_ids))
+            items = query.all()
             
             if not items:
                 return []
@@ -221,7 +446,9 @@ class ConsumptionAnalysisService:
                         "consumption_records": records_data,
                         "current_quantity": item.current_quantity,
                         "minimum_threshold": item.minimum_threshold
-                    }
+                    },
+                    "stockout_risk": self.stockout_risk,
+                    "detail": detail
                 }
                 
                 batch_requests.append(request_data)
@@ -0,0 +1,243 @@
+from datetime import date
+from typing import Optional
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import ConsumptionRecord, ItemConsumptionStats
+from consumption_analyzer import ConsumptionPattern
+
+logger = logging.getLogger(__name__)
+
+# ConsumptionAnalyzer と同じ判定パラメータ
+MIN_DATA_POINTS = 3
+TREND_THRESHOLD = 0.1
+
+def _day_offset(stats: ItemConsumptionStats, consumption_date: date) -> int:
+    """基準日からの経過日数（傾き計算用のx座標）"""
+    return (consumption_date - stats.anchor_date).days
+
+def _add_observation(stats: ItemConsumptionStats, consumption_date: date, quantity: float) -> None:
+    """1件の消費記録を統計に加算（Welford法）"""
+    if stats.anchor_date is None:
+        stats.anchor_date = consumption_date
+
+    count = (stats.record_count or 0) + 1
+    mean = stats.mean_quantity or 0.0
+    delta = quantity - mean
+    mean += delta / count
+
+    stats.record_count = count
+    stats.total_quantity = (stats.total_quantity or 0.0) + quantity
+    stats.mean_quantity = mean
+    stats.m2 = (stats.m2 or 0.0) + delta * (quantity - mean)
+
+    x = _day_offset(stats, consumption_date)
+    stats.sum_x = (stats.sum_x or 0.0) + x
+    stats.sum_xx = (stats.sum_xx or 0.0) + x * x
+    stats.sum_xy = (stats.sum_xy or 0.0) + x * quantity
+
+    if stats.first_date is None or consumption_date < stats.first_date:
+        stats.first_date = consumption_date
+    if stats.last_date is None or consumption_date > stats.last_date:
+        stats.last_date = consumption_date
+
+def _remove_observation(db: Session, stats: ItemConsumptionStats, consumption_date: date, quantity: float) -> None:
+    """1件の消費記録を統計から減算（Welford法の逆操作）"""
+    count = (stats.record_count or 0) - 1
+    if count <= 0:
+        _reset(stats)
+        return
+
+    mean = stats.mean_quantity or 0.0
+    new_mean = (mean * (count + 1) - quantity) / count
+    stats.m2 = max((stats.m2 or 0.0) - (quantity - new_mean) * (quantity - mean), 0.0)
+    stats.mean_quantity = new_mean
+    stats.record_count = count
+    stats.total_quantity = (stats.total_quantity or 0.0) - quantity
+
+    x = _day_offset(stats, consumption_date)
+    stats.sum_x -= x
+    stats.sum_xx -= x * x
+    stats.sum_xy -= x * quantity
+
+    # 端の日付が削除された場合のみ、インデックスを使って最小・最大日付を取り直す
+    if consumption_date == stats.first_date or consumption_date == stats.last_date:
+        first_date, last_date = db.query(
+            func.min(ConsumptionRecord.consumption_date),
+            func.max(ConsumptionRecord.consumption_date)
+        ).filter(
+            ConsumptionRecord.item_id == stats.item_id,
+            ConsumptionRecord.user_id == stats.user_id
+        ).one()
+        stats.first_date = first_date
+        stats.last_date = last_date
+
+def _reset(stats: ItemConsumptionStats) -> None:
+    """統計を初期状態に戻す"""
+    stats.record_count = 0
+    stats.total_quantity = 0.0
+    stats.mean_quantity = 0.0
+    stats.m2 = 0.0
+    stats.first_date = None
+    stats.last_date = None
+    stats.anchor_date = None
+    stats.sum_x = 0.0
+    stats.sum_xx = 0.0
+    stats.sum_xy = 0.0
+
+def rebuild_item_stats(db: Session, user_id: int, item_id: int) -> ItemConsumptionStats:
+    """消費履歴全体から統計を再構築（統計が未作成の商品の初回のみ）"""
+    stats = db.query(ItemConsumptionStats).filter(
+        ItemConsumptionStats.item_id == item_id
+    ).with_for_update().first()
+    if stats is None:
+        stats = ItemConsumptionStats(item_id=item_id, user_id=user_id, version=0)
+        db.add(stats)
+    _reset(stats)
+
+    records = db.query(
+        ConsumptionRecord.consumption_date,
+        ConsumptionRecord.consumed_quantity
+    ).filter(
+        ConsumptionRecord.item_id == item_id,
+        ConsumptionRecord.user_id == user_id
+    ).order_by(ConsumptionRecord.consumption_date).all()
+
+    for consumption_date, quantity in records:
+        if consumption_date is not None:
+            _add_observation(stats, consumption_date, quantity or 0)
+
+    stats.version = (stats.version or 0) + 1
+    return stats
+
+def _get_stats(db: Session, user_id: int, item_id: int, for_update: bool = False) -> Optional[ItemConsumptionStats]:
+    """
+    商品の統計を取得
+
+    for_update=True の場合は行をコミットまでロックする。統計の更新は
+    読み出した値からの差分計算のため、同じ商品の記録が並行して更新されても
+    加算・減算が失われないようにする
+    """
+    query = db.query(ItemConsumptionStats).filter(
+        ItemConsumptionStats.item_id == item_id,
+        ItemConsumptionStats.user_id == user_id
+    )
+    if for_update:
+        query = query.with_for_update()
+    return query.first()
+
+def record_added(db: Session, user_id: int, item_id: int, consumption_date: date, quantity: float) -> ItemConsumptionStats:
+    """消費記録の作成を統計に反映（記録はセッションに追加済みであること）"""
+    stats = _get_stats(db, user_id, item_id, for_update=True)
+    if stats is None:
+        db.flush()
+        return rebuild_item_stats(db, user_id, item_id)
+
+    _add_observation(stats, consumption_date, quantity)
+    stats.version = (stats.version or 0) + 1
+    return stats
+
+def record_removed(db: Session, user_id: int, item_id: int, consumption_date: date, quantity: float) -> ItemConsumptionStats:
+    """消費記録の削除を統計に反映（削除はフラッシュ済みであること）"""
+    stats = _get_stats(db, user_id, item_id, for_update=True)
+    if stats is None:
+        return rebuild_item_stats(db, user_id, item_id)
+
+    _remove_observation(db, stats, consumption_date, quantity)
+    stats.version = (stats.version or 0) + 1
+    return stats
+
+def record_updated(
+    db: Session,
+    user_id: int,
+    item_id: int,
+    old_date: date,
+    old_quantity: float,
+    new_date: Optional[date],
+    new_quantity: Optional[float]
+) -> ItemConsumptionStats:
+    """消費記録の更新を統計に反映（更新はフラッシュ済みであること。None の項目は変更なしとして扱う）"""
+    stats = _get_stats(db, user_id, item_id, for_update=True)
+    if stats is None:
+        return rebuild_item_stats(db, user_id, item_id)
+
+    if new_date is None:
+        new_date = old_date
+    if new_quantity is None:
+        new_quantity = old_quantity
+
+    if old_date != new_date or old_quantity != new_quantity:
+        _remove_observation(db, stats, old_date, old_quantity)
+        _add_observation(stats, new_date, new_quantity)
+        stats.version = (stats.version or 0) + 1
+    return stats
+
+def get_item_stats(db: Session, user_id: int, item_id: int) -> ItemConsumptionStats:
+    """商品の統計を取得（未作成の場合は履歴から作成）"""
+    stats = _get_stats(db, user_id, item_id)
+    if stats is None:
+        stats = rebuild_item_stats(db, user_id, item_id)
+        db.commit()
+    return stats
+
+def trend_slope(stats: ItemConsumptionStats) -> float:
+    """消費日（暦日）に対する消費量の傾き（最小二乗法）"""
+    count = stats.record_count or 0
+    if count < 2:
+        return 0.0
+    denominator = count * stats.sum_xx - stats.sum_x ** 2
+    if denominator <= 0:
+        return 0.0
+    return (count * stats.sum_xy - stats.sum_x * stats.total_quantity) / denominator
+
+def stats_to_pattern(stats: ItemConsumptionStats) -> ConsumptionPattern:
+    """
+    統計から消費パターンを作成（消費履歴を読まずに算出）
+
+    分散と傾きは記録単位で集計しているため、日別に集計する
+    ConsumptionAnalyzer とは同一日に複数記録がある場合に値が異なる
+    """
+    count = stats.record_count or 0
+    if count < MIN_DATA_POINTS or stats.first_date is None:
+        return ConsumptionPattern(
+            average_daily_consumption=1.0,
+            consumption_variance=0.0,
+            trend_direction='stable',
+            confidence_score=0.3
+        )
+
+    date_range = (stats.last_date - stats.first_date).days
+    pace = stats.total_quantity / (date_range + 1)
+    if date_range > 0:
+        pace = max(pace, 0.1)
+
+    slope = trend_slope(stats) if count >= 3 else 0.0
+    if slope > TREND_THRESHOLD:
+        trend_direction = 'increasing'
+    elif slope < -TREND_THRESHOLD:
+        trend_direction = 'decreasing'
+    else:
+        trend_direction = 'stable'
+
+    if count < 10:
+        base_score = 0.6
+    elif count < 30:
+        base_score = 0.8
+    else:
+        base_score = 0.9
+
+    if date_range > 90:
+        period_bonus = 0.1
+    elif date_range > 30:
+        period_bonus = 0.05
+    else:
+        period_bonus = 0.0
+
+    return ConsumptionPattern(
+        average_daily_consumption=pace,
+        consumption_variance=stats.m2 / (count - 1) if count > 1 else 0.0,
+        trend_direction=trend_direction,
+        confidence_score=min(base_score + period_bonus, 1.0)
+    )
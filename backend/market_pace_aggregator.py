@@ -0,0 +1,330 @@
+from typing import Dict, Iterable, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+import unicodedata
+
+from sqlalchemy import distinct, func, or_
+from sqlalchemy.orm import Session
+
+from models import (
+    ConsumptionRecord,
+    DailyItem,
+    ItemConsumptionStats,
+    MarketPaceAggregate,
+    MarketPaceCheckpoint,
+    MarketPaceContribution,
+)
+from consumption_stats import MIN_DATA_POINTS, rebuild_item_stats, stats_to_pattern
+from pace_sketch import PaceSketch
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "market_pace"
+PUBLISH_QUANTILES = (0.25, 0.5, 0.75, 0.9)  # AIサービスに反映する分位点
+
+def normalize_item_name(item_name: str) -> str:
+    """集計用に商品名を正規化（全角・半角の統一、小文字化、空白の除去）"""
+    normalized = unicodedata.normalize("NFKC", item_name or "").lower()
+    return "".join(normalized.split())[:100]
+
+class _AggregateUpdates:
+    """1回の処理単位で変更する集計行とスケッチ"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._rows: Dict[str, Tuple[MarketPaceAggregate, PaceSketch]] = {}
+
+    def _get(self, name_key: str) -> Tuple[MarketPaceAggregate, PaceSketch]:
+        entry = self._rows.get(name_key)
+        if entry is None:
+            aggregate = self.db.query(MarketPaceAggregate).filter(
+                MarketPaceAggregate.name_key == name_key
+            ).first()
+            if aggregate is None:
+                aggregate = MarketPaceAggregate(
+                    name_key=name_key, item_count=0, user_count=0, pace_sum=0.0, sketch={},
+                    version=0, published_version=0
+                )
+                self.db.add(aggregate)
+            entry = (aggregate, PaceSketch(aggregate.sketch))
+            self._rows[name_key] = entry
+        return entry
+
+    def add(self, name_key: str, pace: float) -> None:
+        aggregate, sketch = self._get(name_key)
+        sketch.add(pace)
+        aggregate.item_count = (aggregate.item_count or 0) + 1
+        aggregate.pace_sum = (aggregate.pace_sum or 0.0) + pace
+
+    def remove(self, name_key: str, pace: float) -> None:
+        aggregate, sketch = self._get(name_key)
+        sketch.remove(pace)
+        aggregate.item_count = max((aggregate.item_count or 0) - 1, 0)
+        aggregate.pace_sum = (aggregate.pace_sum or 0.0) - pace if aggregate.item_count else 0.0
+
+    def flush(self) -> Set[str]:
+        """スケッチとユーザー数を集計行に書き戻し、変更した商品名を返す"""
+        self.db.flush()  # 変更した寄与をユーザー数の集計に含める
+        user_counts = dict(
+            self.db.query(
+                MarketPaceContribution.name_key, func.count(distinct(MarketPaceContribution.user_id))
+            ).filter(MarketPaceContribution.name_key.in_(list(self._rows))).group_by(MarketPaceContribution.name_key).all()
+        ) if self._rows else {}
+        for name_key, (aggregate, sketch) in self._rows.items():
+            aggregate.sketch = sketch.to_dict()
+            aggregate.user_count = user_counts.get(name_key, 0)
+            aggregate.version = (aggregate.version or 0) + 1
+        changed = set(self._rows)
+        self._rows = {}
+        return changed
+
+def _get_checkpoint(db: Session) -> MarketPaceCheckpoint:
+    """ジョブのチェックポイントを取得（初回は作成）"""
+    checkpoint = db.query(MarketPaceCheckpoint).filter(MarketPaceCheckpoint.job_name == JOB_NAME).first()
+    if checkpoint is None:
+        checkpoint = MarketPaceCheckpoint(job_name=JOB_NAME, last_record_id=0)
+        db.add(checkpoint)
+    return checkpoint
+
+def _item_pace(stats: Optional[ItemConsumptionStats]) -> Optional[float]:
+    """商品の消費ペース（記録が少ない商品は集計に含めない）"""
+    if stats is None or (stats.record_count or 0) < MIN_DATA_POINTS:
+        return None
+    return stats_to_pattern(stats).average_daily_consumption
+
+def _refresh_items(db: Session, item_ids: Iterable[int], updates: _AggregateUpdates) -> None:
+    """商品の消費ペースを計算し直し、以前の値と差し替える"""
+    item_ids = list(item_ids)
+    items = db.query(DailyItem.id, DailyItem.user_id, DailyItem.name).filter(DailyItem.id.in_(item_ids)).all()
+    stats_by_item = {
+        stats.item_id: stats
+        for stats in db.query(ItemConsumptionStats).filter(ItemConsumptionStats.item_id.in_(item_ids))
+    }
+    contributions = {
+        contribution.item_id: contribution
+        for contribution in db.query(MarketPaceContribution).filter(MarketPaceContribution.item_id.in_(item_ids))
+    }
+
+    # 商品ID → (正規化した商品名, 消費ペース, ユーザーID)（削除済み・集計対象外の商品は None）
+    current: Dict[int, Optional[Tuple[str, float, int]]] = {item_id: None for item_id in item_ids}
+    # 商品ID → (計算時の商品名, 消費統計のバージョン)（次回以降に変更を検出するため寄与に保存）
+    sources: Dict[int, Tuple[str, int]] = {}
+    for item_id, user_id, name in items:
+        stats = stats_by_item.get(item_id)
+        if stats is None:
+            stats = rebuild_item_stats(db, user_id, item_id)
+        pace = _item_pace(stats)
+        name_key = normalize_item_name(name)
+        current[item_id] = (name_key, pace, user_id) if pace is not None and name_key else None
+        sources[item_id] = (name, stats.version)
+
+    for item_id, value in current.items():
+        contribution = contributions.get(item_id)
+        previous = (
+            (contribution.name_key, contribution.pace, contribution.user_id) if contribution is not None else None
+        )
+        if previous != value:
+            if previous is not None:
+                updates.remove(previous[0], previous[1])
+            if value is None:
+                db.delete(contribution)
+                continue
+            updates.add(value[0], value[1])
+            if contribution is None:
+                contribution = MarketPaceContribution(item_id=item_id)
+                db.add(contribution)
+            contribution.name_key, contribution.pace, contribution.user_id = value
+        if contribution is not None:
+            contribution.item_name, contribution.stats_version = sources[item_id]
+
+def _remove_deleted_items(db: Session) -> Set[str]:
+    """削除された商品の消費ペースを集計から除く"""
+    orphaned = db.query(MarketPaceContribution).filter(
+        ~db.query(DailyItem.id).filter(DailyItem.id == MarketPaceContribution.item_id).exists()
+    ).all()
+    if not orphaned:
+        return set()
+
+    updates = _AggregateUpdates(db)
+    for contribution in orphaned:
+        updates.remove(contribution.name_key, contribution.pace)
+        db.delete(contribution)
+    changed = updates.flush()
+    db.commit()
+    return changed
+
+def _refresh_changed_items(db: Session, batch_size: int) -> Tuple[Set[str], int]:
+    """
+    集計済みの商品のうち、消費記録の更新・削除（消費統計のバージョンの変化）や
+    商品名の変更があったものを計算し直す
+
+    Returns:
+        Tuple: 変更した商品名と、計算し直した商品数
+    """
+    changed: Set[str] = set()
+    refreshed_items = 0
+    while True:
+        item_ids = [
+            item_id for item_id, in db.query(MarketPaceContribution.item_id).join(
+                DailyItem, DailyItem.id == MarketPaceContribution.item_id
+            ).outerjoin(
+                ItemConsumptionStats, ItemConsumptionStats.item_id == MarketPaceContribution.item_id
+            ).filter(or_(
+                MarketPaceContribution.item_name.is_(None),
+                MarketPaceContribution.stats_version.is_(None),
+                ItemConsumptionStats.version.is_(None),
+                DailyItem.name != MarketPaceContribution.item_name,
+                ItemConsumptionStats.version != MarketPaceContribution.stats_version
+            )).limit(batch_size).all()
+        ]
+        if not item_ids:
+            return changed, refreshed_items
+        updates = _AggregateUpdates(db)
+        _refresh_items(db, item_ids, updates)
+        changed |= updates.flush()
+        db.commit()
+        refreshed_items += len(item_ids)
+
+def process_new_records(db: Session, batch_size: int = 5000) -> Dict:
+    """
+    チェックポイント以降の消費記録と、集計済みの商品の変更を集計に反映
+
+    記録の更新・削除や商品名の変更は、寄与に保存した消費統計のバージョンと
+    商品名との比較で検出する。新しい消費記録は消費記録IDの順に batch_size 件
+    ずつ処理し、集計とチェックポイントを同じトランザクションで保存する
+    （途中で失敗しても次回は続きから再開できる）
+    """
+    checkpoint = _get_checkpoint(db)
+    processed_records = 0
+    changed, refreshed_items = _refresh_changed_items(db, batch_size)
+    changed |= _remove_deleted_items(db)
+
+    while True:
+        rows = db.query(ConsumptionRecord.id, ConsumptionRecord.item_id).filter(
+            ConsumptionRecord.id > checkpoint.last_record_id
+        ).order_by(ConsumptionRecord.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        item_ids = {item_id for _, item_id in rows}
+        updates = _AggregateUpdates(db)
+        _refresh_items(db, item_ids, updates)
+        changed |= updates.flush()
+        checkpoint.last_record_id = rows[-1][0]
+        db.commit()
+
+        processed_records += len(rows)
+        refreshed_items += len(item_ids)
+
+    return {
+        "processed_records": processed_records,
+        "refreshed_items": refreshed_items,
+        "changed_names": len(changed),
+        "last_record_id": checkpoint.last_record_id
+    }
+
+def aggregate_to_market_data(aggregate: MarketPaceAggregate) -> Dict:
+    """集計をAIサービスの市場消費データの形式に変換"""
+    sketch = PaceSketch(aggregate.sketch)
+    item_count = aggregate.item_count or 0
+    user_count = aggregate.user_count or 0
+    if user_count < 10:
+        confidence = 0.6
+    elif user_count < 30:
+        confidence = 0.8
+    else:
+        confidence = 0.9
+
+    data = {
+        "average_consumption_per_day": round(aggregate.pace_sum / item_count, 4) if item_count else 0.0,
+        "sample_size": item_count,
+        "contributor_count": user_count,
+        "confidence": confidence,
+        "source": "crowd"
+    }
+    for q in PUBLISH_QUANTILES:
+        value = sketch.quantile(q)
+        data[f"pace_p{int(q * 100)}"] = round(value, 4) if value is not None else None
+    return data
+
+async def publish_aggregates(db: Session, ai_client=None, min_users: int = 3, batch_size: int = 500) -> int:
+    """
+    未反映の集計をAIサービスの市場カタログに反映
+
+    商品を登録しているユーザーが min_users 人以上の商品名のみ反映する（1人のユーザーが
+    同じ名前の商品を複数登録していても1人として数える）。反映に失敗した集計は
+    次回の実行で再送される。AIサービスは反映内容をファイルに保存するため、再起動後も保持される。
+
+    Returns:
+        int: 反映した商品名の数
+    """
+    if ai_client is None:
+        from ai_client import AIServiceClient
+        ai_client = AIServiceClient()
+
+    published = 0
+    while True:
+        aggregates = db.query(MarketPaceAggregate).filter(
+            MarketPaceAggregate.user_count >= min_users,
+            MarketPaceAggregate.published_version < MarketPaceAggregate.version
+        ).order_by(MarketPaceAggregate.name_key).limit(batch_size).all()
+        if not aggregates:
+            break
+
+        result = await ai_client.update_market_data_many([
+            {"item_name": aggregate.name_key, "consumption_data": aggregate_to_market_data(aggregate)}
+            for aggregate in aggregates
+        ])
+        failed = {error.get("item_name") for error in (result or {}).get("errors", [])}
+        for aggregate in aggregates:
+            if aggregate.name_key in failed:
+                continue
+            aggregate.published_version = aggregate.version
+            published += 1
+        db.commit()
+        if failed:
+            logger.error(f"市場消費ペースを反映できなかった商品名があります（次回再送します）: {sorted(failed)[:10]}")
+            break
+
+    return published
+
+async def run_job(
+    db: Session,
+    ai_client=None,
+    batch_size: Optional[int] = None,
+    min_users: Optional[int] = None
+) -> Dict:
+    """
+    市場消費ペースの集計ジョブを実行
+
+    全ユーザーの消費記録から、正規化した商品名ごとに消費ペースの分布
+    （件数・平均・分位点）を集計し、AIサービスの市場カタログに反映する。
+    前回のチェックポイント以降に消費記録が追加・更新・削除された商品と、
+    名前が変更された商品だけを再計算するため、消費記録テーブル全体を
+    読み直すことはない。
+    """
+    batch_size = batch_size or int(os.getenv("MARKET_PACE_BATCH_SIZE", "5000"))
+    min_users = min_users or int(os.getenv("MARKET_PACE_MIN_USERS", "3"))
+
+    summary = process_new_records(db, batch_size)
+    try:
+        summary["published_names"] = await publish_aggregates(db, ai_client, min_users)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"市場消費ペースの反映エラー（次回再送します）: {str(e)}")
+        summary["published_names"] = 0
+
+    logger.info(f"市場消費ペースの集計が完了しました: {summary}")
+    return summary
+
+# cron などから定期実行: python market_pace_aggregator.py
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        asyncio.run(run_job(session))
+    finally:
+        session.close()
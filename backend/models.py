@@ -126,6 +126,7 @@ class ConsumptionRecommendation(Base):
     recommendation_message = Column(Text, nullable=False)
     confidence_score = Column(Float, nullable=False)
     additional_info = Column(JSON)  # 追加情報をJSONで保存
+    input_fingerprint = Column(String(64))  # 推奨の入力（最新の消費記録・在庫数・閾値・目標在庫・市場データ）のハッシュ
     is_active = Column(Boolean, default=True)
     acknowledged_at = Column(DateTime(timezone=True))  # ユーザーが確認した日時
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -133,4 +134,56 @@ class ConsumptionRecommendation(Base):
     
     # リレーション
     user = relationship("User")
-    item = relationship("DailyItem") 
\ No newline at end of file
+    item = relationship("DailyItem") 
+
+class ItemConsumptionStats(Base):
+    """商品ごとの消費統計モデル（消費記録の作成・更新・削除時に逐次更新）"""
+    __tablename__ = "item_consumption_stats"
+    
+    item_id = Column(Integer, ForeignKey("daily_items.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    record_count = Column(Integer, nullable=False, default=0)
+    total_quantity = Column(Float, nullable=False, default=0.0)
+    mean_quantity = Column(Float, nullable=False, default=0.0)  # Welford法の平均
+    m2 = Column(Float, nullable=False, default=0.0)  # Welford法の偏差平方和
+    first_date = Column(Date)
+    last_date = Column(Date)
+    anchor_date = Column(Date)  # 傾き計算の基準日
+    sum_x = Column(Float, nullable=False, default=0.0)  # 基準日からの日数の和
+    sum_xx = Column(Float, nullable=False, default=0.0)
+    sum_xy = Column(Float, nullable=False, default=0.0)
+    version = Column(Integer, nullable=False, default=0)  # 履歴が変わるたびに加算
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class MarketPaceCheckpoint(Base):
+    """市場消費ペース集計ジョブのチェックポイント（処理済みの消費記録IDの上限）"""
+    __tablename__ = "market_pace_checkpoints"
+    
+    job_name = Column(String(50), primary_key=True)
+    last_record_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class MarketPaceContribution(Base):
+    """商品ごとの、市場消費ペース集計に加算済みの消費ペース（更新時に差し替えるため保持）"""
+    __tablename__ = "market_pace_contributions"
+    
+    item_id = Column(Integer, primary_key=True)  # 商品の削除後に集計から除くため外部キーにしない
+    user_id = Column(Integer)  # 商品の所有者（商品名ごとのユーザー数の集計用）
+    name_key = Column(String(100), nullable=False, index=True)  # 正規化した商品名
+    pace = Column(Float, nullable=False)
+    item_name = Column(String(100))  # 計算時の商品名（名前の変更を検出するため）
+    stats_version = Column(Integer)  # 計算時の消費統計のバージョン（記録の更新・削除を検出するため）
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class MarketPaceAggregate(Base):
+    """正規化した商品名ごとの消費ペースの分布（全ユーザーの集計）"""
+    __tablename__ = "market_pace_aggregates"
+    
+    name_key = Column(String(100), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    user_count = Column(Integer, nullable=False, default=0)  # 集計に含まれるユーザーの数（重複なし）
+    pace_sum = Column(Float, nullable=False, default=0.0)
+    sketch = Column(JSON, nullable=False, default=dict)  # 対数バケットのヒストグラム（分位点の近似用）
+    version = Column(Integer, nullable=False, default=0)  # 集計が変わるたびに加算
+    published_version = Column(Integer, nullable=False, default=0)  # AIサービスに反映済みのバージョン
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
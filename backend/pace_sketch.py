@@ -0,0 +1,82 @@
+from typing import Dict, Optional
+import math
+
+class PaceSketch:
+    """
+    消費ペースの分布を近似する対数バケットのヒストグラム
+
+    値 x を ceil(log_γ(x)) のバケットに数え、分位点を相対誤差 relative_accuracy 以内で
+    返す（γ = (1 + α) / (1 - α)）。バケットごとの件数を足し引きするだけなので、
+    複数のスケッチの合算（merge）や値の取り消し（remove）ができる。
+    0以下の値は専用のバケットに数える。
+    """
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None, relative_accuracy: float = 0.02):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.zero_count = 0
+        self.buckets: Dict[int, int] = {}
+        for key, count in (counts or {}).items():
+            if key == "zero":
+                self.zero_count = int(count)
+            else:
+                self.buckets[int(key)] = int(count)
+
+    @property
+    def count(self) -> int:
+        """値の件数"""
+        return self.zero_count + sum(self.buckets.values())
+
+    def _bucket(self, value: float) -> int:
+        """値が入るバケット番号"""
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value: float, count: int = 1) -> None:
+        """値を加える"""
+        if value <= 0:
+            self.zero_count += count
+            return
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def remove(self, value: float, count: int = 1) -> None:
+        """以前に加えた値を取り消す"""
+        if value <= 0:
+            self.zero_count = max(self.zero_count - count, 0)
+            return
+        bucket = self._bucket(value)
+        remaining = self.buckets.get(bucket, 0) - count
+        if remaining > 0:
+            self.buckets[bucket] = remaining
+        else:
+            self.buckets.pop(bucket, None)
+
+    def merge(self, other: "PaceSketch") -> None:
+        """別のスケッチ（同じ相対誤差）を合算"""
+        self.zero_count += other.zero_count
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """分位点の近似値（値がない場合は None）"""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                # バケットの範囲 (γ^(i-1), γ^i] の代表値
+                return 2 * self.gamma ** bucket / (self.gamma + 1)
+        return None
+
+    def to_dict(self) -> Dict[str, int]:
+        """JSONに保存できる形式に変換"""
+        counts = {str(bucket): count for bucket, count in self.buckets.items()}
+        if self.zero_count:
+            counts["zero"] = self.zero_count
+        return counts
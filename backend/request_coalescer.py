@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+class RequestCoalescer:
+    """
+    同一内容のリクエストを1回の計算にまとめるレジストリ（single-flight）
+
+    実行中の計算と同じキーのリクエストが届いた場合、新たに計算せず
+    実行中の計算結果を共有する。キーの先頭要素を種別として統計を集計し、
+    stats_log_interval 秒ごとに合流率をログに出力する（0 の場合は出力しない）。
+    """
+
+    def __init__(self, stats_log_interval: float = 0.0):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.stats_log_interval = stats_log_interval
+        self._stats_logged_at = time.monotonic()
+
+    async def run(self, key: Tuple, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        キーに対応する計算を実行、または実行中の計算に合流する
+
+        Args:
+            key: リクエストを識別するキー（先頭要素は種別）
+            factory: 計算を開始するコルーチン関数
+
+        Returns:
+            Any: 計算結果
+        """
+        stats = self._stats.setdefault(str(key[0]), {"requests": 0, "executions": 0, "coalesced": 0})
+        stats["requests"] += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            stats["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda finished: self._release(key, finished))
+        else:
+            stats["coalesced"] += 1
+            logger.info(f"実行中の同一リクエストに合流しました: {key}")
+        self._log_stats_if_due()
+
+        # 呼び出し元がキャンセルされても共有中の計算は継続させる
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        """完了した計算をレジストリから削除"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def _log_stats_if_due(self) -> None:
+        """前回の出力から stats_log_interval 秒以上経過していれば合流率をログに出力"""
+        if self.stats_log_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._stats_logged_at < self.stats_log_interval:
+            return
+        self._stats_logged_at = now
+        logger.info(f"リクエスト合流の統計: {self.get_stats()}")
+
+    def get_stats(self) -> Dict:
+        """合流率などの統計情報を取得"""
+        by_kind = {}
+        for kind, stats in self._stats.items():
+            by_kind[kind] = {
+                **stats,
+                "coalescing_rate": round(stats["coalesced"] / stats["requests"], 4) if stats["requests"] else 0.0
+            }
+
+        total_requests = sum(s["requests"] for s in self._stats.values())
+        total_coalesced = sum(s["coalesced"] for s in self._stats.values())
+
+        return {
+            "total_requests": total_requests,
+            "coalesced_requests": total_coalesced,
+            "coalescing_rate": round(total_coalesced / total_requests, 4) if total_requests else 0.0,
+            "in_flight": len(self._in_flight),
+            "by_kind": by_kind
+        }
+
+class KeyedLocks:
+    """
+    キーごとの排他ロック
+
+    同じキーの処理を1つずつ実行する。ロックは使用中のキーの分だけ保持し、
+    待機者がいなくなったものから削除する。
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._holders: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, *keys: Hashable) -> AsyncIterator[None]:
+        """
+        複数のキーのロックを取得して処理を実行
+
+        キーは常に同じ順序で取得するため、重なるキーを持つ処理同士でも
+        デッドロックしない。
+        """
+        ordered = sorted(set(keys))
+        for key in ordered:
+            self._holders[key] = self._holders.get(key, 0) + 1
+        acquired = []
+        try:
+            for key in ordered:
+                lock = self._locks.setdefault(key, asyncio.Lock())
+                await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for key in ordered:
+                self._holders[key] -= 1
+                if self._holders[key] == 0:
+                    del self._holders[key]
+                    del self._locks[key]
+
+# アプリケーション全体で共有するインスタンス
+request_coalescer = RequestCoalescer(
+    stats_log_interval=float(os.getenv("COALESCER_STATS_LOG_INTERVAL_SECONDS", "300"))
+)
+# 推奨の生成・保存を (ユーザーID, 商品ID) ごとに直列化するロック
+recommendation_locks = KeyedLocks()
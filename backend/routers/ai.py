@@ -6,7 +6,7 @@ import logging
 
 from consumption_analyzer import ConsumptionAnalyzer
 from recommendation_engine import RecommendationEngine
-from market_data_service import MarketDataService
+from ai_client import AIServiceClient, AIServiceError
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +15,7 @@ router = APIRouter()
 # サービスインスタンス
 consumption_analyzer = ConsumptionAnalyzer()
 recommendation_engine = RecommendationEngine()
-market_data_service = MarketDataService()
+ai_client = AIServiceClient()  # 市場データはAIサービスの市場カタログ（data/market_catalog.json）から取得
 
 # Pydantic models
 class ConsumptionData(BaseModel):
@@ -79,7 +79,7 @@ async def analyze_consumption_pace(consumption_data: ConsumptionData):
 async def search_market_consumption_data(item_name: str):
     """世間の消費ペースデータを検索"""
     try:
-        market_data = await market_data_service.search_consumption_pace(item_name)
+        market_data = await ai_client.search_market_data(item_name)
         return market_data
     except Exception as e:
         logger.error(f"Error searching market data: {str(e)}")
@@ -95,9 +95,7 @@ async def generate_recommendation(request: RecommendationRequest):
         )
         
         # 市場の消費ペースを取得
-        market_data = await market_data_service.search_consumption_pace(
-            request.item_data.item_name
-        )
+        market_data = await ai_client.search_market_data(request.item_data.item_name)
         market_pace = market_data.get("average_consumption_per_day", user_pace)
         
         # 推奨を生成
@@ -143,10 +141,14 @@ async def generate_batch_recommendations(requests: List[RecommendationRequest]):
 
 @router.get("/market-data/category/{category}")
 async def get_category_data(category: str):
-    """カテゴリ別の市場データを取得"""
+    """カテゴリ別の市場データを取得（AIサービスのカテゴリ別集計を使用）"""
     try:
-        data = await market_data_service.get_category_consumption_data(category)
-        return data
+        return await ai_client.get_category_market_data(category)
+    except AIServiceError as e:
+        if e.status_code == 404:
+            raise HTTPException(status_code=404, detail=f"カテゴリ '{category}' のデータが見つかりません")
+        logger.error(f"Error getting category data: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"カテゴリデータ取得エラー: {str(e)}")
     except Exception as e:
         logger.error(f"Error getting category data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"カテゴリデータ取得エラー: {str(e)}")
@@ -154,14 +156,17 @@ async def get_category_data(category: str):
 @router.post("/consumption/predict")
 async def predict_consumption(
     consumption_records: List[Dict],
-    days_ahead: int = 30
+    days_ahead: int = 30,
+    item_id: Optional[int] = None
 ):
-    """将来の消費量を予測"""
+    """将来の消費量を予測（AIサービスの需要予測を使用。item_id を指定すると当てはめ済みの予測状態を再利用）"""
     try:
-        prediction = consumption_analyzer.predict_future_consumption(
-            consumption_records, days_ahead
+        return await ai_client.predict_consumption(
+            consumption_records, days_ahead, item_id=item_id
         )
-        return prediction
+    except AIServiceError as e:
+        logger.error(f"Error predicting consumption: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"消費予測エラー: {str(e)}")
     except Exception as e:
         logger.error(f"Error predicting consumption: {str(e)}")
         raise HTTPException(status_code=500, detail=f"消費予測エラー: {str(e)}") 
\ No newline at end of file
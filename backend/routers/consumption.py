@@ -2,12 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
+from dataclasses import asdict
 import logging
 
 from database import get_db
 from models import ConsumptionRecord, DailyItem, User
 from schemas import ConsumptionRecord as ConsumptionRecordSchema, ConsumptionRecordCreate, ConsumptionRecordUpdate
 from routers.auth import get_current_user
+import consumption_stats
 
 router = APIRouter()
 
@@ -81,6 +83,13 @@ async def create_consumption_record(
     item.current_quantity = new_quantity
     
     db.add(db_record)
+    
+    # 商品の消費統計を更新
+    consumption_stats.record_added(
+        db, current_user.id, record.item_id,
+        db_record.consumption_date, db_record.consumed_quantity
+    )
+    
     db.commit()
     db.refresh(db_record)
     
@@ -137,11 +146,25 @@ async def update_consumption_record(
             # 残り個数も更新
             record.remaining_quantity = item.current_quantity
     
-    # 更新するフィールドのみを適用
+    old_date = record.consumption_date
+    old_quantity = record.consumed_quantity
+    
+    # 更新するフィールドのみを適用（消費日・消費量の null は変更なしとして扱う）
     update_data = record_update.dict(exclude_unset=True)
+    for field in ("consumption_date", "consumed_quantity"):
+        if field in update_data and update_data[field] is None:
+            del update_data[field]
     for field, value in update_data.items():
         setattr(record, field, value)
     
+    # 商品の消費統計を更新
+    db.flush()
+    consumption_stats.record_updated(
+        db, current_user.id, record.item_id,
+        old_date, old_quantity,
+        record.consumption_date, record.consumed_quantity
+    )
+    
     db.commit()
     db.refresh(record)
     return record
@@ -170,6 +193,14 @@ async def delete_consumption_record(
         item.current_quantity += record.consumed_quantity
     
     db.delete(record)
+    
+    # 商品の消費統計を更新
+    db.flush()
+    consumption_stats.record_removed(
+        db, current_user.id, record.item_id,
+        record.consumption_date, record.consumed_quantity
+    )
+    
     db.commit()
     return {"message": "消費記録が削除されました"}
 
@@ -199,4 +230,36 @@ async def get_item_consumption_history(
         ConsumptionRecord.user_id == current_user.id
     ).order_by(ConsumptionRecord.consumption_date.desc()).offset(skip).limit(limit).all()
     
-    return records 
\ No newline at end of file
+    return records
+
+@router.get("/item/{item_id}/stats", response_model=dict)
+async def get_item_consumption_stats(
+    item_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """特定の日用品の消費統計と消費パターンを取得（消費履歴は読まない）"""
+    item = db.query(DailyItem).filter(
+        DailyItem.id == item_id,
+        DailyItem.user_id == current_user.id
+    ).first()
+    
+    if not item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="指定された日用品が見つかりません"
+        )
+    
+    stats = consumption_stats.get_item_stats(db, current_user.id, item_id)
+    pattern = consumption_stats.stats_to_pattern(stats)
+    
+    return {
+        "item_id": item_id,
+        "record_count": stats.record_count,
+        "total_quantity": stats.total_quantity,
+        "first_date": stats.first_date,
+        "last_date": stats.last_date,
+        "trend_slope": consumption_stats.trend_slope(stats),
+        "version": stats.version,
+        "pattern": asdict(pattern)
+    }
\ No newline at end of file
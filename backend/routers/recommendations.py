@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List, Optional
 from datetime import datetime
 
@@ -10,11 +12,13 @@ from schemas import (
     ConsumptionAnalysisRequest,
     ConsumptionAnalysisResponse,
     RecommendationRequest,
+    RecommendationDetail,
     BatchRecommendationResponse,
     MessageResponse
 )
 from routers.auth import get_current_user
 from ai_client import consumption_analysis_service
+from request_coalescer import recommendation_locks
 
 router = APIRouter()
 
@@ -24,14 +28,18 @@ async def get_user_recommendations(
     limit: int = 100,
     active_only: bool = True,
     urgency_level: Optional[str] = None,
+    detail: RecommendationDetail = "full",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """ユーザーの推奨一覧を取得"""
+    """ユーザーの推奨一覧を取得（detail=summary の場合 additional_info を読み込まない）"""
     query = db.query(ConsumptionRecommendation).filter(
         ConsumptionRecommendation.user_id == current_user.id
     )
     
+    if detail == "summary":
+        query = query.options(defer(ConsumptionRecommendation.additional_info))
+    
     if active_only:
         query = query.filter(ConsumptionRecommendation.is_active == True)
     
@@ -43,6 +51,11 @@ async def get_user_recommendations(
         ConsumptionRecommendation.created_at.desc()
     ).offset(skip).limit(limit).all()
     
+    if detail == "summary":
+        # 読み込んでいない additional_info は None として返す（シリアライズ時の遅延読み込みを防ぐ）
+        for recommendation in recommendations:
+            set_committed_value(recommendation, "additional_info", None)
+    
     # 関連するアイテム情報も含める
     for recommendation in recommendations:
         if recommendation.item:
@@ -106,43 +119,69 @@ async def generate_item_recommendation(
                 detail="指定された商品が見つかりません"
             )
         
-        # AI サービスで推奨を生成
-        recommendation_data = await consumption_analysis_service.generate_item_recommendation(
-            current_user.id, item_id, db, request.target_stock_level
-        )
+        # 同じ商品の生成・保存が並行するとアクティブな推奨が重複するため直列化する
+        async with recommendation_locks.hold((current_user.id, item_id)):
+            # 入力が前回の推奨から変わっていなければ、更新日時だけを更新して再利用
+            fingerprint = (await consumption_analysis_service.get_input_fingerprints(
+                current_user.id, [item], db, request.target_stock_level, request.detail
+            )).get(item_id)
+            active_recommendations = db.query(ConsumptionRecommendation).filter(
+                ConsumptionRecommendation.user_id == current_user.id,
+                ConsumptionRecommendation.item_id == item_id,
+                ConsumptionRecommendation.is_active == True
+            ).all()
+            if (
+                fingerprint is not None
+                and len(active_recommendations) == 1
+                and active_recommendations[0].input_fingerprint == fingerprint
+            ):
+                reused = active_recommendations[0]
+                reused.updated_at = func.now()
+                db.commit()
+                db.refresh(reused)
+                return reused
         
-        # 既存の推奨を非アクティブ化
-        db.query(ConsumptionRecommendation).filter(
-            ConsumptionRecommendation.user_id == current_user.id,
-            ConsumptionRecommendation.item_id == item_id,
-            ConsumptionRecommendation.is_active == True
-        ).update({"is_active": False})
+            # AI サービスで推奨を生成
+            recommendation_data = await consumption_analysis_service.generate_item_recommendation(
+                current_user.id, item_id, db, request.target_stock_level, request.detail
+            )
         
-        # 新しい推奨を保存
-        db_recommendation = ConsumptionRecommendation(
-            user_id=current_user.id,
-            item_id=item_id,
-            recommendation_type=recommendation_data["recommended_action"],
-            urgency_level=recommendation_data["urgency_level"],
-            user_consumption_pace=recommendation_data["user_consumption_pace"],
-            market_consumption_pace=recommendation_data["market_consumption_pace"],
-            estimated_days_remaining=recommendation_data["estimated_days_remaining"],
-            recommendation_message=recommendation_data["recommendation_message"].format(item_name=item.name),
-            confidence_score=recommendation_data["confidence_score"],
-            additional_info=recommendation_data.get("additional_info", {})
-        )
+            # 他のワーカーによる同じ商品の保存と重ならないよう、商品行をコミットまでロック
+            db.query(DailyItem.id).filter(DailyItem.id == item_id).with_for_update().all()
+            
+            # 既存の推奨を非アクティブ化
+            db.query(ConsumptionRecommendation).filter(
+                ConsumptionRecommendation.user_id == current_user.id,
+                ConsumptionRecommendation.item_id == item_id,
+                ConsumptionRecommendation.is_active == True
+            ).update({"is_active": False})
         
-        db.add(db_recommendation)
-        db.commit()
-        db.refresh(db_recommendation)
+            # 新しい推奨を保存
+            db_recommendation = ConsumptionRecommendation(
+                user_id=current_user.id,
+                item_id=item_id,
+                recommendation_type=recommendation_data["recommended_action"],
+                urgency_level=recommendation_data["urgency_level"],
+                user_consumption_pace=recommendation_data["user_consumption_pace"],
+                market_consumption_pace=recommendation_data["market_consumption_pace"],
+                estimated_days_remaining=recommendation_data["estimated_days_remaining"],
+                recommendation_message=recommendation_data["recommendation_message"].format(item_name=item.name),
+                confidence_score=recommendation_data["confidence_score"],
+                additional_info=recommendation_data.get("additional_info", {}),
+                input_fingerprint=fingerprint
+            )
         
-        # バックグラウンドで通知を作成
-        background_tasks.add_task(
-            _create_recommendation_notification,
-            db_recommendation.id, db
-        )
+            db.add(db_recommendation)
+            db.commit()
+            db.refresh(db_recommendation)
+        
+            # バックグラウンドで通知を作成
+            background_tasks.add_task(
+                _create_recommendation_notification,
+                db_recommendation.id, db
+            )
         
-        return db_recommendation
+            return db_recommendation
         
     except Exception as e:
         db.rollback()
@@ -154,77 +193,128 @@ async def generate_item_recommendation(
 @router.post("/generate-all", response_model=BatchRecommendationResponse)
 async def generate_all_recommendations(
     background_tasks: BackgroundTasks,
+    detail: RecommendationDetail = "full",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """ユーザーの全商品の推奨を一括生成"""
+    """
+    ユーザーの全商品の推奨を一括生成（detail=summary の場合 additional_info を保存しない）
+    
+    入力（最新の消費記録・在庫数・閾値・市場データのバージョン）が前回の推奨から
+    変わっていない商品は再生成せず、既存の推奨の更新日時だけを更新する。
+    """
     try:
-        # AI サービスで一括推奨を生成
-        recommendations_data = await consumption_analysis_service.generate_user_recommendations(
-            current_user.id, db
-        )
-        
-        if not recommendations_data:
-            return BatchRecommendationResponse(
-                recommendations=[],
-                total_count=0,
-                high_priority_count=0
+        items = db.query(DailyItem).filter(DailyItem.user_id == current_user.id).all()
+        items_by_id = {item.id: item for item in items}
+        # 単一商品の生成と同じロックを全商品分取得して直列化する
+        async with recommendation_locks.hold(*[(current_user.id, item.id) for item in items]):
+            fingerprints = await consumption_analysis_service.get_input_fingerprints(
+                current_user.id, items, db, detail=detail
             )
         
-        # 全ての既存推奨を非アクティブ化
-        db.query(ConsumptionRecommendation).filter(
-            ConsumptionRecommendation.user_id == current_user.id,
-            ConsumptionRecommendation.is_active == True
-        ).update({"is_active": False})
+            # 入力が変わっていない商品のアクティブな推奨を再利用
+            active_by_item = {}
+            for rec in db.query(ConsumptionRecommendation).filter(
+                ConsumptionRecommendation.user_id == current_user.id,
+                ConsumptionRecommendation.is_active == True
+            ):
+                active_by_item.setdefault(rec.item_id, []).append(rec)
+            reused_recommendations = [
+                recs[0] for item_id, recs in active_by_item.items()
+                if len(recs) == 1 and recs[0].input_fingerprint is not None
+                and recs[0].input_fingerprint == fingerprints.get(item_id)
+            ]
+            reused_ids = [rec.id for rec in reused_recommendations]
+            reused_item_ids = {rec.item_id for rec in reused_recommendations}
+        
+            # AI サービスで入力が変わった商品の推奨だけを一括生成
+            recompute_item_ids = [item.id for item in items if item.id not in reused_item_ids]
+            recommendations_data = []
+            if recompute_item_ids:
+                recommendations_data = await consumption_analysis_service.generate_user_recommendations(
+                    current_user.id, db, detail, recompute_item_ids
+                )
+        
+            if not recommendations_data and not reused_recommendations:
+                return BatchRecommendationResponse(
+                    recommendations=[],
+                    total_count=0,
+                    high_priority_count=0
+                )
         
-        # 新しい推奨を保存
-        saved_recommendations = []
-        high_priority_count = 0
+            # 再利用する推奨は更新日時だけを更新
+            if reused_ids:
+                db.query(ConsumptionRecommendation).filter(
+                    ConsumptionRecommendation.id.in_(reused_ids)
+                ).update({"updated_at": func.now()}, synchronize_session=False)
         
-        for rec_data in recommendations_data:
-            # 商品名を取得
-            item = db.query(DailyItem).filter(DailyItem.id == rec_data["item_id"]).first()
-            item_name = item.name if item else "不明な商品"
+            # 新しい推奨を生成できた商品の既存推奨だけを非アクティブ化
+            # （チャンク単位の生成に失敗した商品は以前の推奨を残す）
+            recomputed_item_ids = {rec_data["item_id"] for rec_data in recommendations_data}
+            if recomputed_item_ids:
+                # 他のワーカーによる保存と重ならないよう、商品行を ID 順にコミットまでロック
+                db.query(DailyItem.id).filter(
+                    DailyItem.id.in_(recomputed_item_ids)
+                ).order_by(DailyItem.id).with_for_update().all()
+                db.query(ConsumptionRecommendation).filter(
+                    ConsumptionRecommendation.user_id == current_user.id,
+                    ConsumptionRecommendation.is_active == True,
+                    ConsumptionRecommendation.item_id.in_(recomputed_item_ids)
+                ).update({"is_active": False}, synchronize_session=False)
+        
+            # 新しい推奨を保存
+            saved_recommendations = []
+            high_priority_count = len([
+                rec for rec in reused_recommendations if rec.urgency_level in ["high", "critical"]
+            ])
+        
+            for rec_data in recommendations_data:
+                # 商品名を取得
+                item = items_by_id.get(rec_data["item_id"])
+                item_name = item.name if item else "不明な商品"
             
-            db_recommendation = ConsumptionRecommendation(
-                user_id=current_user.id,
-                item_id=rec_data["item_id"],
-                recommendation_type=rec_data["recommended_action"],
-                urgency_level=rec_data["urgency_level"],
-                user_consumption_pace=rec_data["user_consumption_pace"],
-                market_consumption_pace=rec_data["market_consumption_pace"],
-                estimated_days_remaining=rec_data["estimated_days_remaining"],
-                recommendation_message=rec_data["recommendation_message"].format(item_name=item_name),
-                confidence_score=rec_data["confidence_score"],
-                additional_info=rec_data.get("additional_info", {})
-            )
+                db_recommendation = ConsumptionRecommendation(
+                    user_id=current_user.id,
+                    item_id=rec_data["item_id"],
+                    recommendation_type=rec_data["recommended_action"],
+                    urgency_level=rec_data["urgency_level"],
+                    user_consumption_pace=rec_data["user_consumption_pace"],
+                    market_consumption_pace=rec_data["market_consumption_pace"],
+                    estimated_days_remaining=rec_data["estimated_days_remaining"],
+                    recommendation_message=rec_data["recommendation_message"].format(item_name=item_name),
+                    confidence_score=rec_data["confidence_score"],
+                    additional_info=rec_data.get("additional_info", {}),
+                    input_fingerprint=fingerprints.get(rec_data["item_id"])
+                )
             
-            db.add(db_recommendation)
-            saved_recommendations.append(db_recommendation)
+                db.add(db_recommendation)
+                saved_recommendations.append(db_recommendation)
             
-            # 高優先度のカウント
-            if rec_data["urgency_level"] in ["high", "critical"]:
-                high_priority_count += 1
+                # 高優先度のカウント
+                if rec_data["urgency_level"] in ["high", "critical"]:
+                    high_priority_count += 1
         
-        db.commit()
+            db.commit()
         
-        # 推奨をリフレッシュして関連データを取得
-        for rec in saved_recommendations:
-            db.refresh(rec)
+            # 推奨をリフレッシュして関連データを取得
+            for rec in reused_recommendations + saved_recommendations:
+                db.refresh(rec)
         
-        # バックグラウンドで通知を作成
-        for rec in saved_recommendations:
-            if rec.urgency_level in ["high", "critical"]:
-                background_tasks.add_task(
-                    _create_recommendation_notification,
-                    rec.id, db
-                )
+            # バックグラウンドで通知を作成（再利用した推奨は前回通知済み）
+            for rec in saved_recommendations:
+                if rec.urgency_level in ["high", "critical"]:
+                    background_tasks.add_task(
+                        _create_recommendation_notification,
+                        rec.id, db
+                    )
         
-        return BatchRecommendationResponse(
-            recommendations=saved_recommendations,
-            total_count=len(saved_recommendations),
-            high_priority_count=high_priority_count
-        )
+            return BatchRecommendationResponse(
+                recommendations=reused_recommendations + saved_recommendations,
+                total_count=len(reused_recommendations) + len(saved_recommendations),
+                high_priority_count=high_priority_count,
+                reused_count=len(reused_recommendations),
+                recomputed_count=len(saved_recommendations)
+            )
         
     except Exception as e:
         db.rollback()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime, date
 
 # ユーザー関連スキーマ
@@ -164,6 +164,9 @@ class DashboardSummary(BaseModel):
     upcoming_notifications: List[Notification]
 
 # 消費推奨関連スキーマ
+# 推奨の詳細度（summary は additional_info を生成・保存しない）
+RecommendationDetail = Literal["summary", "full"]
+
 class ConsumptionRecommendationBase(BaseModel):
     recommendation_type: str
     urgency_level: str
@@ -199,12 +202,16 @@ class ConsumptionAnalysisResponse(BaseModel):
     analysis: dict
     market_data: dict
     item_info: dict
+    pattern: Optional[dict] = None
 
 class RecommendationRequest(BaseModel):
     item_id: int
     target_stock_level: Optional[int] = None
+    detail: RecommendationDetail = "full"  # summary の場合は additional_info を生成・保存しない
 
 class BatchRecommendationResponse(BaseModel):
     recommendations: List[ConsumptionRecommendation]
     total_count: int
-    high_priority_count: int 
\ No newline at end of file
+    high_priority_count: int
+    reused_count: int = 0  # 入力が変わっていないため再利用した推奨の数
+    recomputed_count: int = 0  # 新たに生成した推奨の数 
\ No newline at end of file
@@ -36,4 +36,57 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_consumption_recommendations_updated_at 
     BEFORE UPDATE ON consumption_recommendations 
     FOR EACH ROW 
-    EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Add item_consumption_stats table (running per-item consumption statistics)
+CREATE TABLE IF NOT EXISTS item_consumption_stats (
+    item_id INTEGER PRIMARY KEY REFERENCES daily_items(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    record_count INTEGER NOT NULL DEFAULT 0,
+    total_quantity FLOAT NOT NULL DEFAULT 0,
+    mean_quantity FLOAT NOT NULL DEFAULT 0,
+    m2 FLOAT NOT NULL DEFAULT 0,
+    first_date DATE,
+    last_date DATE,
+    anchor_date DATE,
+    sum_x FLOAT NOT NULL DEFAULT 0,
+    sum_xx FLOAT NOT NULL DEFAULT 0,
+    sum_xy FLOAT NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_item_consumption_stats_user_id ON item_consumption_stats(user_id);
+
+-- Add market pace aggregation tables (crowd-sourced market consumption paces)
+CREATE TABLE IF NOT EXISTS market_pace_checkpoints (
+    job_name VARCHAR(50) PRIMARY KEY,
+    last_record_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS market_pace_contributions (
+    item_id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    name_key VARCHAR(100) NOT NULL,
+    pace FLOAT NOT NULL,
+    item_name VARCHAR(100),
+    stats_version INTEGER,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS market_pace_aggregates (
+    name_key VARCHAR(100) PRIMARY KEY,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    user_count INTEGER NOT NULL DEFAULT 0,
+    pace_sum FLOAT NOT NULL DEFAULT 0,
+    sketch JSON NOT NULL DEFAULT '{}',
+    version INTEGER NOT NULL DEFAULT 0,
+    published_version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_market_pace_contributions_name_key ON market_pace_contributions(name_key);
+
+-- Add input fingerprint to consumption_recommendations (skip regeneration when inputs are unchanged)
+ALTER TABLE consumption_recommendations ADD COLUMN IF NOT EXISTS input_fingerprint VARCHAR(64);